@@ -0,0 +1,77 @@
+"""
+In-process product catalog.
+
+Products change rarely (seeding, admin edits) but their names are needed for
+every serialized observation. The catalog loads all products once, keeps a
+version number, and reloads lazily after any Product insert/update/delete.
+"""
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+
+
+class ProductCatalog:
+    """Versioned, thread-safe cache of product id -> name."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._names = {}
+        self._loaded = False
+        self.version = 0
+
+    def invalidate(self):
+        """Mark the catalog stale; the next lookup reloads it."""
+        with self._lock:
+            self._loaded = False
+            self.version += 1
+
+    def _load(self):
+        from app.routes.observation import Product
+
+        db = self._session_factory()
+        try:
+            rows = db.query(Product.id, Product.name).all()
+        finally:
+            db.close()
+        self._names = {pid: name for pid, name in rows}
+        self._loaded = True
+
+    def names(self):
+        """Return the current id -> name mapping, loading it if needed."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+        return self._names
+
+    def name_for(self, product_id):
+        """Resolve a product name, falling back to the 'Product #<id>' label."""
+        if product_id:
+            name = self.names().get(product_id)
+            if name:
+                return name
+        return f"Product #{product_id}"
+
+
+product_catalog = ProductCatalog()
+
+
+def watch_products(product_model):
+    """
+    Invalidate the catalog once a transaction that wrote Product rows through
+    the ORM commits, so concurrent readers never cache uncommitted names.
+    """
+    def _mark_dirty(mapper, connection, target):
+        Session.object_session(target).info["products_dirty"] = True
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(product_model, name, _mark_dirty)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate(session):
+        if session.info.pop("products_dirty", False):
+            product_catalog.invalidate()
@@ -0,0 +1,170 @@
+"""
+Negotiated response compression (gzip, brotli, zstd).
+
+An after_request hook picks the best coding the client accepts from
+Accept-Encoding (server preference zstd > br > gzip on ties; brotli and
+zstd are used only when their libraries are installed). Buffered responses
+are compressed in one go once they reach COMPRESSION_MIN_SIZE bytes;
+streamed responses are wrapped in an incremental encoder that flushes after
+each chunk, so clients still receive rows as they are produced.
+
+Config:
+    COMPRESSION_ENABLED     default True
+    COMPRESSION_MIN_SIZE    bytes, default 1024 (buffered responses only)
+    COMPRESSION_ALGORITHMS  server preference, default ("zstd", "br", "gzip")
+    COMPRESSION_LEVELS      per-coding level overrides
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_ALGORITHMS = ("zstd", "br", "gzip")
+# Fast levels: these are dynamic responses, compressed on every request
+DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/csv",
+}
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level):
+        self._c = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._c.compress(data)
+
+    def flush(self):
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._c.flush()
+
+
+def available_encoders():
+    """Content-coding -> encoder class, for the codings usable in this process."""
+    encoders = {"gzip": _GzipEncoder}
+    if brotli is not None:
+        encoders["br"] = _BrotliEncoder
+    if zstandard is not None:
+        encoders["zstd"] = _ZstdEncoder
+    return encoders
+
+
+def negotiate(accept_encodings, algorithms):
+    """Best coding from the client's Accept-Encoding, or None for identity."""
+    encoders = available_encoders()
+    offered = [name for name in algorithms if name in encoders]
+    return accept_encodings.best_match(offered) if offered else None
+
+
+def compress(data, coding, level=None):
+    """One-shot compression of `data` (bytes) with a negotiated coding."""
+    encoder = available_encoders()[coding](DEFAULT_LEVELS[coding] if level is None else level)
+    return encoder.compress(data) + encoder.finish()
+
+
+def _compress_stream(chunks, encoder):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = encoder.compress(chunk) + encoder.flush()
+            if data:
+                yield data
+        yield encoder.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _is_compressible(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES or (response.mimetype or "").startswith("text/")
+
+
+def _weaken_etag(response):
+    """A compressed body is a different byte sequence than the identity one."""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def install(app):
+    """Register the compression after_request hook on `app`."""
+    app.config.setdefault("COMPRESSION_ENABLED", True)
+    app.config.setdefault("COMPRESSION_MIN_SIZE", DEFAULT_MIN_SIZE)
+    app.config.setdefault("COMPRESSION_ALGORITHMS", DEFAULT_ALGORITHMS)
+    app.config.setdefault("COMPRESSION_LEVELS", {})
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config["COMPRESSION_ENABLED"] or not _is_compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+
+        coding = negotiate(request.accept_encodings, app.config["COMPRESSION_ALGORITHMS"])
+        if coding is None:
+            return response
+        level = app.config["COMPRESSION_LEVELS"].get(coding, DEFAULT_LEVELS[coding])
+
+        if response.is_streamed:
+            encoder = available_encoders()[coding](level)
+            response.response = _compress_stream(response.response, encoder)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config["COMPRESSION_MIN_SIZE"]:
+                return response
+            response.set_data(compress(data, coding, level))
+
+        response.headers["Content-Encoding"] = coding
+        _weaken_etag(response)
+        return response
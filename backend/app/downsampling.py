@@ -0,0 +1,166 @@
+"""
+Visual-fidelity downsampling of observation series.
+
+Both methods return the *indices* of the points to keep (sorted), so callers
+can downsample on a cheap (id, timestamp, value) projection and hydrate only
+the survivors:
+
+- lttb: Largest-Triangle-Three-Buckets. Keeps the first and last points and,
+  per bucket, the point forming the largest triangle with the previously kept
+  point and the next bucket's average. Preserves the visual shape, peaks
+  included.
+- minmax: the minimum and maximum of each of points/2 buckets. Guarantees
+  every extreme survives; good for spiky sensor data.
+
+Inputs are NumPy arrays sorted by x; the per-bucket work is vectorized.
+"""
+import numpy as np
+from sqlalchemy import String, type_coerce
+
+from app.routes.observation import ObservationRecord
+
+METHODS = ("lttb", "minmax")
+DEFAULT_POINTS = 1000
+MAX_POINTS = 10000
+# Rows fetched per round trip while collecting (id, timestamp, value)
+FETCH_CHUNK_SIZE = 50000
+
+
+def lttb(x, y, points):
+    """Indices of at most `points` points chosen by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1][:points], dtype=np.int64)
+
+    # Bucket boundaries for the n-2 interior points, split into points-2 buckets
+    edges = np.floor(np.arange(points - 1) * (n - 2) / (points - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    sizes = np.diff(edges)
+    x_avg = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    y_avg = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    # The last bucket looks ahead to the final point
+    x_next = np.append(x_avg[1:], x[n - 1])
+    y_next = np.append(y_avg[1:], y[n - 1])
+
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[a] - x_next[i]) * (ys - y[a]) - (x[a] - xs) * (y_next[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(x, y, points):
+    """Indices of the min and max of each of points//2 equal-count buckets."""
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    buckets = max(points // 2, 1)
+    bucket = np.arange(n) * buckets // n
+    # Sorted by bucket, then value: each bucket's first entry is its min, its last its max
+    order = np.lexsort((y, bucket))
+    sorted_buckets = bucket[order]
+    ids = np.arange(buckets)
+    first = order[np.searchsorted(sorted_buckets, ids, side="left")]
+    last = order[np.searchsorted(sorted_buckets, ids, side="right") - 1]
+    return np.unique(np.concatenate([first, last]))
+
+
+def downsample(x, y, points, method="lttb"):
+    if method == "lttb":
+        return lttb(x, y, points)
+    if method == "minmax":
+        return minmax(x, y, points)
+    raise ValueError(f"unknown downsample method '{method}' (expected {' or '.join(METHODS)})")
+
+
+def parse_downsample(params):
+    """
+    (method, points) from `downsample`/`points` params, or None when not
+    requested. A single `product_id` is required: interleaving products
+    (different units) would make the picked peaks jumps between series.
+    """
+    method = params.get("downsample")
+    if not method:
+        return None
+    if method not in METHODS:
+        raise ValueError(f"downsample must be one of {', '.join(METHODS)}")
+    if not str(params.get("product_id", "")).isdigit():
+        raise ValueError("downsample requires a single product_id")
+    points = int(params.get("points", DEFAULT_POINTS))
+    if points < 1:
+        raise ValueError("points must be positive")
+    return method, min(points, MAX_POINTS)
+
+
+def _collect(db, query):
+    """(ids, x as epoch microseconds, y) of the query's numeric rows, in time order."""
+    query = query.with_entities(
+        ObservationRecord.id,
+        type_coerce(ObservationRecord.timestamp, String),
+        ObservationRecord.value_numeric,
+    ).filter(
+        ObservationRecord.timestamp.isnot(None), ObservationRecord.value_numeric.isnot(None)
+    ).order_by(None).order_by(ObservationRecord.timestamp.asc(), ObservationRecord.id.asc())
+
+    ids, stamps, values = [], [], []
+    result = db.execute(query.statement.execution_options(yield_per=FETCH_CHUNK_SIZE))
+    for chunk in result.partitions():
+        chunk_ids, chunk_stamps, chunk_values = zip(*chunk)
+        ids.append(np.array(chunk_ids, dtype=np.int64))
+        stamps.append(np.array(chunk_stamps, dtype="datetime64[us]").astype(np.int64))
+        values.append(np.array(chunk_values, dtype=float))
+    if not ids:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty
+    return np.concatenate(ids), np.concatenate(stamps).astype(float), np.concatenate(values)
+
+
+def select_points(db, query, method, points):
+    """
+    Downsample the numeric rows matched by an observation query.
+    Returns (ids to keep in time order, total numeric rows considered).
+    """
+    ids, x, y = _collect(db, query)
+    if not len(ids):
+        return [], 0
+    keep = downsample(x, y, points, method)
+    return ids[keep].tolist(), len(ids)
+
+
+def downsampled_rows(db, query, method, points):
+    """
+    Rows of `query` (ORM entities or column tuples) reduced to at most
+    `points`, oldest first, plus the number of rows they were chosen from.
+    """
+    ids, total = select_points(db, query, method, points)
+    if not ids:
+        return [], total
+    rows = query.filter(ObservationRecord.id.in_(ids)).order_by(None).order_by(
+        ObservationRecord.timestamp.asc(), ObservationRecord.id.asc()
+    ).all()
+    return rows, total
+
+
+def downsampled_series(db, query, method, points):
+    """
+    [{t, value, id}] for the kept points, oldest first, straight from the
+    collected projection (no second query), plus the number considered.
+    """
+    ids, x, y = _collect(db, query)
+    if not len(ids):
+        return [], 0
+    keep = downsample(x, y, points, method)
+    stamps = np.datetime_as_string(x[keep].astype(np.int64).astype("datetime64[us]"), unit="us")
+    series = [
+        {"t": stamp, "value": value, "id": obs_id}
+        for stamp, value, obs_id in zip(stamps.tolist(), y[keep].tolist(), ids[keep].tolist())
+    ]
+    return series, len(ids)
@@ -0,0 +1,106 @@
+"""
+Cached per-user entitlement resolution.
+
+Every authenticated read needs the set of products a user may see. The
+service resolves it from subscriptions once (expanding the Pro Plan to "all
+products") and keeps it for ENTITLEMENT_TTL_SECONDS. Committed writes to
+Subscription rows (the subscription endpoints, Stripe fulfillment in
+payments.handle_checkout_session, admin scripts using the ORM) invalidate the
+affected users at once; the TTL only bounds staleness for writes made by
+other processes.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+PRO_PLAN_ID = 5
+DEFAULT_TTL_SECONDS = 60.0
+
+
+class EntitlementService:
+    """Thread-safe TTL cache of user id -> entitled product ids."""
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Bumped by every invalidation; a load that raced one is not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, db, user_id):
+        from app.routes.observation import Subscription
+
+        rows = db.query(Subscription.product_id).filter(Subscription.user_id == user_id).all()
+        product_ids = {pid for pid, in rows}
+        if PRO_PLAN_ID in product_ids:
+            return None
+        return tuple(sorted(product_ids))
+
+    def resolve(self, db, user_id):
+        """
+        Products `user_id` may read: None for Pro Plan (all access), otherwise
+        a sorted tuple of product ids (empty for the Free Plan).
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        product_ids = self._load(db, user_id)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[user_id] = (now + self.ttl, product_ids)
+        return product_ids
+
+    def allows(self, db, user_id, product_id):
+        """Whether `user_id` may read observations of `product_id`."""
+        product_ids = self.resolve(db, user_id)
+        return product_ids is None or product_id in product_ids
+
+    def invalidate(self, user_ids=None):
+        """Forget the given users (every user when None)."""
+        with self._lock:
+            self._generation += 1
+            if user_ids is None:
+                self._entries.clear()
+            else:
+                for user_id in user_ids:
+                    self._entries.pop(user_id, None)
+
+
+entitlements = EntitlementService(float(os.getenv("ENTITLEMENT_TTL_SECONDS", DEFAULT_TTL_SECONDS)))
+
+
+def watch_subscriptions(subscription_model):
+    """
+    Invalidate a user's cached entitlements once a transaction that wrote
+    their Subscription rows through the ORM commits.
+    """
+    def _mark_dirty(mapper, connection, target):
+        users = Session.object_session(target).info.setdefault("entitlements_dirty", set())
+        users.add(target.user_id)
+        # A subscription moved to another user changes both users' access
+        users.update(inspect(target).attrs.user_id.history.deleted or ())
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(subscription_model, name, _mark_dirty)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate(session):
+        users = session.info.pop("entitlements_dirty", None)
+        if users:
+            entitlements.invalidate(users)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop("entitlements_dirty", None)
@@ -0,0 +1,91 @@
+"""
+Slippy-map tile aggregation for observation heatmaps.
+
+Points are binned into Web Mercator tiles (z/x/y, the OSM scheme) with
+vectorized NumPy operations, one fetched chunk at a time, so memory is bounded
+by the chunk size and the number of occupied cells rather than the row count.
+"""
+import math
+
+import numpy as np
+
+MAX_ZOOM = 18
+# Web Mercator is undefined at the poles; OSM tiles stop at this latitude
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_xy(lats, lons, zoom):
+    """Vectorized lat/lon (degrees) -> integer tile x/y at `zoom`."""
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lats, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = np.floor((lons + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x, y, zoom):
+    """[west, south, east, north] of a tile in degrees."""
+    n = 2 ** zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return [x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)]
+
+
+class TileAccumulator:
+    """Running count/min/max/sum per tile, fed in chunks."""
+
+    def __init__(self, zoom):
+        self.zoom = zoom
+        self._n = 2 ** zoom
+        # key -> [count, numeric_count, sum, min, max]
+        self._cells = {}
+
+    def add(self, lats, lons, values):
+        """Fold one chunk of points (NumPy float arrays; NaN values are counted but not averaged)."""
+        if not len(lats):
+            return
+        x, y = tile_xy(lats, lons, self.zoom)
+        keys, inverse = np.unique(y * self._n + x, return_inverse=True)
+        cells = len(keys)
+
+        counts = np.bincount(inverse, minlength=cells)
+        numeric = ~np.isnan(values)
+        idx, vals = inverse[numeric], values[numeric]
+        numeric_counts = np.bincount(idx, minlength=cells)
+        sums = np.bincount(idx, weights=vals, minlength=cells)
+        mins = np.full(cells, np.inf)
+        maxs = np.full(cells, -np.inf)
+        np.minimum.at(mins, idx, vals)
+        np.maximum.at(maxs, idx, vals)
+
+        for i, key in enumerate(keys.tolist()):
+            cell = self._cells.get(key)
+            if cell is None:
+                self._cells[key] = [int(counts[i]), int(numeric_counts[i]), float(sums[i]),
+                                    float(mins[i]), float(maxs[i])]
+            else:
+                cell[0] += int(counts[i])
+                cell[1] += int(numeric_counts[i])
+                cell[2] += float(sums[i])
+                cell[3] = min(cell[3], float(mins[i]))
+                cell[4] = max(cell[4], float(maxs[i]))
+
+    def cells(self):
+        """Aggregated cells, ordered by tile y then x."""
+        output = []
+        for key in sorted(self._cells):
+            count, numeric_count, total, low, high = self._cells[key]
+            y, x = divmod(key, self._n)
+            output.append({
+                "z": self.zoom,
+                "x": x,
+                "y": y,
+                "bounds": tile_bounds(x, y, self.zoom),
+                "count": count,
+                "min": low if numeric_count else None,
+                "max": high if numeric_count else None,
+                "mean": total / numeric_count if numeric_count else None,
+            })
+        return output
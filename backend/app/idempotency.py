@@ -0,0 +1,89 @@
+"""
+Idempotency-Key support for the ingest endpoints.
+
+A client that sends `Idempotency-Key: <opaque string>` with a POST can retry
+it freely: the first response is stored under the key in the same
+transaction as the write, and a retry with the same key and body gets that
+response back (with `Idempotent-Replayed: true`) after a single primary-key
+probe, without writing anything. Reusing a key for a different request is
+answered with 422. Keys expire after IDEMPOTENCY_TTL_SECONDS.
+
+Retries without a key are caught by the content hash on observations (see
+content_hash in app/routes/observation.py).
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, jsonify
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.db import Base
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(MAX_KEY_LENGTH), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+def _ttl():
+    return timedelta(seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", DEFAULT_TTL_SECONDS)))
+
+
+def fingerprint(request):
+    """Method, path and raw body: what a retry must repeat exactly."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def check(db, request):
+    """
+    None when the request carries no key or a key not seen before; otherwise
+    the response to return as is (the stored one, or an error).
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return jsonify({"error": f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters"}), 400
+
+    record = db.get(IdempotencyKey, key)
+    if record is None:
+        return None
+    created_at = record.created_at.replace(tzinfo=timezone.utc)
+    if created_at < datetime.now(timezone.utc) - _ttl():
+        # Expired: forget it and treat the request as new
+        db.delete(record)
+        db.flush()
+        return None
+    if record.fingerprint != fingerprint(request):
+        return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+
+    response = current_app.response_class(record.body, status=record.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def remember(db, request, status_code, payload):
+    """
+    Stage `payload` as the response for the request's key in `db`'s
+    transaction (no-op without a key). The caller commits; a concurrent
+    request with the same key then fails on the primary key and can
+    check() again.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return
+    db.add(IdempotencyKey(key=key, fingerprint=fingerprint(request),
+                          status_code=status_code, body=json.dumps(payload)))
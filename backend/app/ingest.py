@@ -0,0 +1,261 @@
+"""
+Batched observation ingest.
+
+`prepare()` validates one raw item (a JSON object) into a complete row for
+the observations table, derived columns included, so a batch of prepared
+rows can go to the database as one executemany inside a single
+transaction, instead of one ORM flush,
+refresh and commit per observation. The SQLite triggers keep the R*Tree,
+spectral index and rollup tables in sync exactly as for ORM writes.
+"""
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
+
+from app import versions
+from app.catalog import product_catalog
+from app.routes.observation import ObservationRecord, content_hash, derive_columns
+
+# Upper bound on items per JSON bulk request (config BULK_INGEST_MAX_ITEMS)
+DEFAULT_MAX_ITEMS = 5000
+# NDJSON uploads: rows per committed chunk (config NDJSON_INGEST_CHUNK_SIZE)
+DEFAULT_CHUNK_SIZE = 5000
+MAX_CHUNK_SIZE = 50000
+# Longest accepted NDJSON line; longer lines are rejected without buffering them
+MAX_LINE_BYTES = 64 * 1024
+# Per-line errors kept for the final report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+# Hashes per IN (...) when probing for duplicates (well under SQLite's variable limit)
+PROBE_CHUNK_SIZE = 500
+
+# Raw columns accepted from clients -> max length for strings (None: unbounded)
+_STRING_FIELDS = {
+    "satellite_id": 100,
+    "coordinates": 255,
+    "timezone": 50,
+    "unit": 20,
+    "notes": None,
+}
+
+
+class IngestError(ValueError):
+    """An item that cannot be stored; the message is returned to the client."""
+
+
+def utc_naive(value):
+    """ISO 8601 text -> naive UTC datetime, the stored representation."""
+    if not isinstance(value, str):
+        raise IngestError("timestamp must be an ISO 8601 string")
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise IngestError(f"invalid timestamp '{value}'")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def prepare(item, now=None):
+    """
+    Validate one raw observation and return the row to insert.
+    Raises IngestError describing the first problem found. Unknown keys are
+    ignored, like the single-item endpoint does.
+    """
+    if not isinstance(item, dict):
+        raise IngestError("each observation must be a JSON object")
+
+    product_id = item.get("product_id")
+    if isinstance(product_id, bool) or not isinstance(product_id, int):
+        raise IngestError("product_id must be an integer")
+    if product_id not in product_catalog.names():
+        raise IngestError(f"unknown product_id {product_id}")
+
+    value = item.get("value")
+    if value is None or isinstance(value, (bool, dict, list)):
+        raise IngestError("value is required and must be a string or number")
+    value = str(value)
+    if len(value) > 50:
+        raise IngestError("value is longer than 50 characters")
+
+    confidence = item.get("confidence")
+    if confidence is not None:
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+            raise IngestError("confidence must be a number")
+        confidence = float(confidence)
+
+    row = {
+        "product_id": product_id,
+        "timestamp": utc_naive(item["timestamp"]) if item.get("timestamp")
+        else (now or datetime.now(timezone.utc).replace(tzinfo=None)),
+        "value": value,
+        "confidence": confidence,
+        "spectral_indices": item.get("spectral_indices"),
+    }
+    for name, max_length in _STRING_FIELDS.items():
+        text = item.get(name)
+        if text is not None:
+            if not isinstance(text, str):
+                raise IngestError(f"{name} must be a string")
+            if max_length is not None and len(text) > max_length:
+                raise IngestError(f"{name} is longer than {max_length} characters")
+        row[name] = text
+
+    # Accept the documented lat/lon pair as coordinates
+    if row["coordinates"] is None and item.get("lat") is not None and item.get("lon") is not None:
+        row["coordinates"] = f"{item['lat']}, {item['lon']}"
+
+    row.update(derive_columns(row))
+    # Only client-supplied timestamps identify a reading (see content_hash)
+    row["content_hash"] = content_hash(
+        product_id, row["satellite_id"], row["coordinates"], row["timestamp"] if item.get("timestamp") else None
+    )
+    return row
+
+
+def validate(items, now=None):
+    """One pass over `items`: ([(index, row)], [(index, error)])."""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    accepted, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            accepted.append((index, prepare(item, now)))
+        except IngestError as e:
+            errors.append((index, str(e)))
+    return accepted, errors
+
+
+def existing_hashes(db, hashes):
+    """{content_hash: id} for the hashes already stored (index probes, chunked)."""
+    hashes = list(hashes)
+    column = ObservationRecord.content_hash
+    found = {}
+    for offset in range(0, len(hashes), PROBE_CHUNK_SIZE):
+        chunk = hashes[offset:offset + PROBE_CHUNK_SIZE]
+        found.update(db.execute(
+            select(column, ObservationRecord.id).where(column.in_(chunk))
+        ).tuples().all())
+    return found
+
+
+def insert_rows(db, rows):
+    """
+    Insert prepared rows with a single executemany in the session's
+    transaction. Returns (ids in input order, indices of duplicates): a row
+    whose content hash is already stored, or repeated earlier in `rows`, is
+    not inserted and gets the original id. Bumps the affected products' data
+    versions; the caller commits.
+    """
+    if not rows:
+        return [], set()
+    # Writing first takes SQLite's write lock, so no other writer can slip a
+    # duplicate in between the probe and the insert below
+    versions.record_write(db, {row["product_id"] for row in rows})
+
+    known = existing_hashes(db, {row["content_hash"] for row in rows if row["content_hash"]})
+    ids, duplicates, fresh, first_seen = [None] * len(rows), set(), [], {}
+    for index, row in enumerate(rows):
+        digest = row["content_hash"]
+        if digest is not None:
+            if digest in known:
+                ids[index] = known[digest]
+                duplicates.add(index)
+                continue
+            if digest in first_seen:
+                duplicates.add(index)
+                continue
+            first_seen[digest] = index
+        fresh.append(index)
+
+    if fresh:
+        db.execute(insert(ObservationRecord.__table__), [rows[i] for i in fresh])
+        # The transaction holds SQLite's write lock, so the batch got consecutive
+        # rowids ending at the last one inserted on this connection. (RETURNING
+        # with guaranteed ordering would make SQLAlchemy fall back to one
+        # statement per row on SQLite.)
+        last_id = db.execute(select(func.last_insert_rowid())).scalar()
+        for index, obs_id in zip(fresh, range(last_id - len(fresh) + 1, last_id + 1)):
+            ids[index] = obs_id
+    for index in duplicates:
+        if ids[index] is None:
+            ids[index] = ids[first_seen[rows[index]["content_hash"]]]
+    return ids, duplicates
+
+
+def _read_lines(stream, max_bytes=MAX_LINE_BYTES):
+    """Yield (line number, bytes or None when too long) from a binary stream."""
+    number = 0
+    while True:
+        line = stream.readline(max_bytes + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_bytes and not line.endswith(b"\n"):
+            # Skip the rest of an oversized line in bounded reads
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_bytes + 1)
+            yield number, None
+        else:
+            yield number, line
+
+
+def ingest_ndjson(db, stream, chunk_size=DEFAULT_CHUNK_SIZE, loads=json.loads, finalize=None):
+    """
+    Parse an NDJSON body incrementally and insert it in committed chunks of
+    `chunk_size` rows, so memory is bounded by the chunk, not the upload.
+
+    Yields one progress document per committed chunk and a final summary
+    with the per-line errors (line numbers are 1-based). Lines whose content
+    hash is already stored count as duplicates, not errors. Rows from chunks
+    committed before a failure stay committed. `finalize(session)` runs
+    before the last commit, e.g. to add a usage row.
+    """
+    lines = created = duplicates = failed = 0
+    errors = []
+    rows = []
+
+    def commit(final=False):
+        nonlocal created, duplicates
+        ids, repeated = insert_rows(db, rows)
+        if final and finalize is not None:
+            finalize(db)
+        db.commit()
+        rows.clear()
+        created += len(ids) - len(repeated)
+        duplicates += len(repeated)
+        return ids
+
+    try:
+        for number, line in _read_lines(stream):
+            lines = number
+            error = None
+            if line is None:
+                error = f"line longer than {MAX_LINE_BYTES} bytes"
+            elif line.strip():
+                try:
+                    rows.append(prepare(loads(line)))
+                except IngestError as e:
+                    error = str(e)
+                except ValueError:
+                    error = "invalid JSON"
+            if error is not None:
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": number, "error": error})
+            if len(rows) >= chunk_size:
+                ids = commit()
+                yield {"committed": created, "duplicates": duplicates, "lines": lines,
+                       "first_id": min(ids), "last_id": max(ids)}
+
+        ids = commit(final=True)
+        if ids:
+            yield {"committed": created, "duplicates": duplicates, "lines": lines,
+                   "first_id": min(ids), "last_id": max(ids)}
+    except Exception as e:
+        db.rollback()
+        yield {"done": False, "error": f"ingest aborted at line {lines}: {e}", "lines": lines,
+               "created": created, "duplicates": duplicates, "failed": failed, "errors": errors}
+        return
+
+    yield {"done": True, "lines": lines, "created": created, "duplicates": duplicates, "failed": failed,
+           "errors": errors, "errors_truncated": failed > len(errors)}
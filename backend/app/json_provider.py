@@ -0,0 +1,94 @@
+"""
+App-wide JSON providers.
+
+Observation listings spend most of their encode time on floats, strings and
+timestamps. When orjson is installed it replaces Flask's stdlib provider for
+jsonify, request.get_json and the streaming encoders; otherwise the stdlib
+provider below is used. Both produce the same documents:
+
+- keys sorted, compact separators (as jsonify already did),
+- datetime/date/time as ISO 8601 (Flask's default would emit RFC 822 dates),
+- Decimal and UUID as strings, dataclasses as objects.
+
+Selected with app.config["JSON_PROVIDER"] / env JSON_PROVIDER:
+"auto" (default: orjson if importable), "orjson" or "stdlib".
+"""
+import dataclasses
+import decimal
+import os
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(o):
+    """Encode the types neither json nor orjson handle the way the API wants."""
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider with ISO 8601 dates, for parity with orjson."""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    orjson-backed provider. Output is always compact with sorted keys; the
+    stdlib-only keyword arguments (separators, indent, ...) are accepted and
+    ignored, except that pretty-printed debug responses still get indented.
+    """
+
+    mimetype = "application/json"
+    compact = None
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps_bytes(self, obj, indent=False):
+        option = self.option | orjson.OPT_INDENT_2 if indent else self.option
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, indent=bool(kwargs.get("indent"))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def provider_class(name):
+    """Resolve a JSON_PROVIDER setting to a provider class."""
+    name = (name or "auto").lower()
+    if name not in ("auto", "orjson", "stdlib"):
+        raise ValueError(f"Unknown JSON_PROVIDER '{name}' (expected auto, orjson or stdlib)")
+    if name == "stdlib" or orjson is None:
+        return StdlibJSONProvider
+    return OrjsonProvider
+
+
+def install(app):
+    """Install the configured JSON provider on `app`."""
+    name = app.config.setdefault("JSON_PROVIDER", os.getenv("JSON_PROVIDER", "auto"))
+    cls = provider_class(name)
+    if name == "orjson" and cls is not OrjsonProvider:
+        app.logger.warning("JSON_PROVIDER=orjson but orjson is not installed; using the stdlib provider")
+    app.json_provider_class = cls
+    app.json = cls(app)
+    return app.json
@@ -0,0 +1,98 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables; it never alters an
+existing table or adds indexes. Each module `vNNN_<name>.py` in this package
+describes one schema change with `upgrade(conn)` / `downgrade(conn)`, and the
+applied versions are recorded in the `schema_migrations` table.
+
+Usage:
+    python -m app.migrations status
+    python -m app.migrations upgrade [target]
+    python -m app.migrations downgrade <target>
+"""
+import importlib
+import pkgutil
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+from app.db import Base
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String(255))
+    applied_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class MigrationError(Exception):
+    """Raised when a requested migration target is invalid."""
+
+
+def load_migrations():
+    """Import every vNNN_* module in this package, ordered by version."""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        if info.name.startswith("v") and info.name[1:4].isdigit():
+            migrations.append(importlib.import_module(f"{__name__}.{info.name}"))
+    migrations.sort(key=lambda m: m.version)
+    return migrations
+
+
+def applied_versions(engine):
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        rows = conn.execute(SchemaMigration.__table__.select()).all()
+    return {row.version for row in rows}
+
+
+def current_version(engine):
+    versions = applied_versions(engine)
+    return max(versions) if versions else 0
+
+
+def upgrade(engine, target=None, verbose=False):
+    """Apply all pending migrations up to and including `target` (default: latest)."""
+    done = applied_versions(engine)
+    applied = []
+    for migration in load_migrations():
+        if target is not None and migration.version > target:
+            break
+        if migration.version in done:
+            continue
+        # Steps are idempotent (IF NOT EXISTS / column checks), so a migration
+        # interrupted before its version row is written can simply be re-run.
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now(timezone.utc),
+            ))
+        applied.append(migration.version)
+        if verbose:
+            print(f"Applied {migration.version:03d}: {migration.description}")
+    return applied
+
+
+def downgrade(engine, target, verbose=False):
+    """Roll back applied migrations newer than `target`, newest first."""
+    if target < 0:
+        raise MigrationError("Downgrade target must be >= 0")
+    done = applied_versions(engine)
+    reverted = []
+    for migration in reversed(load_migrations()):
+        if migration.version <= target or migration.version not in done:
+            continue
+        with engine.begin() as conn:
+            migration.downgrade(conn)
+            conn.execute(SchemaMigration.__table__.delete().where(
+                SchemaMigration.version == migration.version
+            ))
+        reverted.append(migration.version)
+        if verbose:
+            print(f"Reverted {migration.version:03d}: {migration.description}")
+    return reverted
@@ -0,0 +1,50 @@
+import argparse
+
+from sqlalchemy import create_engine
+
+from app.db import Base, engine as default_engine
+from app.migrations import (
+    MigrationError, load_migrations, applied_versions, upgrade, downgrade
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Manage schema migrations")
+    parser.add_argument("--database", help="SQLAlchemy URL (defaults to the app database)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="List migrations and whether they are applied")
+    up = sub.add_parser("upgrade", help="Apply pending migrations")
+    up.add_argument("target", type=int, nargs="?", default=None)
+    down = sub.add_parser("downgrade", help="Roll back migrations newer than target")
+    down.add_argument("target", type=int)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database) if args.database else default_engine
+
+    # Register every model so create_all sees the full schema
+    import app.routes.observation  # noqa: F401
+    import app.rollups  # noqa: F401
+    import app.write_behind  # noqa: F401
+    import app.idempotency  # noqa: F401
+
+    if args.command == "status":
+        done = applied_versions(engine)
+        for migration in load_migrations():
+            mark = "x" if migration.version in done else " "
+            print(f"[{mark}] {migration.version:03d} {migration.description}")
+    elif args.command == "upgrade":
+        Base.metadata.create_all(bind=engine)
+        applied = upgrade(engine, args.target, verbose=True)
+        if not applied:
+            print("Database is up to date.")
+    else:
+        try:
+            reverted = downgrade(engine, args.target, verbose=True)
+        except MigrationError as e:
+            parser.error(str(e))
+        if not reverted:
+            print("Nothing to roll back.")
+
+
+if __name__ == "__main__":
+    main()
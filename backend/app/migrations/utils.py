@@ -0,0 +1,40 @@
+"""
+Schema inspection helpers shared by migration scripts.
+All helpers take a SQLAlchemy Connection that is already inside a transaction.
+"""
+from sqlalchemy import text
+
+
+def has_table(conn, table):
+    row = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = :name"),
+        {"name": table},
+    ).first()
+    return row is not None
+
+
+def has_column(conn, table, column):
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).all()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn, table, column, ddl_type):
+    """Add a column unless it already exists (create_all may have made it)."""
+    if has_table(conn, table) and not has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def drop_column(conn, table, column):
+    if has_table(conn, table) and has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+
+def create_index(conn, name, table, columns, unique=False):
+    """Build an index on an existing (possibly populated) table."""
+    if has_table(conn, table):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def drop_index(conn, name):
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -0,0 +1,24 @@
+"""
+Add the email verification / OTP columns to users.
+Replaces the ad-hoc migrate_db.py script for databases created before US-16.
+"""
+from app.migrations.utils import add_column, drop_column
+
+version = 1
+description = "users: is_verified, otp_code, otp_created_at"
+
+COLUMNS = [
+    ("is_verified", "INTEGER DEFAULT 0"),
+    ("otp_code", "VARCHAR(10)"),
+    ("otp_created_at", "DATETIME"),
+]
+
+
+def upgrade(conn):
+    for column, ddl_type in COLUMNS:
+        add_column(conn, "users", column, ddl_type)
+
+
+def downgrade(conn):
+    for column, _ in reversed(COLUMNS):
+        drop_column(conn, "users", column)
@@ -0,0 +1,35 @@
+"""
+Composite indexes for the hot read paths.
+
+- list_obs: product_id IN (...) ORDER BY timestamp DESC, id DESC
+- list_obs (Pro Plan) / keyset pages: ORDER BY timestamp DESC, id DESC
+- filter_observations: satellite_id = ? ORDER BY timestamp DESC, id DESC
+- entitlement checks and Stripe fulfillment: user_id = ? AND product_id = ?
+- get_usage_stats: api_usage.timestamp >= ?
+"""
+from sqlalchemy import text
+
+from app.migrations.utils import create_index, drop_index
+
+version = 2
+description = "hot path indexes on observations, subscriptions and api_usage"
+
+INDEXES = [
+    ("ix_observations_product_timestamp", "observations", ["product_id", "timestamp"]),
+    ("ix_observations_satellite_timestamp", "observations", ["satellite_id", "timestamp"]),
+    ("ix_observations_timestamp", "observations", ["timestamp"]),
+    ("ix_subscriptions_user_product", "subscriptions", ["user_id", "product_id"]),
+    ("ix_api_usage_timestamp", "api_usage", ["timestamp"]),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+    # Refresh planner statistics so the new indexes are picked up straight away
+    conn.execute(text("ANALYZE"))
+
+
+def downgrade(conn):
+    for name, _, _ in reversed(INDEXES):
+        drop_index(conn, name)
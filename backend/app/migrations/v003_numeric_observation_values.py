@@ -0,0 +1,59 @@
+"""
+Typed value columns on observations.
+
+`value` is free text ("0.85", "312", "Detected"), so range filters and sorts
+could not run in SQL. This adds value_numeric / value_status, backfills them
+from existing rows and indexes them for range scans.
+"""
+from sqlalchemy import text
+
+from app.migrations.utils import add_column, drop_column, create_index, drop_index, has_table
+
+version = 3
+description = "observations: value_numeric, value_status + range indexes"
+
+BATCH_SIZE = 1000
+
+INDEXES = [
+    ("ix_observations_value_numeric", "observations", ["value_numeric"]),
+    ("ix_observations_product_value", "observations", ["product_id", "value_numeric"]),
+    ("ix_observations_unit_value", "observations", ["unit", "value_numeric"]),
+    ("ix_observations_value_status", "observations", ["value_status"]),
+]
+
+
+def upgrade(conn):
+    from app.routes.observation import split_value
+
+    if not has_table(conn, "observations"):
+        return
+    add_column(conn, "observations", "value_numeric", "FLOAT")
+    add_column(conn, "observations", "value_status", "VARCHAR(20)")
+
+    # Backfill in id order, one batch at a time
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, value FROM observations WHERE id > :last AND value IS NOT NULL "
+            "ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH_SIZE}).all()
+        if not rows:
+            break
+        params = []
+        for row_id, value in rows:
+            numeric, status = split_value(value)
+            params.append({"id": row_id, "num": numeric, "status": status})
+        conn.execute(text(
+            "UPDATE observations SET value_numeric = :num, value_status = :status WHERE id = :id"
+        ), params)
+        last_id = rows[-1][0]
+
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+
+
+def downgrade(conn):
+    for name, _, _ in reversed(INDEXES):
+        drop_index(conn, name)
+    drop_column(conn, "observations", "value_status")
+    drop_column(conn, "observations", "value_numeric")
@@ -0,0 +1,91 @@
+"""
+Parsed lat/lon columns and an R*Tree spatial index on observations.
+
+Backfills lat/lon from the free-text `coordinates`, then (re)builds
+observations_rtree and the triggers that keep it in sync with every write
+path, ORM or Core. Without R*Tree support a (lat, lon) B-tree index is used.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.migrations.utils import add_column, drop_column, create_index, drop_index, has_table
+from app.spatial import RTREE_TABLE, parse_coordinates
+
+version = 4
+description = "observations: lat, lon + R*Tree spatial index"
+
+BATCH_SIZE = 1000
+
+TRIGGERS = {
+    "observations_rtree_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS observations_rtree_insert AFTER INSERT ON observations
+        WHEN NEW.lat IS NOT NULL AND NEW.lon IS NOT NULL
+        BEGIN
+            INSERT INTO {RTREE_TABLE} VALUES (NEW.id, NEW.lon, NEW.lon, NEW.lat, NEW.lat);
+        END""",
+    "observations_rtree_update": f"""
+        CREATE TRIGGER IF NOT EXISTS observations_rtree_update AFTER UPDATE OF lat, lon ON observations
+        BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+            INSERT INTO {RTREE_TABLE}
+                SELECT NEW.id, NEW.lon, NEW.lon, NEW.lat, NEW.lat
+                WHERE NEW.lat IS NOT NULL AND NEW.lon IS NOT NULL;
+        END""",
+    "observations_rtree_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS observations_rtree_delete AFTER DELETE ON observations
+        BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+        END""",
+}
+
+
+def _backfill(conn):
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, coordinates FROM observations WHERE id > :last ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH_SIZE}).all()
+        if not rows:
+            break
+        params = []
+        for row_id, coordinates in rows:
+            lat, lon = parse_coordinates(coordinates)
+            params.append({"id": row_id, "lat": lat, "lon": lon})
+        conn.execute(text("UPDATE observations SET lat = :lat, lon = :lon WHERE id = :id"), params)
+        last_id = rows[-1][0]
+
+
+def upgrade(conn):
+    if not has_table(conn, "observations"):
+        return
+    add_column(conn, "observations", "lat", "FLOAT")
+    add_column(conn, "observations", "lon", "FLOAT")
+    _backfill(conn)
+
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} "
+            "USING rtree(id, min_lon, max_lon, min_lat, max_lat)"
+        ))
+    except OperationalError:
+        # SQLite built without R*Tree: fall back to a plain composite index
+        create_index(conn, "ix_observations_lat_lon", "observations", ["lat", "lon"])
+        return
+
+    # Rebuild from scratch: the virtual table can outlive a dropped observations table
+    conn.execute(text(f"DELETE FROM {RTREE_TABLE}"))
+    conn.execute(text(
+        f"INSERT INTO {RTREE_TABLE} SELECT id, lon, lon, lat, lat FROM observations "
+        "WHERE lat IS NOT NULL AND lon IS NOT NULL"
+    ))
+    for ddl in TRIGGERS.values():
+        conn.execute(text(ddl))
+
+
+def downgrade(conn):
+    for name in TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {RTREE_TABLE}"))
+    drop_index(conn, "ix_observations_lat_lon")
+    drop_column(conn, "observations", "lon")
+    drop_column(conn, "observations", "lat")
@@ -0,0 +1,92 @@
+"""
+Structured spectral indices.
+
+Rewrites legacy Python-repr `spectral_indices` text ("{'NDVI': 0.42}") as JSON
+objects, then fills observation_spectral_indices (one row per index, indexed on
+name/value) and installs the triggers that keep it in sync on every write.
+"""
+import json
+
+from sqlalchemy import text
+
+from app.migrations.utils import has_table
+
+version = 5
+description = "observations: JSON spectral_indices + indexed child table"
+
+BATCH_SIZE = 1000
+
+# Invalid JSON is swapped for an empty object so a bad document can never
+# make the triggering write fail.
+INSERT_INDICES = """
+    INSERT OR REPLACE INTO observation_spectral_indices (observation_id, name, value)
+    SELECT NEW.id, upper(key), value
+    FROM json_each(CASE WHEN json_valid(NEW.spectral_indices) THEN NEW.spectral_indices ELSE '{}' END)
+    WHERE type IN ('integer', 'real')
+"""
+
+BACKFILL = """
+    INSERT OR REPLACE INTO observation_spectral_indices (observation_id, name, value)
+    SELECT o.id, upper(j.key), j.value
+    FROM observations AS o, json_each(o.spectral_indices) AS j
+    WHERE o.spectral_indices IS NOT NULL AND j.type IN ('integer', 'real')
+"""
+
+TRIGGERS = {
+    "observations_spectral_insert": """
+        CREATE TRIGGER IF NOT EXISTS observations_spectral_insert AFTER INSERT ON observations
+        WHEN NEW.spectral_indices IS NOT NULL
+        BEGIN
+            {insert};
+        END""".format(insert=INSERT_INDICES),
+    "observations_spectral_update": """
+        CREATE TRIGGER IF NOT EXISTS observations_spectral_update AFTER UPDATE OF spectral_indices ON observations
+        BEGIN
+            DELETE FROM observation_spectral_indices WHERE observation_id = OLD.id;
+            {insert};
+        END""".format(insert=INSERT_INDICES),
+    "observations_spectral_delete": """
+        CREATE TRIGGER IF NOT EXISTS observations_spectral_delete AFTER DELETE ON observations
+        BEGIN
+            DELETE FROM observation_spectral_indices WHERE observation_id = OLD.id;
+        END""",
+}
+
+
+def _convert_legacy_text(conn):
+    from app.spectral import parse_spectral_indices
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, spectral_indices FROM observations WHERE id > :last "
+            "AND spectral_indices IS NOT NULL ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH_SIZE}).all()
+        if not rows:
+            break
+        params = []
+        for row_id, raw in rows:
+            indices = parse_spectral_indices(raw)
+            params.append({"id": row_id, "doc": json.dumps(indices) if indices else None})
+        conn.execute(text("UPDATE observations SET spectral_indices = :doc WHERE id = :id"), params)
+        last_id = rows[-1][0]
+
+
+def upgrade(conn):
+    from app.routes.observation import SpectralIndexValue
+
+    if not has_table(conn, "observations"):
+        return
+    _convert_legacy_text(conn)
+
+    SpectralIndexValue.__table__.create(bind=conn, checkfirst=True)
+    conn.execute(text("DELETE FROM observation_spectral_indices"))
+    conn.execute(text(BACKFILL))
+    for ddl in TRIGGERS.values():
+        conn.execute(text(ddl))
+
+
+def downgrade(conn):
+    for name in TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    conn.execute(text("DROP TABLE IF EXISTS observation_spectral_indices"))
@@ -0,0 +1,33 @@
+"""
+Per-product data versions (app/versions.py).
+
+Creates data_versions, gives every product that already has observations
+version 1, and stores a random database epoch in row 0.
+"""
+import secrets
+
+from sqlalchemy import text
+
+from app.migrations.utils import has_table
+
+version = 6
+description = "data_versions table for ETag / cache invalidation"
+
+
+def upgrade(conn):
+    from app.versions import DataVersion, EPOCH_ID
+
+    DataVersion.__table__.create(bind=conn, checkfirst=True)
+    if has_table(conn, "observations"):
+        conn.execute(text(
+            "INSERT OR IGNORE INTO data_versions (product_id, version) "
+            "SELECT DISTINCT product_id, 1 FROM observations WHERE product_id IS NOT NULL"
+        ))
+    conn.execute(
+        text("INSERT OR IGNORE INTO data_versions (product_id, version) VALUES (:id, :epoch)"),
+        {"id": EPOCH_ID, "epoch": secrets.randbits(31)},
+    )
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS data_versions"))
@@ -0,0 +1,31 @@
+"""
+Minute/hour/day rollups of observation values (app/rollups).
+
+Creates the rollup tables, fills them from the existing observations and
+installs the triggers that keep them current on every write.
+"""
+from sqlalchemy import text
+
+from app.migrations.utils import has_table
+
+version = 7
+description = "observation rollup tables (minute/hour/day) + triggers"
+
+
+def upgrade(conn):
+    from app import rollups
+
+    if not has_table(conn, "observations"):
+        return
+    rollups.rebuild(conn)
+    for ddl in rollups.trigger_ddl().values():
+        conn.execute(text(ddl))
+
+
+def downgrade(conn):
+    from app import rollups
+
+    for name in rollups.trigger_ddl():
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    for table in rollups.TABLES.values():
+        conn.execute(text(f"DROP TABLE IF EXISTS {table.name}"))
@@ -0,0 +1,17 @@
+"""
+Outcome table for write-behind ingest tickets (app/write_behind.py).
+"""
+from sqlalchemy import text
+
+version = 8
+description = "ingest_tickets table for write-behind ingest"
+
+
+def upgrade(conn):
+    from app.write_behind import IngestTicket
+
+    IngestTicket.__table__.create(bind=conn, checkfirst=True)
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS ingest_tickets"))
@@ -0,0 +1,34 @@
+"""
+Retry-safe ingest (app/idempotency.py, content_hash in app/routes/observation.py).
+
+Adds observations.content_hash, builds the unique index on it and creates
+idempotency_keys. Existing rows are not backfilled: only client-supplied
+timestamps are hashed, and a stored timestamp does not say whether the
+client sent it or the server assigned it.
+"""
+from sqlalchemy import text
+
+from app.migrations.utils import add_column, drop_column, create_index, drop_index, has_table
+
+version = 9
+description = "observations.content_hash unique index + idempotency_keys"
+
+INDEX = ("ux_observations_content_hash", "observations", ["content_hash"])
+
+
+def upgrade(conn):
+    from app.idempotency import IdempotencyKey
+
+    IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+    if not has_table(conn, "observations"):
+        return
+    add_column(conn, "observations", "content_hash", "VARCHAR(32)")
+
+    name, table, columns = INDEX
+    create_index(conn, name, table, columns, unique=True)
+
+
+def downgrade(conn):
+    drop_index(conn, INDEX[0])
+    drop_column(conn, "observations", "content_hash")
+    conn.execute(text("DROP TABLE IF EXISTS idempotency_keys"))
@@ -0,0 +1,36 @@
+"""
+Delta-maintained rollups (app/rollups).
+
+Replaces v007's update/delete triggers, which recomputed the whole bucket of
+every changed row, with triggers that subtract the old row and fold in the
+new one, rescanning a bucket only when its min or max was removed. Set-based
+UPDATE/DELETE then costs O(rows) instead of O(rows x bucket size).
+"""
+from sqlalchemy import text
+
+from app.migrations.utils import has_table
+
+version = 10
+description = "incremental rollup update/delete triggers"
+
+
+def _replace_triggers(conn, incremental):
+    from app import rollups
+
+    ddl = rollups.trigger_ddl(incremental=incremental)
+    for name, statement in ddl.items():
+        if name.rsplit("_", 1)[1] in rollups.INCREMENTAL_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(statement))
+
+
+def upgrade(conn):
+    if not has_table(conn, "observations"):
+        return
+    _replace_triggers(conn, incremental=True)
+
+
+def downgrade(conn):
+    if not has_table(conn, "observations"):
+        return
+    _replace_triggers(conn, incremental=False)
@@ -0,0 +1,122 @@
+"""
+Keyset (cursor) pagination helpers for observation listings.
+
+Pages are ordered on (sort column, id) and the cursor encodes the last row's
+key, so fetching page N costs the same index seek as fetching page 1.
+The cursor is an opaque url-safe token; clients must pass it back unchanged.
+"""
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from sqlalchemy import or_, and_, tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    """Raised when the limit or cursor query parameters are invalid."""
+
+
+def sort_key(column, descending):
+    """Name of a sort order, e.g. '-timestamp'; cursors are only valid for their own order."""
+    return f"-{column.key}" if descending else column.key
+
+
+def encode_cursor(sort_value, row_id, key=None):
+    """Build an opaque cursor token from the last row's sort key and id."""
+    payload = {"k": sort_value, "i": row_id}
+    if isinstance(sort_value, datetime):
+        payload.update(t="dt", k=sort_value.isoformat())
+    if key:
+        payload["s"] = key
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (sort_value, row_id, key) from a cursor token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value = payload["k"]
+        if payload.get("t") == "dt" and sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(payload["i"]), payload.get("s")
+    except (ValueError, KeyError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+
+def parse_page_args(args):
+    """
+    Read `limit` and `cursor` from request args.
+    The limit defaults to DEFAULT_PAGE_SIZE and is capped at MAX_PAGE_SIZE.
+    """
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = args.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def _after(column, id_column, cursor, descending):
+    """SQL condition selecting the rows that come after the cursor position."""
+    sort_value, row_id, _ = cursor
+    # SQLite sorts NULLs first ascending and last descending
+    if descending:
+        if sort_value is None:
+            return and_(column.is_(None), id_column < row_id)
+        return or_(tuple_(column, id_column) < tuple_(sort_value, row_id), column.is_(None))
+    if sort_value is None:
+        return or_(and_(column.is_(None), id_column > row_id), column.isnot(None))
+    return tuple_(column, id_column) > tuple_(sort_value, row_id)
+
+
+def paginate(query, column, id_column, limit, cursor=None, descending=True, key_of=None):
+    """
+    Apply keyset ordering and return (rows, next_cursor).
+    next_cursor is None when the last page has been reached.
+    `key_of(row)` returns the (sort value, id) of a row when they cannot be
+    read as plain attributes named after the columns.
+    """
+    key = sort_key(column, descending)
+    if cursor is not None:
+        if cursor[2] not in (None, key):
+            raise PaginationError("Cursor does not match the requested sort order")
+        query = query.filter(_after(column, id_column, cursor, descending))
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    if key_of is not None:
+        sort_value, row_id = key_of(last)
+    else:
+        sort_value, row_id = getattr(last, column.key), getattr(last, id_column.key)
+    next_cursor = encode_cursor(sort_value, row_id, key)
+    return rows, next_cursor
+
+
+def add_cursor_headers(response, next_cursor, request):
+    """Expose the next page through X-Next-Cursor and an RFC 8288 Link header."""
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
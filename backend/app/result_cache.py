@@ -0,0 +1,166 @@
+"""
+In-process result cache for the observation list and filter endpoints.
+
+Identical reads (same normalized query parameters, same entitlement set)
+are served from an LRU of rendered response bodies bounded by total bytes.
+Keys embed the data versions of the products involved (the same fingerprint
+as the ETag, see app/versions.py), so an entry can never outlive a write.
+Entries are also tagged by product id and dropped as soon as a write to
+one of their products commits, which frees the memory straight away.
+
+Config:
+    RESULT_CACHE_ENABLED    default True
+    RESULT_CACHE_MAX_BYTES  default 32 MiB; bodies over 1/8 of this are not cached
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+from flask import current_app
+
+from app import versions
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Tag for entries that can contain any product (Pro Plan / unfiltered reads)
+ALL_PRODUCTS = "*"
+# Response headers replayed from a cached entry
+CACHED_HEADERS = ("X-Next-Cursor", "Link", "X-Downsampled-From")
+
+_caches = weakref.WeakSet()
+
+
+class _Entry:
+    __slots__ = ("body", "headers", "mimetype", "tags")
+
+    def __init__(self, body, headers, mimetype, tags):
+        self.body = body
+        self.headers = headers
+        self.mimetype = mimetype
+        self.tags = tags
+
+
+class ResultCache:
+    """Thread-safe LRU of response bodies with a byte budget and product tags."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_tag = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        _caches.add(self)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, headers, mimetype, product_ids):
+        """Store a body; product_ids=None tags it with every product."""
+        if len(body) > self.max_bytes // 8:
+            return
+        tags = frozenset(product_ids) if product_ids is not None else frozenset([ALL_PRODUCTS])
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(body, headers, mimetype, tags)
+            self.size += len(body)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, product_ids):
+        """Drop every entry that may contain one of `product_ids`."""
+        with self._lock:
+            keys = set(self._by_tag.get(ALL_PRODUCTS, ()))
+            for pid in product_ids:
+                keys |= self._by_tag.get(pid, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+@versions.on_commit
+def _invalidate_all(product_ids):
+    for cache in list(_caches):
+        cache.invalidate(product_ids)
+
+
+def install(app):
+    """Create the app's result cache (app.extensions['result_cache'])."""
+    app.config.setdefault("RESULT_CACHE_ENABLED", True)
+    app.config.setdefault("RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+    app.extensions["result_cache"] = ResultCache(app.config["RESULT_CACHE_MAX_BYTES"])
+
+
+def get_cache():
+    """The current app's cache, or None when disabled."""
+    if not current_app.config.get("RESULT_CACHE_ENABLED"):
+        return None
+    return current_app.extensions.get("result_cache")
+
+
+def cache_key(etag, product_ids):
+    """Normalized params + data versions (both inside the ETag) + entitlement set."""
+    scope = ALL_PRODUCTS if product_ids is None else tuple(sorted(product_ids))
+    return etag, scope
+
+
+def cached_response(key):
+    """Rebuild a response from the cache, or None on a miss."""
+    cache = get_cache()
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        return None
+    return current_app.response_class(entry.body, headers=entry.headers, mimetype=entry.mimetype)
+
+
+def store(key, response, product_ids):
+    """Cache a fully built, non-streamed 200 response."""
+    cache = get_cache()
+    if cache is None or response.is_streamed or response.status_code != 200:
+        return
+    headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+    cache.put(key, response.get_data(), headers, response.mimetype, product_ids)
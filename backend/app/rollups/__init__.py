@@ -0,0 +1,224 @@
+"""
+Time-series rollups of observation values.
+
+For each resolution (minute, hour, day) a table holds, per product, satellite
+and time bucket: the row count and the count/min/max/sum/sum-of-squares of
+value_numeric. SQLite triggers (installed by migration v007) keep them
+current inside the same transaction as every insert, update and delete on
+observations. Every write applies deltas: a new row folds into its bucket
+with an UPSERT and an old row's count/sum/sum-of-squares are subtracted, so
+a set-based UPDATE/DELETE costs O(rows). Only when the removed value was the
+bucket's min or max is that bucket rescanned (min/max cannot be "un-merged").
+
+`python -m app.rollups rebuild` regenerates every table from scratch.
+"""
+import math
+from datetime import datetime
+
+from sqlalchemy import Column, Float, Integer, String, Table, text
+
+from app.db import Base
+
+# name -> (strftime format of the bucket start, SQLite modifier for the bucket end, seconds)
+RESOLUTIONS = {
+    "minute": ("%Y-%m-%d %H:%M:00", "+1 minute", 60),
+    "hour": ("%Y-%m-%d %H:00:00", "+1 hour", 3600),
+    "day": ("%Y-%m-%d 00:00:00", "+1 day", 86400),
+}
+# product_id / satellite_id are part of the primary key, so NULLs are stored as these
+NO_PRODUCT = 0
+NO_SATELLITE = ""
+
+
+def _rollup_table(resolution):
+    return Table(
+        f"observation_rollups_{resolution}", Base.metadata,
+        Column("product_id", Integer, primary_key=True),
+        Column("satellite_id", String(100), primary_key=True),
+        Column("bucket", String(19), primary_key=True),  # 'YYYY-MM-DD HH:MM:SS' bucket start
+        Column("count", Integer, nullable=False),         # all observations
+        Column("value_count", Integer, nullable=False),   # observations with a numeric value
+        Column("value_min", Float),
+        Column("value_max", Float),
+        Column("value_sum", Float, nullable=False),
+        Column("value_sumsq", Float, nullable=False),
+    )
+
+
+TABLES = {resolution: _rollup_table(resolution) for resolution in RESOLUTIONS}
+
+
+def _bucket_sql(resolution, row):
+    return f"strftime('{RESOLUTIONS[resolution][0]}', {row}.timestamp)"
+
+
+def _aggregate_sql(resolution, where):
+    """INSERT ... SELECT recomputing the buckets of the observations matching `where`."""
+    fmt = RESOLUTIONS[resolution][0]
+    return f"""
+        INSERT INTO {TABLES[resolution].name}
+            (product_id, satellite_id, bucket, count, value_count, value_min, value_max, value_sum, value_sumsq)
+        SELECT coalesce(product_id, {NO_PRODUCT}), coalesce(satellite_id, '{NO_SATELLITE}'),
+               strftime('{fmt}', timestamp), count(*), count(value_numeric),
+               min(value_numeric), max(value_numeric),
+               total(value_numeric), total(value_numeric * value_numeric)
+        FROM observations
+        WHERE timestamp IS NOT NULL AND {where}
+        GROUP BY 1, 2, 3"""
+
+
+def _match_sql(resolution, row):
+    """WHERE clause selecting the rollup row of the bucket `row` (OLD or NEW) falls into."""
+    return (
+        f"product_id = coalesce({row}.product_id, {NO_PRODUCT}) "
+        f"AND satellite_id = coalesce({row}.satellite_id, '{NO_SATELLITE}') "
+        f"AND bucket = {_bucket_sql(resolution, row)}"
+    )
+
+
+def _source_sql(resolution, row):
+    """WHERE clause selecting the observations of the bucket `row` falls into."""
+    bucket = _bucket_sql(resolution, row)
+    end = f"datetime({bucket}, '{RESOLUTIONS[resolution][1]}')"
+    return (
+        f"observations.product_id IS {row}.product_id AND observations.satellite_id IS {row}.satellite_id "
+        f"AND observations.timestamp >= {bucket} AND observations.timestamp < {end}"
+    )
+
+
+def _add_sql(resolution, row):
+    """Fold `row` into its bucket (UPSERT)."""
+    table = TABLES[resolution].name
+    return f"""
+        INSERT INTO {table}
+            (product_id, satellite_id, bucket, count, value_count, value_min, value_max, value_sum, value_sumsq)
+        SELECT coalesce({row}.product_id, {NO_PRODUCT}), coalesce({row}.satellite_id, '{NO_SATELLITE}'),
+               {_bucket_sql(resolution, row)}, 1, {row}.value_numeric IS NOT NULL,
+               {row}.value_numeric, {row}.value_numeric,
+               coalesce({row}.value_numeric, 0), coalesce({row}.value_numeric * {row}.value_numeric, 0)
+        WHERE {row}.timestamp IS NOT NULL
+        ON CONFLICT (product_id, satellite_id, bucket) DO UPDATE SET
+            count = count + 1,
+            value_count = value_count + excluded.value_count,
+            value_min = CASE WHEN value_min IS NULL OR excluded.value_min < value_min
+                             THEN coalesce(excluded.value_min, value_min) ELSE value_min END,
+            value_max = CASE WHEN value_max IS NULL OR excluded.value_max > value_max
+                             THEN coalesce(excluded.value_max, value_max) ELSE value_max END,
+            value_sum = value_sum + excluded.value_sum,
+            value_sumsq = value_sumsq + excluded.value_sumsq"""
+
+
+def _remove_sql(resolution, row):
+    """Subtract `row` from its bucket; rescan min/max only if `row` held one of them."""
+    table = TABLES[resolution].name
+    match = _match_sql(resolution, row)
+    source = _source_sql(resolution, row)
+    has_value = f"({row}.value_numeric IS NOT NULL)"
+    return f"""
+        UPDATE {table} SET
+            count = count - 1,
+            value_count = value_count - {has_value},
+            value_sum = CASE WHEN value_count = {has_value} THEN 0
+                             ELSE value_sum - coalesce({row}.value_numeric, 0) END,
+            value_sumsq = CASE WHEN value_count = {has_value} THEN 0
+                               ELSE value_sumsq - coalesce({row}.value_numeric * {row}.value_numeric, 0) END
+        WHERE {match};
+        DELETE FROM {table} WHERE {match} AND count = 0;
+        UPDATE {table} SET
+            value_min = (SELECT min(value_numeric) FROM observations WHERE {source}),
+            value_max = (SELECT max(value_numeric) FROM observations WHERE {source})
+        WHERE {match} AND ({row}.value_numeric <= value_min OR {row}.value_numeric >= value_max)"""
+
+
+def _refresh_bucket_sql(resolution, row):
+    """Recompute the single bucket `row` (OLD or NEW) falls into (pre-v010 triggers)."""
+    table = TABLES[resolution].name
+    return (f"DELETE FROM {table} WHERE {_match_sql(resolution, row)};\n"
+            f"{_aggregate_sql(resolution, _source_sql(resolution, row))}")
+
+
+# Trigger kinds whose body depends on trigger_ddl(incremental=...); swapped by v010
+INCREMENTAL_TRIGGERS = ("update", "delete")
+
+
+def trigger_ddl(incremental=True):
+    """
+    name -> CREATE TRIGGER statement for every resolution. incremental=False
+    gives the pre-v010 update/delete triggers that rescan whole buckets.
+    """
+    triggers = {}
+    for resolution in RESOLUTIONS:
+        triggers[f"observations_rollup_{resolution}_insert"] = f"""
+            CREATE TRIGGER IF NOT EXISTS observations_rollup_{resolution}_insert
+            AFTER INSERT ON observations WHEN NEW.timestamp IS NOT NULL
+            BEGIN
+                {_add_sql(resolution, 'NEW')};
+            END"""
+        if incremental:
+            update_body = f"{_remove_sql(resolution, 'OLD')};\n{_add_sql(resolution, 'NEW')};"
+            delete_body = f"{_remove_sql(resolution, 'OLD')};"
+        else:
+            update_body = f"{_refresh_bucket_sql(resolution, 'OLD')};\n{_refresh_bucket_sql(resolution, 'NEW')};"
+            delete_body = f"{_refresh_bucket_sql(resolution, 'OLD')};"
+        triggers[f"observations_rollup_{resolution}_update"] = f"""
+            CREATE TRIGGER IF NOT EXISTS observations_rollup_{resolution}_update
+            AFTER UPDATE OF timestamp, product_id, satellite_id, value_numeric ON observations
+            WHEN OLD.timestamp IS NOT NEW.timestamp OR OLD.product_id IS NOT NEW.product_id
+                 OR OLD.satellite_id IS NOT NEW.satellite_id OR OLD.value_numeric IS NOT NEW.value_numeric
+            BEGIN
+                {update_body}
+            END"""
+        triggers[f"observations_rollup_{resolution}_delete"] = f"""
+            CREATE TRIGGER IF NOT EXISTS observations_rollup_{resolution}_delete
+            AFTER DELETE ON observations WHEN OLD.timestamp IS NOT NULL
+            BEGIN
+                {delete_body}
+            END"""
+    return triggers
+
+
+def rebuild(conn, resolutions=None):
+    """Regenerate rollups from observations (all resolutions by default)."""
+    for resolution in resolutions or RESOLUTIONS:
+        TABLES[resolution].create(bind=conn, checkfirst=True)
+        conn.execute(text(f"DELETE FROM {TABLES[resolution].name}"))
+        conn.execute(text(_aggregate_sql(resolution, "1")))
+
+
+def pick_resolution(start, end, max_points):
+    """
+    The finest resolution whose bucket count over [start, end] fits in
+    max_points; the coarsest one when none does.
+
+    Finest-fit is deliberate: every coarser resolution also fits the budget,
+    so "the coarsest that fits" would always be day (a 2-hour chart would
+    get a single point). The finest fitting level is the coarsest one that
+    still gives the chart the detail its point budget asks for.
+    """
+    span = max((end - start).total_seconds(), 0)
+    for resolution, (_, _, seconds) in RESOLUTIONS.items():
+        if math.floor(span / seconds) + 1 <= max_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def bucket_key(resolution, moment):
+    """The stored bucket string a datetime falls into."""
+    return moment.strftime(RESOLUTIONS[resolution][0])
+
+
+def series_point(bucket, count, value_count, low, high, total, total_sq):
+    """One aggregated bucket as served by /api/observations/series."""
+    mean = total / value_count if value_count else None
+    stddev = None
+    if value_count:
+        stddev = math.sqrt(max(total_sq / value_count - mean * mean, 0.0))
+    return {
+        "t": datetime.fromisoformat(bucket).isoformat(),
+        "count": count,
+        "value_count": value_count,
+        "min": low,
+        "max": high,
+        "mean": mean,
+        "stddev": stddev,
+    }
@@ -0,0 +1,31 @@
+import argparse
+
+from sqlalchemy import create_engine, text
+
+from app.db import engine as default_engine
+from app.rollups import RESOLUTIONS, TABLES, rebuild
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.rollups", description="Maintain observation rollups")
+    parser.add_argument("--database", help="SQLAlchemy URL (defaults to the app database)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="Regenerate rollup tables from observations")
+    rebuild_cmd.add_argument("resolutions", nargs="*", help=f"subset of {', '.join(RESOLUTIONS)} (default: all)")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.resolutions) - set(RESOLUTIONS)
+    if unknown:
+        parser.error(f"unknown resolution(s): {', '.join(sorted(unknown))}")
+    resolutions = args.resolutions or list(RESOLUTIONS)
+
+    engine = create_engine(args.database) if args.database else default_engine
+    with engine.begin() as conn:
+        rebuild(conn, resolutions)
+        for resolution in resolutions:
+            buckets = conn.execute(text(f"SELECT count(*) FROM {TABLES[resolution].name}")).scalar()
+            print(f"{resolution}: {buckets} buckets")
+
+
+if __name__ == "__main__":
+    main()
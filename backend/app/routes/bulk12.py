@@ -1,45 +1,121 @@
 from flask import request, jsonify, g
-from app.routes.observation import ObservationRecord
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.entitlements import entitlements
+from app.routes.observation import ObservationRecord, parse_fields, load_fields
+from app.streaming import dumps, stream_mode, stream_response
+
+# Ids per IN (...) query: below SQLite's bound-variable limit (999 before 3.32)
+ID_CHUNK_SIZE = 900
+# Largest id list accepted per request (config BULK_RETRIEVAL_MAX_IDS)
+DEFAULT_MAX_IDS = 100000
+
+NOT_FOUND = {"error": "Record not found", "code": 404}
+FORBIDDEN = {"error": "Subscription required", "code": 403}
 
 def get_db():
     """Helper to get the current request's DB session"""
     return g.db
 
+def bad_request(message):
+    return jsonify({
+        "error": "Bad Request",
+        "message": message,
+        "code": 400
+    }), 400
+
+def parse_id_list(raw):
+    """Ids from a comma-separated string or a JSON list; raises ValueError."""
+    if isinstance(raw, str):
+        return [int(i.strip()) for i in raw.split(',')]
+    if isinstance(raw, list) and all(isinstance(i, int) and not isinstance(i, bool) for i in raw):
+        return raw
+    raise ValueError("IDs must be numeric.")
+
+def iter_outcomes(db, id_list, fields, entitled):
+    """
+    Yield (id, record dict or None, failure or None) in request order.
+    Ids are fetched ID_CHUNK_SIZE at a time, so any list length stays under
+    SQLite's parameter limit; repeated ids are answered once.
+    """
+    unique_ids = list(dict.fromkeys(id_list))
+    for offset in range(0, len(unique_ids), ID_CHUNK_SIZE):
+        chunk = unique_ids[offset:offset + ID_CHUNK_SIZE]
+        query = load_fields(db.query(ObservationRecord), fields, ObservationRecord.product_id)
+        found = {r.id: r for r in query.filter(ObservationRecord.id.in_(chunk))}
+        for obs_id in chunk:
+            record = found.get(obs_id)
+            if record is None:
+                yield obs_id, None, NOT_FOUND
+            elif entitled is not None and record.product_id not in entitled:
+                yield obs_id, None, FORBIDDEN
+            else:
+                yield obs_id, record.to_dict(fields), None
+
 def register(app):
     """
     Registers GeoScope Bulk Retrieval.
     Fulfills US-12 (Updated): Efficiently fetching multiple records in one request.
     """
+    app.config.setdefault("BULK_RETRIEVAL_MAX_IDS", DEFAULT_MAX_IDS)
 
-    @app.route("/api/v1/bulk/insights", methods=["GET"])
-    def get_multiple_insights():
+    def bulk_insights(raw_ids, raw_fields):
         db = get_db()  # per-request session
 
-        # Get comma-separated IDs from query param
-        ids_param = request.args.get('ids')
-        if not ids_param:
-            return jsonify({
-                "error": "Bad Request",
-                "message": "Please provide a comma-separated list of IDs in the 'ids' query parameter.",
-                "code": 400
-            }), 400
-
+        if not raw_ids:
+            return bad_request("Please provide a list of IDs ('ids' query parameter or JSON body).")
         try:
-            id_list = [int(i.strip()) for i in ids_param.split(',')]
+            id_list = parse_id_list(raw_ids)
         except ValueError:
-            return jsonify({
-                "error": "Bad Request",
-                "message": "IDs must be numeric.",
-                "code": 400
-            }), 400
+            return bad_request("IDs must be numeric.")
+        max_ids = app.config["BULK_RETRIEVAL_MAX_IDS"]
+        if len(id_list) > max_ids:
+            return bad_request(f"At most {max_ids} IDs per request.")
 
-        # Query the database for all matching IDs at once
-        records = db.query(ObservationRecord).filter(ObservationRecord.id.in_(id_list)).all()
+        try:
+            if isinstance(raw_fields, list):
+                raw_fields = ",".join(str(f) for f in raw_fields)
+            fields = parse_fields(raw_fields)
+        except ValueError as e:
+            return bad_request(str(e))
+
+        # Access control (None means Pro Plan / all access)
+        entitled = entitlements.resolve(db, get_jwt_identity())
+        outcomes = iter_outcomes(db, id_list, fields, entitled)
+
+        mode = stream_mode(request)
+        if mode:
+            # Stream records chunk by chunk; metadata follows the last one
+            failed = []
+
+            def results():
+                for obs_id, record, failure in outcomes:
+                    if failure is None:
+                        yield record
+                    else:
+                        failed.append({"id": obs_id, **failure})
+
+            def metadata():
+                return {
+                    "total_requested": len(id_list),
+                    "found": len(dict.fromkeys(id_list)) - len(failed),
+                    "failed_count": len(failed),
+                    "failures": failed
+                }
 
-        # Build successful and failed lists
-        found_ids = {r.id for r in records}
-        successful = [r.to_dict() for r in records]
-        failed = [{"id": i, "error": "Record not found"} for i in id_list if i not in found_ids]
+            return stream_response(
+                results(), mode,
+                head='{"results":[',
+                tail=lambda: '],"metadata":' + dumps(metadata()) + '}',
+                ndjson_tail=lambda: {"metadata": metadata()},
+            )
+
+        # Build successful and failed lists, both in request order
+        successful, failed = [], []
+        for obs_id, record, failure in outcomes:
+            if failure is None:
+                successful.append(record)
+            else:
+                failed.append({"id": obs_id, **failure})
 
         # Return results with metadata
         return jsonify({
@@ -51,3 +127,79 @@ def register(app):
                 "failures": failed
             }
         }), 200
+
+    @app.route("/api/v1/bulk/insights", methods=["GET"])
+    @jwt_required()
+    def get_multiple_insights():
+        """
+        Fetch many observations by id (query string variant).
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - name: ids
+            in: query
+            type: string
+            required: true
+            description: Comma-separated ids; results keep this order
+          - name: fields
+            in: query
+            type: string
+            required: false
+          - name: stream
+            in: query
+            type: string
+            required: false
+            description: "'ndjson' or 'json' to stream results as they are fetched"
+        responses:
+          200:
+            description: "{results, metadata: {total_requested, found, failed_count, failures: [{id, error, code}]}}"
+          400:
+            description: Missing, non-numeric or too many ids
+        """
+        return bulk_insights(request.args.get('ids'), request.args.get('fields'))
+
+    @app.route("/api/v1/bulk/insights", methods=["POST"])
+    @jwt_required()
+    def post_multiple_insights():
+        """
+        Fetch many observations by id (JSON body variant, for lists too long for a URL).
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - in: body
+            name: body
+            schema:
+              type: object
+              required:
+                - ids
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: integer
+                  description: Results keep this order
+                fields:
+                  type: array
+                  items:
+                    type: string
+          - name: stream
+            in: query
+            type: string
+            required: false
+            description: "'ndjson' or 'json' to stream results as they are fetched"
+        responses:
+          200:
+            description: "{results, metadata: {total_requested, found, failed_count, failures: [{id, error, code}]}}"
+          400:
+            description: Missing, non-numeric or too many ids
+        """
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return bad_request("Expected a JSON object with an 'ids' list.")
+        return bulk_insights(body.get('ids'), body.get('fields'))
@@ -0,0 +1,212 @@
+"""
+Set-based corrections: PATCH / DELETE many observations in one statement.
+"""
+import json
+import numbers
+
+from flask import request, jsonify, g
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import column, delete, func, select, update
+
+from app import versions
+from app.entitlements import entitlements
+from app.routes.filtering import apply_filters
+from app.routes.observation import ApiUsage, ObservationRecord, derive_columns
+
+# Largest id list accepted per request (sent as one JSON parameter, not one per id)
+DEFAULT_MAX_IDS = 100000
+
+# Fields a bulk PATCH may set -> max length for strings (None: unbounded).
+# Identity fields (product_id, satellite_id, coordinates, timestamp) are
+# excluded: they key the content hash and the spatial index.
+EDITABLE_FIELDS = {
+    "value": 50,
+    "unit": 20,
+    "timezone": 50,
+    "notes": None,
+    "confidence": None,
+    "spectral_indices": None,
+}
+
+def get_db():
+    """Helper to get the current request's DB session"""
+    return g.db
+
+def parse_changes(changes):
+    """Validate the `set` object of a bulk PATCH into column values (derived columns included)."""
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("'set' must be a non-empty object")
+    unknown = [k for k in changes if k not in EDITABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Cannot set: {', '.join(unknown)}. Editable: {', '.join(EDITABLE_FIELDS)}")
+
+    values = {}
+    for name, value in changes.items():
+        if value is None or name == "spectral_indices":
+            pass
+        elif name == "confidence":
+            if isinstance(value, bool) or not isinstance(value, numbers.Real):
+                raise ValueError("confidence must be a number")
+        elif name == "value":
+            if isinstance(value, (bool, dict, list)):
+                raise ValueError("value must be a string or number")
+            value = str(value)
+        elif not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+        max_length = EDITABLE_FIELDS[name]
+        if max_length is not None and isinstance(value, str) and len(value) > max_length:
+            raise ValueError(f"{name} is longer than {max_length} characters")
+        values[name] = value
+    values.update(derive_columns(values))
+    return values
+
+def target_ids(db, body, max_ids, entitled=None):
+    """
+    SELECT of the ids addressed by `ids` and/or `filter` (both: intersection),
+    limited to the `entitled` product ids (None: all products).
+    Raises ValueError for a missing/empty target, so a request can never hit
+    the whole table by accident.
+    """
+    ids, criteria = body.get("ids"), body.get("filter")
+    if ids is None and criteria is None:
+        raise ValueError("Provide 'ids' and/or 'filter'")
+
+    query = db.query(ObservationRecord.id)
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(
+                isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError("'ids' must be a non-empty list of integers")
+        if len(ids) > max_ids:
+            raise ValueError(f"At most {max_ids} ids per request")
+        # One bound parameter however long the list is
+        query = query.filter(ObservationRecord.id.in_(
+            select(column("value")).select_from(func.json_each(json.dumps(ids)))
+        ))
+    if criteria is not None:
+        if not isinstance(criteria, dict):
+            raise ValueError("'filter' must be an object of filter parameters")
+        # apply_filters() reads query-string values: strings only
+        for name, value in criteria.items():
+            if isinstance(value, bool) or not isinstance(value, (str, numbers.Real)):
+                raise ValueError(f"filter value for '{name}' must be a string or number")
+        criteria = {name: str(value) for name, value in criteria.items()}
+        filtered = apply_filters(query, criteria)
+        if filtered is query:
+            raise ValueError("'filter' must contain at least one filter parameter")
+        query = filtered
+    if entitled is not None:
+        query = query.filter(ObservationRecord.product_id.in_(entitled))
+    return query.subquery()
+
+def caller_target(db, body, max_ids):
+    """target_ids() for the JWT caller: only rows of products they are subscribed to."""
+    return target_ids(db, body, max_ids, entitlements.resolve(db, get_jwt_identity()))
+
+def register(app):
+    """
+    Registers the set-based bulk edit routes.
+    """
+    app.config.setdefault("BULK_EDIT_MAX_IDS", DEFAULT_MAX_IDS)
+
+    @app.route('/api/observations', methods=['PATCH'])
+    @jwt_required()
+    def patch_observations():
+        """
+        Update many observations with one set-based UPDATE.
+        Only observations of the caller's subscribed products are touched.
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - in: body
+            name: body
+            schema:
+              type: object
+              required:
+                - set
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: integer
+                filter:
+                  type: object
+                  description: Filter parameters as for GET /api/observations/filter, e.g. {"satellite_id": "MODIS", "start_date": "2025-01-01"}
+                set:
+                  type: object
+                  description: New values for value, unit, timezone, notes, confidence, spectral_indices
+        responses:
+          200:
+            description: "{updated: n}"
+          400:
+            description: Invalid target or changes (an empty filter is rejected)
+        """
+        db = get_db()
+        body = request.get_json(silent=True) or {}
+        try:
+            values = parse_changes(body.get("set"))
+            ids = caller_target(db, body, app.config["BULK_EDIT_MAX_IDS"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # RETURNING reports the products actually written, under the write lock
+        products = [pid for pid, in db.execute(
+            update(ObservationRecord.__table__)
+            .where(ObservationRecord.id.in_(select(ids.c.id)))
+            .values(**values)
+            .returning(ObservationRecord.product_id)
+        )]
+        # One version bump per affected product for the whole statement
+        versions.record_write(db, set(products))
+        db.add(ApiUsage(endpoint="PATCH /api/observations"))
+        db.commit()
+        return jsonify({"updated": len(products)}), 200
+
+    @app.route('/api/observations', methods=['DELETE'])
+    @jwt_required()
+    def delete_observations():
+        """
+        Delete many observations with one set-based DELETE.
+        Only observations of the caller's subscribed products are touched.
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - in: body
+            name: body
+            schema:
+              type: object
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: integer
+                filter:
+                  type: object
+                  description: Filter parameters as for GET /api/observations/filter
+        responses:
+          200:
+            description: "{deleted: n}"
+          400:
+            description: Invalid target (an empty filter is rejected)
+        """
+        db = get_db()
+        body = request.get_json(silent=True) or {}
+        try:
+            ids = caller_target(db, body, app.config["BULK_EDIT_MAX_IDS"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        products = [pid for pid, in db.execute(
+            delete(ObservationRecord.__table__)
+            .where(ObservationRecord.id.in_(select(ids.c.id)))
+            .returning(ObservationRecord.product_id)
+        )]
+        versions.record_write(db, set(products))
+        db.add(ApiUsage(endpoint="DELETE /api/observations"))
+        db.commit()
+        return jsonify({"deleted": len(products)}), 200
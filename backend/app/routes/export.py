@@ -0,0 +1,251 @@
+"""
+Bulk export of filtered observations as CSV, Parquet or Arrow IPC.
+
+Rows are read from the cursor in EXPORT_BATCH_SIZE partitions of plain
+tuples, transposed into columns and handed to the writer one batch at a time;
+the encoded bytes are streamed out as each batch is written. Parquet and
+Arrow need pyarrow (optional); CSV always works.
+"""
+import csv
+import io
+
+import numpy as np
+from flask import Response, request, jsonify, g, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import String, type_coerce
+
+from app import versions
+from app.catalog import product_catalog
+from app.entitlements import entitlements
+from app.routes.filtering import apply_filters, filter_scope, parse_sort
+from app.routes.observation import ObservationRecord, log_usage
+from app.serialization import iso_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+# Rows fetched per database round trip, and per Parquet row group / Arrow batch
+EXPORT_BATCH_SIZE = 10000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# Exported column -> Arrow type name. Timestamps are naive UTC; spectral
+# indices stay the stored JSON text.
+EXPORT_COLUMNS = {
+    "id": "int64",
+    "timestamp": "timestamp",
+    "timezone": "string",
+    "coordinates": "string",
+    "satellite_id": "string",
+    "spectral_indices": "string",
+    "notes": "string",
+    "product_id": "int64",
+    "product_name": "string",
+    "value": "string",
+    "value_numeric": "float64",
+    "value_status": "string",
+    "unit": "string",
+    "confidence": "float64",
+    "lat": "float64",
+    "lon": "float64",
+}
+
+def get_db():
+    """Helper to get the current request's DB session"""
+    return g.db
+
+def parse_export_fields(param):
+    """Exported columns from `fields=a,b`; all of EXPORT_COLUMNS when absent."""
+    if not param:
+        return tuple(EXPORT_COLUMNS)
+    fields = [f.strip() for f in param.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in EXPORT_COLUMNS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or param}. "
+                         f"Allowed: {', '.join(EXPORT_COLUMNS)}")
+    return tuple(dict.fromkeys(fields))
+
+def _select_columns(fields):
+    """SELECT list for `fields`: raw stored text for timestamp/JSON, product_id for names."""
+    columns = []
+    for field in fields:
+        name = "product_id" if field == "product_name" else field
+        column = getattr(ObservationRecord, name)
+        if name in ("timestamp", "spectral_indices"):
+            column = type_coerce(column, String)
+        columns.append(column.label(field))
+    return columns
+
+def column_batches(db, query, fields, batch_size=None):
+    """Yield {field: [values]} per cursor partition (one dict per batch, none per row)."""
+    result = db.execute(query.statement.execution_options(yield_per=batch_size or EXPORT_BATCH_SIZE))
+    for rows in result.partitions():
+        columns = dict(zip(fields, (list(c) for c in zip(*rows))))
+        if "product_name" in columns:
+            columns["product_name"] = [product_catalog.name_for(pid) for pid in columns["product_name"]]
+        yield columns
+
+def _arrow_schema(fields):
+    types = {
+        "int64": pa.int64(), "float64": pa.float64(),
+        "string": pa.string(), "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(f, types[EXPORT_COLUMNS[f]]) for f in fields])
+
+def _record_batch(columns, schema):
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if pa.types.is_timestamp(field.type):
+            # Stored text -> datetime64[us] in one vectorized parse (None -> NaT -> null)
+            values = np.array(values, dtype="datetime64[us]")
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects the writer's output until drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_csv(batches, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for columns in batches:
+        if "timestamp" in columns:
+            columns["timestamp"] = [iso_timestamp(raw) for raw in columns["timestamp"]]
+        writer.writerows(zip(*(columns[f] for f in fields)))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_arrow(batches, fields, fmt):
+    schema = _arrow_schema(fields)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for columns in batches:
+            writer.write_batch(_record_batch(columns, schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def register(app):
+    """
+    Registers the export routes.
+    """
+
+    @app.route('/api/observations/export', methods=['GET'])
+    @jwt_required()
+    def export_observations():
+        """
+        Download filtered observations as CSV, Parquet or Arrow IPC stream.
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - name: format
+            in: query
+            type: string
+            required: false
+            description: "'csv' (default), 'parquet' or 'arrow' (Arrow IPC stream)"
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Comma-separated columns to export (default all)
+          - name: sort
+            in: query
+            type: string
+            required: false
+            description: timestamp or value, '-' prefix for descending (default -timestamp)
+        responses:
+          200:
+            description: The file, streamed batch by batch
+          400:
+            description: Invalid parameters
+          403:
+            description: No subscription for the requested product
+          501:
+            description: Parquet/Arrow requested but pyarrow is not installed
+        """
+        db = get_db()
+        fmt = (request.args.get('format') or 'csv').lower()
+        if fmt not in FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+        if fmt != 'csv' and pa is None:
+            return jsonify({"error": f"{fmt} export requires pyarrow"}), 501
+
+        try:
+            fields = parse_export_fields(request.args.get('fields'))
+            sort_column, descending = parse_sort(request.args)
+            query = apply_filters(db.query(*_select_columns(fields)), request.args)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid filter parameter: {e}"}), 400
+
+        # Access control (None means Pro Plan / all access)
+        entitled = entitlements.resolve(db, get_jwt_identity())
+        scope = filter_scope(request.args)
+        if scope is not None:
+            if entitled is not None and scope[0] not in entitled:
+                return jsonify({"error": "Forbidden: Subscription required"}), 403
+        elif entitled is not None:
+            scope = list(entitled)
+            query = query.filter(ObservationRecord.product_id.in_(scope))
+
+        etag = versions.query_etag(db, scope, request)
+        unchanged = versions.not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+
+        order = sort_column.desc() if descending else sort_column.asc()
+        id_order = ObservationRecord.id.desc() if descending else ObservationRecord.id.asc()
+        query = query.order_by(order, id_order)
+
+        log_usage("GET /api/observations/export")
+
+        batches = column_batches(db, query, fields)
+        body = iter_csv(batches, fields) if fmt == 'csv' else iter_arrow(batches, fields, fmt)
+        mimetype, extension = FORMATS[fmt]
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="observations.{extension}"'
+        response.set_etag(etag)
+        return response
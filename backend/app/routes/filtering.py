@@ -1,13 +1,104 @@
 """
 US-09: Filter and Retrieve Geospatial Observation Data
 """
+from datetime import datetime
 from flask import request, jsonify, g
-from app.routes.observation import ObservationRecord
+from app.routes.observation import ObservationRecord, SpectralIndexValue, parse_fields, load_fields
+from app.spectral import index_ranges, index_range_condition
+from app.spatial import parse_bbox, bbox_condition
+from app.streaming import stream_mode, stream_response, iter_dicts
+from app.pagination import PaginationError, parse_page_args, paginate, add_cursor_headers
+from app import serialization, versions, result_cache, downsampling
 
 def get_db():
     """Helper to get the current request's DB session"""
     return g.db
 
+def parse_datetime(value):
+    """Parse an ISO 8601 date or datetime query parameter."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def apply_filters(query, params):
+    """
+    Apply the US-09 filter parameters to an observation query.
+    `params` is any mapping, e.g. request.args or a JSON body.
+    """
+    satellite_id = params.get('satellite_id')
+    timezone = params.get('timezone')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    product_id = params.get('product_id')
+    unit = params.get('unit')
+    status = params.get('status')
+    min_value = params.get('min_value')
+    max_value = params.get('max_value')
+
+    if product_id:
+        query = query.filter(ObservationRecord.product_id == int(product_id))
+
+    if unit:
+        query = query.filter(ObservationRecord.unit == unit)
+
+    if status:
+        query = query.filter(ObservationRecord.value_status == status)
+
+    # Numeric range on the typed column (inclusive bounds), served by the value indexes
+    if min_value not in (None, ''):
+        query = query.filter(ObservationRecord.value_numeric >= float(min_value))
+
+    if max_value not in (None, ''):
+        query = query.filter(ObservationRecord.value_numeric <= float(max_value))
+
+    # Spectral index ranges, e.g. ndvi_min=0.6 or index=EVI&min=0.2&max=0.5
+    for name, (low, high) in index_ranges(params).items():
+        query = query.filter(index_range_condition(
+            ObservationRecord.id, SpectralIndexValue, name, low, high
+        ))
+
+    bbox = params.get('bbox')
+    if bbox:
+        query = query.filter(bbox_condition(
+            query.session, ObservationRecord.id,
+            ObservationRecord.lat, ObservationRecord.lon, parse_bbox(bbox),
+        ))
+
+    if satellite_id:
+        query = query.filter(ObservationRecord.satellite_id == satellite_id)
+
+    if timezone:
+        query = query.filter(ObservationRecord.timezone == timezone)
+
+    if start_date:
+        query = query.filter(ObservationRecord.timestamp >= parse_datetime(start_date))
+
+    if end_date:
+        query = query.filter(ObservationRecord.timestamp <= parse_datetime(end_date))
+
+    return query
+
+def filter_scope(params):
+    """Products a filtered read can return: the product_id filter, or None for all."""
+    product_id = params.get('product_id')
+    return [int(product_id)] if product_id else None
+
+SORT_FIELDS = {
+    'timestamp': ObservationRecord.timestamp,
+    'value': ObservationRecord.value_numeric,
+}
+
+def parse_sort(params):
+    """
+    Resolve the `sort` parameter to (column, descending).
+    Accepts 'timestamp' / 'value', prefixed with '-' for descending;
+    defaults to newest first.
+    """
+    sort = params.get('sort') or '-timestamp'
+    descending = sort.startswith('-')
+    column = SORT_FIELDS.get(sort.lstrip('-'))
+    if column is None:
+        raise ValueError(f"unsupported sort '{sort}'")
+    return column, descending
+
 def register(app):
     """
     Registers the filtering routes for US-09.
@@ -17,33 +108,78 @@ def register(app):
     def filter_observations():
         db = get_db()  # use per-request session
         try:
-            # 1. Get query parameters from the URL
-            satellite_id = request.args.get('satellite_id')
-            timezone = request.args.get('timezone')
-            start_date = request.args.get('start_date')
-            end_date = request.args.get('end_date')
-
-            # 2. Start building the query
-            query = db.query(ObservationRecord)
-
-            # 3. Apply filters if they exist in the request
-            if satellite_id:
-                query = query.filter(ObservationRecord.satellite_id == satellite_id)
-            
-            if timezone:
-                query = query.filter(ObservationRecord.timezone == timezone)
-                
-            if start_date:
-                query = query.filter(ObservationRecord.timestamp >= start_date)
-            
-            if end_date:
-                query = query.filter(ObservationRecord.timestamp <= end_date)
-
-            # 4. Execute query and convert results to a list of dictionaries
-            results = query.all()
-            output = [obs.to_dict() for obs in results]
-
-            return jsonify(output), 200
+            limit, cursor = parse_page_args(request.args)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            # 1. Build the query from the URL filter parameters
+            fields = parse_fields(request.args.get('fields'))
+            sort_column, descending = parse_sort(request.args)
+            downsample = downsampling.parse_downsample(request.args)
+            fast = serialization.use_fast_path('filter_observations')
+            if fast:
+                renderer, query = serialization.select_rows(db, fields, sort_column)
+            else:
+                query = load_fields(db.query(ObservationRecord), fields, sort_column)
+            query = apply_filters(query, request.args)
+
+            mode = stream_mode(request)
+            if downsample and mode:
+                raise ValueError("downsample cannot be combined with stream")
+
+            # Conditional GET: the result can only change when its products' data versions do
+            scope = filter_scope(request.args)
+            etag = versions.query_etag(db, scope, request, mode)
+            unchanged = versions.not_modified(request, etag)
+            if unchanged is not None:
+                return unchanged
+
+            # Many clients run the same filter; serve repeats from the result cache
+            cache_key = result_cache.cache_key(etag, scope)
+            cached = None if mode else result_cache.cached_response(cache_key)
+            if cached is not None:
+                cached.set_etag(etag)
+                return cached, 200
+
+            if downsample:
+                # At most `points` rows chosen for chart fidelity, oldest first (no paging)
+                rows, total = downsampling.downsampled_rows(db, query, *downsample)
+                output = [renderer.render(row) for row in rows] if fast else [obs.to_dict(fields) for obs in rows]
+                response = jsonify(output)
+                response.headers['X-Downsampled-From'] = str(total)
+                response.set_etag(etag)
+                result_cache.store(cache_key, response, scope)
+                return response, 200
+
+            if mode:
+                # Stream the full result set in sort order, batch by batch
+                order = sort_column.desc() if descending else sort_column.asc()
+                id_order = ObservationRecord.id.desc() if descending else ObservationRecord.id.asc()
+                query = query.order_by(order, id_order)
+                if fast:
+                    response = stream_response(serialization.iter_rendered(query, renderer), mode)
+                else:
+                    response = stream_response(iter_dicts(query, fields), mode)
+                response.set_etag(etag)
+                return response
+
+            # 2. Fetch one keyset page in the requested order
+            results, next_cursor = paginate(
+                query, sort_column, ObservationRecord.id, limit, cursor, descending,
+                key_of=renderer.key_of(sort_column) if fast else None,
+            )
+            if fast:
+                output = [renderer.render(row) for row in results]
+            else:
+                output = [obs.to_dict(fields) for obs in results]
+
+            response = add_cursor_headers(jsonify(output), next_cursor, request)
+            response.set_etag(etag)
+            result_cache.store(cache_key, response, scope)
+            return response, 200
 
+        except ValueError as e:
+            return jsonify({'error': f"Invalid filter parameter: {e}"}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
@@ -0,0 +1,228 @@
+"""
+Geospatial search over observations: radius and k-nearest-neighbour queries,
+and tile-binned heatmap aggregation.
+"""
+import numpy as np
+from flask import request, jsonify, g
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.routes.observation import (
+    ObservationRecord, entitled_product_ids, log_usage, parse_fields, load_fields
+)
+from app.routes.filtering import apply_filters
+from app.heatmap import MAX_ZOOM, TileAccumulator
+from app.spatial import (
+    MAX_DISTANCE_KM, bbox_condition, haversine_km, radius_bbox
+)
+
+DEFAULT_K = 50
+MAX_K = 1000
+# First search radius for k-NN queries without radius_km; grows 4x per round
+INITIAL_KNN_RADIUS_KM = 25.0
+DEFAULT_ZOOM = 3
+# Rows fetched and binned per NumPy chunk in the grid endpoint
+GRID_CHUNK_SIZE = 50000
+
+def get_db():
+    """Helper to get the current request's DB session"""
+    return g.db
+
+def _candidates(query, lat, lon, radius_km):
+    """(distance_km, id) for rows within radius_km, pruned by the spatial index first."""
+    db = get_db()
+    rows = query.filter(bbox_condition(
+        db, ObservationRecord.id, ObservationRecord.lat, ObservationRecord.lon,
+        radius_bbox(lat, lon, radius_km),
+    )).all()
+    hits = []
+    for row_id, row_lat, row_lon in rows:
+        distance = haversine_km(lat, lon, row_lat, row_lon)
+        if distance <= radius_km:
+            hits.append((distance, row_id))
+    hits.sort()
+    return hits
+
+def nearest(query, lat, lon, k, radius_km=None):
+    """
+    Return up to k (distance_km, id) pairs ordered by distance.
+    With radius_km the search is bounded; otherwise the radius expands until
+    k rows are found inside it (a row outside the current circle can never be
+    closer than one inside it, so the first k inside are the true k nearest).
+    """
+    if radius_km is not None:
+        return _candidates(query, lat, lon, radius_km)[:k]
+
+    radius = INITIAL_KNN_RADIUS_KM
+    while True:
+        hits = _candidates(query, lat, lon, radius)
+        if len(hits) >= k or radius >= MAX_DISTANCE_KM:
+            return hits[:k]
+        radius = min(radius * 4, MAX_DISTANCE_KM)
+
+def register(app):
+    """
+    Registers the geospatial search routes.
+    """
+
+    @app.route('/api/observations/nearby', methods=['GET'])
+    @jwt_required()
+    def nearby_observations():
+        """
+        Observations closest to a point, ordered by great-circle distance.
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - name: lat
+            in: query
+            type: number
+            required: true
+          - name: lon
+            in: query
+            type: number
+            required: true
+          - name: radius_km
+            in: query
+            type: number
+            required: false
+            description: Only return observations within this distance
+          - name: k
+            in: query
+            type: integer
+            required: false
+            description: Maximum number of results (default 50, capped at 1000)
+          - name: product_id
+            in: query
+            type: integer
+            required: false
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Comma-separated subset of fields to return
+        responses:
+          200:
+            description: Observations with a distance_km field, nearest first
+          400:
+            description: Invalid parameters
+        """
+        db = get_db()
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            lat = float(request.args['lat'])
+            lon = float(request.args['lon'])
+            radius_km = request.args.get('radius_km')
+            radius_km = float(radius_km) if radius_km else None
+            k = min(int(request.args.get('k', DEFAULT_K)), MAX_K)
+            product_id = request.args.get('product_id')
+            product_id = int(product_id) if product_id else None
+        except (KeyError, ValueError):
+            return jsonify({"error": "lat and lon are required numbers; radius_km and k must be numeric"}), 400
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({"error": "lat/lon out of range"}), 400
+        if k < 1 or (radius_km is not None and radius_km <= 0):
+            return jsonify({"error": "k and radius_km must be positive"}), 400
+
+        # Access control, as in list_obs (None means Pro Plan / all access)
+        entitled = entitled_product_ids(db, get_jwt_identity())
+        if entitled is not None and not entitled:
+            return jsonify([]), 200
+
+        query = db.query(ObservationRecord.id, ObservationRecord.lat, ObservationRecord.lon)
+        if entitled is not None:
+            query = query.filter(ObservationRecord.product_id.in_(entitled))
+        if product_id:
+            query = query.filter(ObservationRecord.product_id == product_id)
+
+        hits = nearest(query, lat, lon, k, radius_km)
+
+        # Hydrate only the winners, then restore distance order
+        records = {}
+        if hits:
+            ids = [row_id for _, row_id in hits]
+            winners = load_fields(db.query(ObservationRecord), fields).filter(ObservationRecord.id.in_(ids))
+            records = {o.id: o for o in winners}
+        output = []
+        for distance, row_id in hits:
+            item = records[row_id].to_dict(fields)
+            item["distance_km"] = round(distance, 3)
+            output.append(item)
+
+        log_usage("GET /api/observations/nearby")
+
+        return jsonify(output), 200
+
+    @app.route('/api/observations/grid', methods=['GET'])
+    @jwt_required()
+    def observation_grid():
+        """
+        Density and value heatmap: observations binned into slippy-map tiles.
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - name: zoom
+            in: query
+            type: integer
+            required: false
+            description: Tile zoom level 0-18 (default 3)
+          - name: product_id
+            in: query
+            type: integer
+            required: false
+          - name: start_date
+            in: query
+            type: string
+            required: false
+          - name: end_date
+            in: query
+            type: string
+            required: false
+          - name: bbox
+            in: query
+            type: string
+            required: false
+            description: minLon,minLat,maxLon,maxLat
+        responses:
+          200:
+            description: One entry per occupied tile with count/min/max/mean of the numeric value
+          400:
+            description: Invalid parameters
+        """
+        db = get_db()
+        try:
+            zoom = int(request.args.get('zoom', DEFAULT_ZOOM))
+        except ValueError:
+            return jsonify({"error": "zoom must be an integer"}), 400
+        if not 0 <= zoom <= MAX_ZOOM:
+            return jsonify({"error": f"zoom must be between 0 and {MAX_ZOOM}"}), 400
+
+        entitled = entitled_product_ids(db, get_jwt_identity())
+        accumulator = TileAccumulator(zoom)
+        if entitled is None or entitled:
+            # Project only the three columns the binning needs
+            query = db.query(ObservationRecord.lat, ObservationRecord.lon, ObservationRecord.value_numeric)
+            try:
+                query = apply_filters(query, request.args)
+            except ValueError as e:
+                return jsonify({"error": f"Invalid filter parameter: {e}"}), 400
+            query = query.filter(ObservationRecord.lat.isnot(None), ObservationRecord.lon.isnot(None))
+            if entitled is not None:
+                query = query.filter(ObservationRecord.product_id.in_(entitled))
+
+            result = db.execute(query.statement.execution_options(yield_per=GRID_CHUNK_SIZE))
+            for chunk in result.partitions():
+                points = np.array(chunk, dtype=float)
+                accumulator.add(points[:, 0], points[:, 1], points[:, 2])
+
+        cells = accumulator.cells()
+        log_usage("GET /api/observations/grid")
+
+        return jsonify({"zoom": zoom, "cells": cells, "total": sum(c["count"] for c in cells)}), 200
@@ -1,7 +1,7 @@
 """
 US-05: Basic API Health Endpoints
 """
-from flask import jsonify
+from flask import jsonify, current_app
 
 def register(app):
     """
@@ -14,4 +14,20 @@ def register(app):
 
     @app.route('/health')
     def health():
-        return jsonify({"status": "ok"})
\ No newline at end of file
+        return jsonify({"status": "ok"})
+
+    @app.route('/health/cache')
+    def cache_health():
+        """
+        Result cache counters (hits, misses, evictions, invalidations, size).
+        ---
+        tags:
+          - Health
+        responses:
+          200:
+            description: Counters of the in-process list/filter result cache
+        """
+        cache = current_app.extensions.get("result_cache")
+        stats = cache.stats() if cache is not None else {}
+        stats["enabled"] = bool(current_app.config.get("RESULT_CACHE_ENABLED")) and cache is not None
+        return jsonify(stats)
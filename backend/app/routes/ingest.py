@@ -0,0 +1,192 @@
+"""
+Bulk observation ingest endpoints.
+"""
+from flask import Response, request, jsonify, g, stream_with_context
+from sqlalchemy.exc import IntegrityError
+
+from app import idempotency, ingest, write_behind
+from app.routes.observation import ApiUsage
+from app.streaming import NDJSON_MIMETYPE, dumps
+
+def get_db():
+    """Helper to get the current request's DB session"""
+    return g.db
+
+def item_results(size, ids, errors, duplicates=()):
+    """Per-item outcome in request order: {index, id[, duplicate]} or {index, error}."""
+    results = [None] * size
+    for index, obs_id in ids:
+        results[index] = {"index": index, "id": obs_id}
+        if index in duplicates:
+            results[index]["duplicate"] = True
+    for index, error in errors:
+        results[index] = {"index": index, "error": error}
+    return results
+
+def register(app):
+    """
+    Registers the bulk ingest routes.
+    """
+    app.config.setdefault("BULK_INGEST_MAX_ITEMS", ingest.DEFAULT_MAX_ITEMS)
+    app.config.setdefault("NDJSON_INGEST_CHUNK_SIZE", ingest.DEFAULT_CHUNK_SIZE)
+
+    @app.route('/api/observations/bulk', methods=['POST'])
+    def create_obs_bulk():
+        """
+        Create many observations in one request and one transaction.
+        ---
+        tags:
+          - Observations
+        parameters:
+          - name: Idempotency-Key
+            in: header
+            type: string
+            required: false
+            description: Retries with the same key and body replay the first response
+          - in: body
+            name: body
+            description: Array of observations (same fields as POST /api/observations), or {"observations": [...]}
+            schema:
+              type: array
+              items:
+                type: object
+                required:
+                  - product_id
+                  - value
+        responses:
+          201:
+            description: All observations stored; results lists the ids in request order (duplicate=true for readings already stored, with the original id)
+          202:
+            description: Write-behind mode; the valid items are queued under the returned ticket
+          207:
+            description: Some observations were rejected; results holds an id or an error per item
+          400:
+            description: Not an array, or every item was invalid
+          413:
+            description: More than BULK_INGEST_MAX_ITEMS observations
+          422:
+            description: Idempotency-Key reused for a different request
+        """
+        db = get_db()
+        replayed = idempotency.check(db, request)
+        if replayed is not None:
+            return replayed
+        data = request.get_json(silent=True)
+        items = data.get("observations") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({"error": "Expected a JSON array of observations"}), 400
+        max_items = app.config["BULK_INGEST_MAX_ITEMS"]
+        if len(items) > max_items:
+            return jsonify({"error": f"At most {max_items} observations per request"}), 413
+
+        accepted, errors = ingest.validate(items)
+
+        # Write-behind mode: one ticket for the valid items, committed by the writer thread
+        writer = write_behind.get_queue()
+        if writer is not None:
+            if not accepted:
+                return jsonify({"created": 0, "failed": len(errors),
+                                "results": item_results(len(items), [], errors)}), 400
+            return write_behind.accept(db, request, [row for _, row in accepted], "POST /api/observations/bulk",
+                                       queued=len(accepted), failed=len(errors),
+                                       errors=[{"index": i, "error": e} for i, e in errors])
+
+        try:
+            ids, repeated = ingest.insert_rows(db, [row for _, row in accepted])
+            stored = list(zip((index for index, _ in accepted), ids))
+            duplicates = {accepted[i][0] for i in repeated}
+            status = 201 if not errors else (207 if stored else 400)
+            payload = {
+                "created": len(stored) - len(duplicates),
+                "duplicates": len(duplicates),
+                "failed": len(errors),
+                "results": item_results(len(items), stored, errors, duplicates),
+            }
+            idempotency.remember(db, request, status, payload)
+            # Usage is logged in the same transaction: a single commit per request
+            db.add(ApiUsage(endpoint="POST /api/observations/bulk"))
+            db.commit()
+        except IntegrityError:
+            # A concurrent request with the same Idempotency-Key won the race
+            db.rollback()
+            replayed = idempotency.check(db, request)
+            if replayed is None:
+                raise
+            return replayed
+        return jsonify(payload), status
+
+    @app.route('/api/observations/ingest', methods=['POST'])
+    def ingest_obs_stream():
+        """
+        Stream a large NDJSON upload (one observation per line) into the database.
+        The body is parsed incrementally and committed every chunk_size rows; the
+        response is NDJSON too, one progress line per committed chunk and a final
+        summary with per-line errors.
+        ---
+        tags:
+          - Observations
+        consumes:
+          - application/x-ndjson
+        parameters:
+          - in: body
+            name: body
+            description: One JSON observation per line (same fields as POST /api/observations)
+            schema:
+              type: string
+          - name: chunk_size
+            in: query
+            type: integer
+            required: false
+            description: Rows per commit (default NDJSON_INGEST_CHUNK_SIZE, max 50000)
+        responses:
+          200:
+            description: "NDJSON: {committed, lines, first_id, last_id} per chunk, then {done, lines, created, failed, errors: [{line, error}], errors_truncated}"
+          400:
+            description: Invalid chunk_size
+          415:
+            description: Body is not application/x-ndjson
+        """
+        if request.mimetype != NDJSON_MIMETYPE:
+            return jsonify({"error": f"Content-Type must be {NDJSON_MIMETYPE}"}), 415
+        try:
+            chunk_size = int(request.args.get("chunk_size", app.config["NDJSON_INGEST_CHUNK_SIZE"]))
+        except ValueError:
+            return jsonify({"error": "chunk_size must be an integer"}), 400
+        if not 1 <= chunk_size <= ingest.MAX_CHUNK_SIZE:
+            return jsonify({"error": f"chunk_size must be between 1 and {ingest.MAX_CHUNK_SIZE}"}), 400
+
+        def log(session):
+            session.add(ApiUsage(endpoint="POST /api/observations/ingest"))
+
+        progress = ingest.ingest_ndjson(get_db(), request.stream, chunk_size, app.json.loads, finalize=log)
+        # Unbuffered so each progress line reaches the client as its chunk commits
+        body = (dumps(doc) + "\n" for doc in progress)
+        return Response(stream_with_context(body), mimetype=NDJSON_MIMETYPE)
+
+    @app.route('/api/observations/ingest/tickets/<ticket>', methods=['GET'])
+    def ingest_ticket_status(ticket):
+        """
+        Status of a write-behind ingest ticket.
+        ---
+        tags:
+          - Observations
+        parameters:
+          - name: ticket
+            in: path
+            type: string
+            required: true
+        responses:
+          200:
+            description: "{ticket, status: queued|committed|failed, count, first_id, last_id, error, committed_at}"
+          404:
+            description: Unknown ticket
+        """
+        writer = write_behind.get_queue()
+        if writer is not None:
+            status = writer.status(get_db(), ticket)
+        else:
+            record = get_db().get(write_behind.IngestTicket, ticket)
+            status = record.to_dict() if record is not None else None
+        if status is None:
+            return jsonify({"error": "Unknown ticket"}), 404
+        return jsonify(status)
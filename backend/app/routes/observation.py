@@ -1,9 +1,20 @@
 from flask import request, jsonify, g
 from datetime import datetime, timezone, timedelta
+import hashlib
 import random
-from sqlalchemy import Column, String, DateTime, Integer, Text, func, Float
+import math
+from sqlalchemy import Column, String, DateTime, Integer, Text, func, Float, JSON, Index, event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 
 from app.db import Base
+from app.catalog import product_catalog, watch_products
+from app.entitlements import entitlements, watch_subscriptions
+from app import versions, result_cache
+from app.spatial import parse_coordinates
+from app.spectral import parse_spectral_indices
+from app.streaming import stream_mode, stream_response, iter_dicts
+from app.pagination import PaginationError, parse_page_args, paginate, add_cursor_headers
 
 class Product(Base):
     __tablename__ = "products"
@@ -23,6 +34,8 @@ class Product(Base):
             "stripe_price_id": self.stripe_price_id
         }
 
+watch_products(Product)
+
 class Subscription(Base):
     __tablename__ = "subscriptions"
     
@@ -39,6 +52,8 @@ class Subscription(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
+watch_subscriptions(Subscription)
+
 class ObservationRecord(Base):
     __tablename__ = "observations"
 
@@ -47,39 +62,164 @@ class ObservationRecord(Base):
     timezone = Column(String(50))
     coordinates = Column(String(255))
     satellite_id = Column(String(100))
-    spectral_indices = Column(String(500))
+    spectral_indices = Column(JSON(none_as_null=True))  # e.g. {"NDVI": 0.42}
     notes = Column(Text)
     product_id = Column(Integer, nullable=True)
     value = Column(String(50), nullable=True) # e.g. "0.85"
     unit = Column(String(20), nullable=True)  # e.g. "NDVI"
     confidence = Column(Float, nullable=True) # e.g. 98.5
-
-    def to_dict(self):
-        # Fetch product name if possible (this is a simple hack since we don't have a relationship defined properly here yet for simplicity)
-        # In a real app, use SQLAlchemy relationships.
-        product_name = f"Product #{self.product_id}"
-        if self.product_id:
-            from app.db import SessionLocal
-            db = SessionLocal()
-            prod = db.get(Product, self.product_id)
-            if prod:
-                product_name = prod.name
-            db.close()
-
-        return {
-            "id": self.id,
-            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
-            "timezone": self.timezone,
-            "coordinates": self.coordinates,
-            "satellite_id": self.satellite_id,
-            "spectral_indices": self.spectral_indices,
-            "notes": self.notes,
-            "product_id": self.product_id,
-            "product_name": product_name,
-            "value": self.value,
-            "unit": self.unit,
-            "confidence": self.confidence
-        }
+    # Derived from `value` on every write (see derive_columns)
+    value_numeric = Column(Float, nullable=True)     # e.g. 0.85, 312.0
+    value_status = Column(String(20), nullable=True) # e.g. "Detected", "Clear"
+    lat = Column(Float, nullable=True)  # parsed from coordinates
+    lon = Column(Float, nullable=True)
+    # Dedupe key over the identifying fields (see content_hash); unique index
+    content_hash = Column(String(32), nullable=True)
+
+    def to_dict(self, fields=None):
+        """
+        Serialize the observation. `fields` (see parse_fields) restricts the
+        output to those keys and only touches the attributes they need, so it
+        is safe on rows loaded with load_fields().
+        """
+        return {name: OBSERVATION_FIELDS[name](self) for name in (fields or OBSERVATION_FIELDS)}
+
+# Writes bump the product's data version (ETags for the read endpoints)
+versions.watch_observations(ObservationRecord)
+
+# Serialized field -> how to render it. Product names come from the shared
+# in-process catalog, so serializing a page never issues per-row lookups.
+OBSERVATION_FIELDS = {
+    "id": lambda o: o.id,
+    "timestamp": lambda o: o.timestamp.isoformat() if o.timestamp else None,
+    "timezone": lambda o: o.timezone,
+    "coordinates": lambda o: o.coordinates,
+    "satellite_id": lambda o: o.satellite_id,
+    "spectral_indices": lambda o: o.spectral_indices,
+    "notes": lambda o: o.notes,
+    "product_id": lambda o: o.product_id,
+    "product_name": lambda o: product_catalog.name_for(o.product_id),
+    "value": lambda o: o.value,
+    "unit": lambda o: o.unit,
+    "confidence": lambda o: o.confidence,
+}
+
+# Columns each serialized field reads (product_name is derived from product_id)
+FIELD_COLUMNS = {name: (name,) for name in OBSERVATION_FIELDS}
+FIELD_COLUMNS["product_name"] = ("product_id",)
+
+def parse_fields(param):
+    """
+    Parse a `fields=id,timestamp,value` sparse fieldset.
+    Returns None when absent (all fields); raises ValueError on unknown names.
+    """
+    if not param:
+        return None
+    fields = [f.strip() for f in param.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in OBSERVATION_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or param}. "
+                         f"Allowed: {', '.join(OBSERVATION_FIELDS)}")
+    return tuple(dict.fromkeys(fields))
+
+def field_loader(fields, *extra_columns):
+    """
+    A load_only() option selecting just the columns `fields` needs, plus any
+    extra columns (e.g. the sort key for keyset cursors). None loads everything.
+    """
+    if fields is None:
+        return None
+    columns = {c for f in fields for c in FIELD_COLUMNS[f]}
+    columns.update(c.key for c in extra_columns)
+    return load_only(*(getattr(ObservationRecord, c) for c in sorted(columns)))
+
+def load_fields(query, fields, *extra_columns):
+    """Narrow an ObservationRecord query's SELECT to what `fields` needs."""
+    option = field_loader(fields, *extra_columns)
+    return query.options(option) if option is not None else query
+
+class SpectralIndexValue(Base):
+    """One numeric spectral index of an observation, maintained by SQLite triggers."""
+    __tablename__ = "observation_spectral_indices"
+    __table_args__ = (
+        Index("ix_spectral_indices_name_value", "name", "value"),
+    )
+
+    observation_id = Column(Integer, primary_key=True)
+    name = Column(String(20), primary_key=True)
+    value = Column(Float, nullable=False)
+
+def split_value(value):
+    """
+    Split a raw observation value into (numeric, status).
+    Numeric readings ("0.85", "312", 4.2) fill the first slot, categorical
+    readings ("Detected", "Clear") the second.
+    """
+    if value is None or isinstance(value, bool):
+        return None, None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        status = str(value).strip()
+        return None, (status[:20] or None)
+    if math.isfinite(number):
+        return number, None
+    return None, None
+
+def derive_columns(values):
+    """
+    Compute the query-optimized columns from raw observation fields.
+    Used by the ORM write hooks below and by Core (bulk) insert paths.
+    """
+    derived = {}
+    if "value" in values:
+        derived["value_numeric"], derived["value_status"] = split_value(values["value"])
+    if "coordinates" in values:
+        derived["lat"], derived["lon"] = parse_coordinates(values["coordinates"])
+    if "spectral_indices" in values:
+        derived["spectral_indices"] = parse_spectral_indices(values["spectral_indices"])
+    return derived
+
+def content_hash(product_id, satellite_id, coordinates, timestamp):
+    """
+    Identity of a reading: the same product, satellite, coordinates and
+    timestamp is the same observation, however often a feed retries it.
+    None without a product or an explicit timestamp (a server-assigned
+    timestamp makes every request distinct).
+    """
+    if product_id is None or timestamp is None:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    key = "\x1f".join((
+        str(product_id), satellite_id or "", coordinates or "",
+        timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def identity_hash(target):
+    """
+    content_hash for an ORM row. Only client-supplied timestamps are hashed:
+    a row keeps None unless its timestamp is set explicitly in this write,
+    or it was hashed before (then the hash follows its identity fields).
+    """
+    if target.content_hash is None and not inspect(target).attrs.timestamp.history.has_changes():
+        return None
+    return content_hash(target.product_id, target.satellite_id, target.coordinates, target.timestamp)
+
+@event.listens_for(ObservationRecord, "before_insert")
+@event.listens_for(ObservationRecord, "before_update")
+def _sync_derived_columns(mapper, connection, target):
+    raw = {
+        "value": target.value,
+        "coordinates": target.coordinates,
+        "spectral_indices": target.spectral_indices,
+    }
+    derived = derive_columns(raw)
+    derived["content_hash"] = identity_hash(target)
+    for key, value in derived.items():
+        if getattr(target, key) != value:
+            setattr(target, key, value)
 
 class ApiUsage(Base):
     __tablename__ = "api_usage"
@@ -125,6 +265,15 @@ def get_db():
     """Helper to get the current request's DB session"""
     return g.db
 
+
+def entitled_product_ids(db, user_id):
+    """
+    Resolve which products a user may read (cached, see app/entitlements.py).
+    Returns None for Pro Plan (all access), otherwise the subscribed product
+    ids (empty for the Free Plan).
+    """
+    return entitlements.resolve(db, user_id)
+
 def log_usage(endpoint_name):
     """Helper to log API usage"""
     try:
@@ -136,6 +285,9 @@ def log_usage(endpoint_name):
         print(f"Error logging usage: {e}")
 
 def register(app):
+    from app import serialization, downsampling, idempotency, ingest, write_behind
+    serialization.configure(app)
+
     @app.route("/api/observations", methods=["POST"])
     def create_obs():
         """
@@ -146,6 +298,11 @@ def register(app):
         security:
           - Bearer: []
         parameters:
+          - name: Idempotency-Key
+            in: header
+            type: string
+            required: false
+            description: Retries with the same key and body replay the first response
           - in: body
             name: body
             schema:
@@ -165,47 +322,132 @@ def register(app):
                 lon:
                   type: number
         responses:
+          200:
+            description: Duplicate of a stored reading (same product, coordinates and timestamp); returns its id
           201:
             description: Observation created
+          202:
+            description: Write-behind mode; queued under the returned ticket
           400:
             description: Invalid input
+          422:
+            description: Idempotency-Key reused for a different request
         """
         db = get_db()
+        # Retried request with an Idempotency-Key: replay the first response
+        replayed = idempotency.check(db, request)
+        if replayed is not None:
+            return replayed
         data = request.get_json() or {}
 
-        # Convert ISO 8601 timestamp string to datetime
+        # Write-behind mode: validate, journal and queue; the writer thread commits
+        writer = write_behind.get_queue()
+        if writer is not None:
+            try:
+                row = ingest.prepare(data)
+            except ingest.IngestError as e:
+                return jsonify({"error": str(e)}), 400
+            return write_behind.accept(db, request, [row], "POST /api/observations")
+
+        # ISO 8601 timestamp -> naive UTC, exactly as the bulk/NDJSON paths store it
         if "timestamp" in data and data["timestamp"]:
-            data["timestamp"] = datetime.fromisoformat(
-                data["timestamp"].replace("Z", "+00:00")
-            )
+            try:
+                data["timestamp"] = ingest.utc_naive(data["timestamp"])
+            except ingest.IngestError as e:
+                return jsonify({"error": str(e)}), 400
+
+        # Accept the documented lat/lon pair as coordinates
+        if data.get("lat") is not None and data.get("lon") is not None:
+            data.setdefault("coordinates", f"{data['lat']}, {data['lon']}")
 
         # Filter data to only include valid model fields
-        valid_fields = ["product_id", "value", "timestamp", "confidence"]
+        valid_fields = ["product_id", "value", "timestamp", "confidence", "coordinates"]
         filtered_data = {k: v for k, v in data.items() if k in valid_fields}
 
-        new_obs = ObservationRecord(**filtered_data)
-        db.add(new_obs)
-        db.commit()
-        db.refresh(new_obs)  # ensure ORM maps back the ID
+        def find_duplicate():
+            """Id of a stored reading with the same identity (one unique-index probe)."""
+            digest = content_hash(filtered_data.get("product_id"), None,
+                                  filtered_data.get("coordinates"), filtered_data.get("timestamp"))
+            if digest is None:
+                return None
+            return db.query(ObservationRecord.id).filter(ObservationRecord.content_hash == digest).scalar()
+
+        duplicate_id = find_duplicate()
+        try:
+            if duplicate_id is None:
+                new_obs = ObservationRecord(**filtered_data)
+                db.add(new_obs)
+                db.flush()  # assigns the id
+                status, payload = 201, {"id": new_obs.id}
+            else:
+                status, payload = 200, {"id": duplicate_id, "duplicate": True}
+            idempotency.remember(db, request, status, payload)
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent retry: same key, or same reading
+            db.rollback()
+            replayed = idempotency.check(db, request)
+            if replayed is not None:
+                return replayed
+            duplicate_id = find_duplicate()
+            if duplicate_id is None:
+                raise
+            status, payload = 200, {"id": duplicate_id, "duplicate": True}
         
         # Log usage
         log_usage("POST /api/observations")
         
-        return jsonify({"id": new_obs.id}), 201
+        return jsonify(payload), status
 
     @app.route("/api/observations", methods=["GET"])
     @jwt_required()
     def list_obs():
         """
-        List all observations.
+        List observations, newest first, one keyset page at a time.
         ---
         tags:
           - Observations
         security:
           - Bearer: []
+        parameters:
+          - name: limit
+            in: query
+            type: integer
+            required: false
+            description: Page size (default 100, capped at 500)
+          - name: cursor
+            in: query
+            type: string
+            required: false
+            description: Opaque cursor from the previous page's X-Next-Cursor header
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Comma-separated subset of fields to return, e.g. id,timestamp,value,unit
+          - name: stream
+            in: query
+            type: string
+            required: false
+            description: "'ndjson' or 'json' to stream every matching row instead of one page (also Accept: application/x-ndjson)"
+          - name: downsample
+            in: query
+            type: string
+            required: false
+            description: "'lttb' or 'minmax': return at most `points` numeric rows for charting, oldest first, instead of a page"
+          - name: points
+            in: query
+            type: integer
+            required: false
+            description: Point budget for downsample (default 1000, capped at 10000)
+          - name: product_id
+            in: query
+            type: integer
+            required: false
+            description: The product to downsample (required with downsample)
         responses:
           200:
-            description: List of observations
+            description: One page of observations; X-Next-Cursor and Link headers point at the next page
             schema:
               type: array
               items:
@@ -222,62 +464,122 @@ def register(app):
         """
         current_user = get_jwt_identity()
         db = get_db()
+
+        try:
+            limit, cursor = parse_page_args(request.args)
+            fields = parse_fields(request.args.get("fields"))
+            downsample = downsampling.parse_downsample(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Access Control: Filter by subscription
-        # 1. Get user's subscriptions
-        subs = db.query(Subscription).filter(Subscription.user_id == current_user).all()
-        subscribed_product_ids = [s.product_id for s in subs]
-        
-        # 2. Check for Pro Plan (ID 5)
-        is_pro = 5 in subscribed_product_ids
+        # Access Control: Filter by subscription (None means Pro Plan / all access)
+        subscribed_product_ids = entitled_product_ids(db, current_user)
+        mode = stream_mode(request)
+        if downsample and mode:
+            return jsonify({"error": "downsample cannot be combined with stream"}), 400
         
-        query = db.query(ObservationRecord)
+        # Select only the columns the requested fields (and the cursor) need
+        fast = serialization.use_fast_path("list_obs")
+        if fast:
+            renderer, query = serialization.select_rows(db, fields, ObservationRecord.timestamp)
+        else:
+            query = load_fields(db.query(ObservationRecord), fields, ObservationRecord.timestamp)
         
-        if not is_pro:
+        if subscribed_product_ids is not None:
             if not subscribed_product_ids:
                 # No subscriptions (Free Plan) -> No access
+                if mode:
+                    return stream_response([], mode)
                 return jsonify([]), 200
             else:
                 # Filter strictly to subscribed products
                 query = query.filter(ObservationRecord.product_id.in_(subscribed_product_ids))
         
-        observations = query.order_by(ObservationRecord.timestamp.desc()).all()
+        # Conditional GET: unchanged entitled products -> 304 without reading observations
+        etag = versions.query_etag(db, subscribed_product_ids, request, mode)
+        unchanged = versions.not_modified(request, etag)
+        if unchanged is not None:
+            log_usage("GET /api/observations")
+            return unchanged
+        
+        # Identical page already rendered for this entitlement set and data version
+        cache_key = result_cache.cache_key(etag, subscribed_product_ids)
+        cached = None if mode else result_cache.cached_response(cache_key)
+        if cached is not None:
+            log_usage("GET /api/observations")
+            cached.set_etag(etag)
+            return cached
+        
+        if downsample:
+            # At most `points` rows of one product chosen for chart fidelity, oldest first (no paging)
+            query = query.filter(ObservationRecord.product_id == int(request.args["product_id"]))
+            rows, total = downsampling.downsampled_rows(db, query, *downsample)
+            payload = [renderer.render(row) for row in rows] if fast else [o.to_dict(fields) for o in rows]
+            log_usage("GET /api/observations")
+            response = jsonify(payload)
+            response.headers["X-Downsampled-From"] = str(total)
+            response.set_etag(etag)
+            result_cache.store(cache_key, response, subscribed_product_ids)
+            return response
+        
+        if mode:
+            # Streamed reads return the whole result set with constant memory
+            log_usage("GET /api/observations")
+            query = query.order_by(ObservationRecord.timestamp.desc(), ObservationRecord.id.desc())
+            if fast:
+                response = stream_response(serialization.iter_rendered(query, renderer), mode)
+            else:
+                response = stream_response(iter_dicts(query, fields), mode)
+            response.set_etag(etag)
+            return response
+        
+        # Keyset page, newest first
+        try:
+            observations, next_cursor = paginate(
+                query, ObservationRecord.timestamp, ObservationRecord.id, limit, cursor,
+                key_of=renderer.key_of(ObservationRecord.timestamp) if fast else None,
+            )
+        except PaginationError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Serialize before log_usage commits (a commit expires the loaded rows)
+        if fast:
+            payload = [renderer.render(row) for row in observations]
+        else:
+            payload = [o.to_dict(fields) for o in observations]
         
         # Log usage
         log_usage("GET /api/observations")
         
-        return jsonify([o.to_dict() for o in observations])
+        response = add_cursor_headers(jsonify(payload), next_cursor, request)
+        response.set_etag(etag)
+        result_cache.store(cache_key, response, subscribed_product_ids)
+        return response
 
     @app.route("/api/observations/<int:obs_id>", methods=["GET"])
     @jwt_required()
     def get_obs(obs_id):
         current_user = get_jwt_identity()
         db = get_db()
-        obs = db.get(ObservationRecord, obs_id)
+        try:
+            fields = parse_fields(request.args.get("fields"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        option = field_loader(fields, ObservationRecord.product_id)
+        obs = db.get(ObservationRecord, obs_id, options=[option] if option is not None else None)
         if not obs:
             return jsonify({"error": "Not found"}), 404
         
-        # Access control: check if user has subscription for the product OR Pro Plan (ID 5)
-        if obs.product_id:
-            sub = db.query(Subscription).filter(
-                Subscription.user_id == current_user,
-                (Subscription.product_id == obs.product_id) | (Subscription.product_id == 5)
-            ).first()
-            if not sub:
-                return jsonify({"error": "Forbidden: Subscription required"}), 403
-
-        if obs.product_id:
-            sub = db.query(Subscription).filter(
-                Subscription.user_id == current_user,
-                (Subscription.product_id == obs.product_id) | (Subscription.product_id == 5)
-            ).first()
-            if not sub:
-                return jsonify({"error": "Forbidden: Subscription required"}), 403
+        # Access control: subscription for the product OR Pro Plan (cached per user)
+        if obs.product_id and not entitlements.allows(db, current_user, obs.product_id):
+            return jsonify({"error": "Forbidden: Subscription required"}), 403
+
+        payload = obs.to_dict(fields)
 
         # Log usage
         log_usage("GET /api/observations/:id")
 
-        return jsonify(obs.to_dict())
+        return jsonify(payload)
 
     @app.route("/api/observations/<int:obs_id>", methods=["PUT"])
     def update_obs(obs_id):
@@ -289,13 +591,30 @@ def register(app):
 
         # US-11 logic (Quarterly Lock) removed as per descoping
         data = request.get_json() or {}
+
+        # ISO 8601 timestamp -> naive UTC, as create_obs stores it
+        if data.get("timestamp") is not None:
+            try:
+                data["timestamp"] = ingest.utc_naive(data["timestamp"])
+            except ingest.IngestError as e:
+                return jsonify({"error": str(e)}), 400
         
         # Update fields dynamically
         for key, value in data.items():
             if hasattr(obs, key):
                 setattr(obs, key, value)
 
-        db.commit()
+        digest = identity_hash(obs)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Moved onto another stored reading (same content hash)
+            db.rollback()
+            existing = db.query(ObservationRecord.id).filter(ObservationRecord.content_hash == digest).scalar()
+            if digest is None or existing is None:
+                raise
+            return jsonify({"error": "Another observation already has this product, satellite, coordinates and timestamp",
+                            "id": existing}), 409
         
         # Log usage
         log_usage("PUT /api/observations/:id")
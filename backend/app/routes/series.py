@@ -0,0 +1,185 @@
+"""
+Aggregated time series of observation values, served from the rollup tables.
+"""
+from datetime import datetime, timedelta, timezone
+
+from flask import request, jsonify, g
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, select
+
+from app import versions, downsampling
+from app.entitlements import entitlements
+from app.routes.filtering import parse_datetime
+from app.routes.observation import ObservationRecord, log_usage
+from app.rollups import RESOLUTIONS, TABLES, bucket_key, pick_resolution, series_point
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+DEFAULT_RANGE = timedelta(days=30)
+# Downsample the raw observations instead of reading a rollup
+RAW = "raw"
+
+def get_db():
+    """Helper to get the current request's DB session"""
+    return g.db
+
+def _naive_utc(value):
+    """Rollup buckets are naive UTC, like the stored timestamps."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _raw_series(db, scope, satellite_id, start, end, method, points, etag):
+    """At most `points` individual observations picked by LTTB or min/max."""
+    series, total = [], 0
+    if scope is None or scope:
+        query = db.query(ObservationRecord).filter(
+            ObservationRecord.timestamp >= start,
+            ObservationRecord.timestamp <= end,
+        )
+        if scope is not None:
+            query = query.filter(ObservationRecord.product_id.in_(scope))
+        if satellite_id:
+            query = query.filter(ObservationRecord.satellite_id == satellite_id)
+        series, total = downsampling.downsampled_series(db, query, method, points)
+
+    log_usage("GET /api/observations/series")
+
+    response = jsonify({
+        "resolution": RAW,
+        "method": method,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total": total,
+        "points": series,
+    })
+    response.set_etag(etag)
+    return response
+
+def register(app):
+    """
+    Registers the time-series routes.
+    """
+
+    @app.route('/api/observations/series', methods=['GET'])
+    @jwt_required()
+    def observation_series():
+        """
+        Value statistics per time bucket, at the finest resolution that fits the point budget.
+        ---
+        tags:
+          - Observations
+        security:
+          - Bearer: []
+        parameters:
+          - name: product_id
+            in: query
+            type: integer
+            required: false
+            description: Defaults to every entitled product
+          - name: satellite_id
+            in: query
+            type: string
+            required: false
+          - name: start_date
+            in: query
+            type: string
+            required: false
+            description: ISO 8601, defaults to 30 days before end_date
+          - name: end_date
+            in: query
+            type: string
+            required: false
+            description: ISO 8601, defaults to now
+          - name: points
+            in: query
+            type: integer
+            required: false
+            description: Maximum number of buckets (default 500, capped at 5000)
+          - name: resolution
+            in: query
+            type: string
+            required: false
+            description: Force minute, hour or day instead of picking one; raw downsamples the observations themselves
+          - name: downsample
+            in: query
+            type: string
+            required: false
+            description: "For resolution=raw: 'lttb' (default) or 'minmax'"
+        responses:
+          200:
+            description: "{resolution, start, end, points: [{t, count, value_count, min, max, mean, stddev}]}; for raw, points are [{t, value, id}] plus total"
+          400:
+            description: Invalid parameters
+          403:
+            description: No subscription for the requested product
+        """
+        db = get_db()
+        try:
+            end = _naive_utc(parse_datetime(request.args['end_date'])) if request.args.get('end_date') \
+                else datetime.now(timezone.utc).replace(tzinfo=None)
+            start = _naive_utc(parse_datetime(request.args['start_date'])) if request.args.get('start_date') \
+                else end - DEFAULT_RANGE
+            points = min(int(request.args.get('points', DEFAULT_POINTS)), MAX_POINTS)
+            product_id = request.args.get('product_id')
+            product_id = int(product_id) if product_id else None
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameter: {e}"}), 400
+        if points < 1 or start > end:
+            return jsonify({"error": "points must be positive and start_date before end_date"}), 400
+
+        resolution = request.args.get('resolution') or pick_resolution(start, end, points)
+        if resolution != RAW and resolution not in RESOLUTIONS:
+            return jsonify({"error": f"resolution must be one of {', '.join((*RESOLUTIONS, RAW))}"}), 400
+        method = request.args.get('downsample', 'lttb')
+        if method not in downsampling.METHODS:
+            return jsonify({"error": f"downsample must be one of {', '.join(downsampling.METHODS)}"}), 400
+
+        # Access control (None means Pro Plan / all access)
+        entitled = entitlements.resolve(db, get_jwt_identity())
+        if product_id is not None:
+            if entitled is not None and product_id not in entitled:
+                return jsonify({"error": "Forbidden: Subscription required"}), 403
+            scope = [product_id]
+        else:
+            scope = entitled
+
+        etag = versions.query_etag(db, scope, request)
+        unchanged = versions.not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+
+        satellite_id = request.args.get('satellite_id')
+        if resolution == RAW:
+            return _raw_series(db, scope, satellite_id, start, end, method, points, etag)
+
+        table = TABLES[resolution]
+        query = select(
+            table.c.bucket,
+            func.sum(table.c.count),
+            func.sum(table.c.value_count),
+            func.min(table.c.value_min),
+            func.max(table.c.value_max),
+            func.sum(table.c.value_sum),
+            func.sum(table.c.value_sumsq),
+        ).where(
+            table.c.bucket >= bucket_key(resolution, start),
+            table.c.bucket <= bucket_key(resolution, end),
+        ).group_by(table.c.bucket).order_by(table.c.bucket)
+        if scope is not None:
+            query = query.where(table.c.product_id.in_(scope))
+        if satellite_id:
+            query = query.where(table.c.satellite_id == satellite_id)
+
+        series = [series_point(*row) for row in db.execute(query)] if scope is None or scope else []
+
+        log_usage("GET /api/observations/series")
+
+        response = jsonify({
+            "resolution": resolution,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "points": series,
+        })
+        response.set_etag(etag)
+        return response
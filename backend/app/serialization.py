@@ -0,0 +1,136 @@
+"""
+ORM-free read path for observations.
+
+The ORM path builds identity-mapped ObservationRecord instances (parsing every
+DATETIME through SQLAlchemy's result processor) only to turn them straight
+into dicts. This path selects plain row tuples with just the needed columns,
+keeps timestamps and spectral indices as the raw stored text, and renders
+them with a precompiled per-fieldset renderer. Output is byte-identical to
+`to_dict()` + jsonify; tests/test_observations.py and
+benchmarks/read_path.py check that.
+
+Which endpoints use it is controlled by app.config["FAST_READ_ENDPOINTS"]
+(env FAST_READ_ENDPOINTS, a comma-separated list of endpoint names, or
+"none").
+"""
+import json
+import os
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import String, type_coerce
+
+from app.catalog import product_catalog
+from app.streaming import STREAM_BATCH_SIZE
+from app.routes.observation import ObservationRecord, OBSERVATION_FIELDS
+
+DEFAULT_FAST_READ_ENDPOINTS = ("list_obs", "filter_observations")
+
+# Columns stored as text whose Python conversion is done here instead of by
+# SQLAlchemy's result processors
+_RAW_TEXT_COLUMNS = ("timestamp", "spectral_indices")
+
+
+def configure(app):
+    """Read FAST_READ_ENDPOINTS from the environment unless already configured."""
+    if "FAST_READ_ENDPOINTS" not in app.config:
+        raw = os.getenv("FAST_READ_ENDPOINTS")
+        if raw is None:
+            endpoints = set(DEFAULT_FAST_READ_ENDPOINTS)
+        elif raw.strip().lower() in ("", "none"):
+            endpoints = set()
+        else:
+            endpoints = {e.strip() for e in raw.split(",") if e.strip()}
+        app.config["FAST_READ_ENDPOINTS"] = endpoints
+
+
+def use_fast_path(endpoint):
+    return endpoint in current_app.config.get("FAST_READ_ENDPOINTS", ())
+
+
+def iso_timestamp(raw):
+    """
+    Convert SQLite's stored 'YYYY-MM-DD HH:MM:SS.ffffff' to datetime.isoformat()
+    output without building a datetime.
+    """
+    if raw is None:
+        return None
+    if len(raw) == 26 and raw[10] == " ":
+        if raw.endswith(".000000"):
+            return raw[:10] + "T" + raw[11:19]
+        return raw[:10] + "T" + raw[11:]
+    return datetime.fromisoformat(raw).isoformat()
+
+
+def parse_timestamp(raw):
+    return datetime.fromisoformat(raw) if raw is not None else None
+
+
+def _json_or_none(raw):
+    return json.loads(raw) if raw is not None else None
+
+
+class RowRenderer:
+    """
+    Renders plain row tuples for one fieldset.
+    Build once per request; `columns` is the SELECT list, `render(row)` the dict.
+    """
+    __slots__ = ("fields", "columns", "_plan", "_extra")
+
+    def __init__(self, fields=None, extra_columns=()):
+        self.fields = tuple(fields or OBSERVATION_FIELDS)
+        names = []
+        for field in self.fields:
+            source = "product_id" if field == "product_name" else field
+            if source not in names:
+                names.append(source)
+        # Extra columns (keyset sort keys) go last; they are selected but not rendered
+        self._extra = [c.key for c in extra_columns if c.key not in names]
+        names.extend(self._extra)
+
+        self.columns = [self._column(name) for name in names]
+        index = {name: i for i, name in enumerate(names)}
+        converters = {
+            "timestamp": iso_timestamp,
+            "spectral_indices": _json_or_none,
+            "product_name": product_catalog.name_for,
+        }
+        self._plan = [
+            (field, index["product_id" if field == "product_name" else field], converters.get(field))
+            for field in self.fields
+        ]
+
+    @staticmethod
+    def _column(name):
+        column = getattr(ObservationRecord, name)
+        if name in _RAW_TEXT_COLUMNS:
+            return type_coerce(column, String).label(name)
+        return column.label(name)
+
+    def render(self, row):
+        return {
+            field: convert(row[i]) if convert else row[i]
+            for field, i, convert in self._plan
+        }
+
+    def key_of(self, sort_column):
+        """Keyset (sort value, id) extractor for paginate()."""
+        sort_key = sort_column.key
+        if sort_key == "timestamp":
+            return lambda row: (parse_timestamp(row.timestamp), row.id)
+        return lambda row: (getattr(row, sort_key), row.id)
+
+
+def select_rows(db, fields=None, *extra_columns):
+    """
+    Return (renderer, query): a Query over plain row tuples (no ORM instances,
+    no identity map) selecting what `fields` and `extra_columns` need, plus id.
+    """
+    renderer = RowRenderer(fields, (ObservationRecord.id,) + extra_columns)
+    return renderer, db.query(*renderer.columns)
+
+
+def iter_rendered(query, renderer, batch_size=STREAM_BATCH_SIZE):
+    """Stream rendered rows, fetching `batch_size` tuples per round trip."""
+    for row in query.yield_per(batch_size):
+        yield renderer.render(row)
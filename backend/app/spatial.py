@@ -0,0 +1,131 @@
+"""
+Spatial helpers for observation coordinates.
+
+Coordinates arrive as free text in two formats ("30.1, -100.2" and
+"-33.86,151.20", both lat first). They are parsed into lat/lon columns, and
+an SQLite R*Tree (`observations_rtree`, kept in sync by triggers) indexes them
+for bounding-box and radius queries. Where SQLite was built without R*Tree
+support, queries fall back to the plain (lat, lon) B-tree index.
+"""
+import math
+
+from sqlalchemy import Table, Column, Integer, Float, MetaData, and_, or_, select, text
+
+RTREE_TABLE = "observations_rtree"
+EARTH_RADIUS_KM = 6371.0088
+# Half the equatorial circumference: no two points are further apart
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+# Kept out of Base.metadata: create_all must never create this as a plain table
+_rtree_metadata = MetaData()
+observations_rtree = Table(
+    RTREE_TABLE, _rtree_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("min_lon", Float),
+    Column("max_lon", Float),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+)
+
+
+def parse_coordinates(value):
+    """Parse a "lat, lon" string into floats; returns (None, None) if invalid."""
+    if not value or not isinstance(value, str):
+        return None, None
+    parts = value.split(",")
+    if len(parts) != 2:
+        return None, None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+
+def parse_bbox(value):
+    """
+    Parse a `minLon,minLat,maxLon,maxLat` bounding box.
+    minLon may exceed maxLon for boxes that cross the antimeridian.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(p) for p in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError("bbox longitudes must be within [-180, 180]")
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox latitudes must be within [-90, 90] and minLat <= maxLat")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def has_rtree(db):
+    """True when the R*Tree index has been created for this database."""
+    row = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": RTREE_TABLE},
+    ).first()
+    return row is not None
+
+
+def _lon_ranges(min_lon, max_lon):
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
+
+
+def bbox_condition(db, id_column, lat_column, lon_column, bbox):
+    """
+    SQL condition selecting rows inside `bbox`.
+    Candidates are pruned through the R*Tree when available; the exact test on
+    the lat/lon columns then removes the R*Tree's 32-bit rounding slack.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    exact = []
+    pruned = []
+    for lo, hi in _lon_ranges(min_lon, max_lon):
+        exact.append(and_(lat_column.between(min_lat, max_lat), lon_column.between(lo, hi)))
+        pruned.append(and_(
+            observations_rtree.c.max_lon >= lo, observations_rtree.c.min_lon <= hi,
+            observations_rtree.c.max_lat >= min_lat, observations_rtree.c.min_lat <= max_lat,
+        ))
+
+    condition = or_(*exact)
+    if has_rtree(db):
+        candidates = select(observations_rtree.c.id).where(or_(*pruned))
+        condition = and_(id_column.in_(candidates), condition)
+    return condition
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius_km):
+    """
+    Smallest lon/lat box containing every point within `radius_km` of (lat, lon),
+    used to prune candidates before the exact distance test.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle contains a pole: every longitude is reachable
+        return -180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0)
+
+    # Widest longitude span of the circle (at the latitude of its tangent points)
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return -180.0, min_lat, 180.0, max_lat
+    dlon = math.degrees(math.asin(ratio))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lon, min_lat, max_lon, max_lat
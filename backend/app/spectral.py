@@ -0,0 +1,88 @@
+"""
+Structured spectral index storage.
+
+`spectral_indices` is stored as a JSON object ({"NDVI": 0.42, "EVI": 0.31}).
+Each numeric entry is mirrored into the observation_spectral_indices child
+table by SQLite triggers, whose (name, value) index serves range filters such
+as `ndvi_min=0.6` or `index=EVI&min=0.2&max=0.5` without parsing any JSON.
+"""
+import ast
+import json
+import math
+
+from sqlalchemy import select
+
+# Indices that get `<name>_min` / `<name>_max` shorthand filter parameters
+KNOWN_INDICES = ("NDVI", "EVI", "NDWI", "SAVI", "NBR", "NDBI")
+# Longest spectral index text parsed; a real one is a few dozen characters
+MAX_TEXT_LENGTH = 4096
+
+
+def parse_spectral_indices(value):
+    """
+    Coerce spectral indices to {NAME: float} or None.
+    Accepts a dict, JSON text, or the legacy Python-repr text ("{'NDVI': 0.42}").
+    Names are upper-cased; non-numeric entries are dropped. Over-long or
+    pathologically nested text (client-supplied) is treated as unparseable.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        if len(value) > MAX_TEXT_LENGTH:
+            return None
+        try:
+            value = json.loads(value)
+        except (RecursionError, MemoryError):
+            return None
+        except ValueError:
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError, RecursionError, MemoryError):
+                return None
+    if not isinstance(value, dict):
+        return None
+
+    indices = {}
+    for name, number in value.items():
+        if isinstance(number, bool):
+            continue
+        try:
+            number = float(number)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(number):
+            indices[str(name).strip().upper()] = number
+    return indices or None
+
+
+def index_ranges(params):
+    """
+    Collect spectral index range filters from request parameters as
+    {NAME: (min, max)}; either bound may be None.
+    """
+    ranges = {}
+    name = params.get("index")
+    if name:
+        ranges[name.strip().upper()] = (params.get("min"), params.get("max"))
+    for known in KNOWN_INDICES:
+        low = params.get(f"{known.lower()}_min")
+        high = params.get(f"{known.lower()}_max")
+        if low not in (None, "") or high not in (None, ""):
+            ranges[known] = (low, high)
+
+    parsed = {}
+    for name, (low, high) in ranges.items():
+        low = float(low) if low not in (None, "") else None
+        high = float(high) if high not in (None, "") else None
+        parsed[name] = (low, high)
+    return parsed
+
+
+def index_range_condition(id_column, index_model, name, low, high):
+    """`id IN (observations whose index `name` lies within [low, high])`."""
+    subquery = select(index_model.observation_id).where(index_model.name == name)
+    if low is not None:
+        subquery = subquery.where(index_model.value >= low)
+    if high is not None:
+        subquery = subquery.where(index_model.value <= high)
+    return id_column.in_(subquery)
@@ -0,0 +1,91 @@
+"""
+Streaming JSON responses for large observation reads.
+
+Instead of materializing every ORM row, then a list of dicts, then one JSON
+string, rows are fetched in `yield_per` batches and encoded as they go out.
+Two wire formats are supported:
+
+- NDJSON (`Accept: application/x-ndjson` or `?stream=ndjson`): one JSON
+  document per line.
+- Chunked JSON array (`?stream=json`): the same body a normal request returns,
+  written incrementally.
+"""
+from flask import Response, current_app, stream_with_context
+
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Rows fetched per database round trip while streaming
+STREAM_BATCH_SIZE = 500
+# Encoded bytes buffered before a chunk is handed to the WSGI server
+CHUNK_SIZE = 64 * 1024
+
+
+def stream_mode(request):
+    """Return 'ndjson', 'json' or None (not streamed) for this request."""
+    requested = (request.args.get("stream") or "").lower()
+    if requested in ("ndjson", "json"):
+        return requested
+    if requested in ("1", "true"):
+        return "json"
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    if best == NDJSON_MIMETYPE:
+        return "ndjson"
+    return None
+
+
+def dumps(obj):
+    """Compact JSON through the app's JSON provider, matching jsonify's output."""
+    return current_app.json.dumps(obj, separators=(",", ":"))
+
+
+def _buffered(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _json_array(items, head, tail):
+    yield head
+    first = True
+    for item in items:
+        yield dumps(item) if first else "," + dumps(item)
+        first = False
+    yield tail() if callable(tail) else tail
+
+
+def _ndjson(items, tail):
+    for item in items:
+        yield dumps(item) + "\n"
+    if tail is not None:
+        trailer = tail()
+        if trailer is not None:
+            yield dumps(trailer) + "\n"
+
+
+def stream_response(items, mode, head="[", tail="]", ndjson_tail=None, status=200):
+    """
+    Build a streamed response from an iterable of JSON-serializable items.
+
+    For the JSON array mode, `head`/`tail` wrap the items (tail may be a
+    callable evaluated after the last item, e.g. to append metadata). For
+    NDJSON, `ndjson_tail` may return one final document to append.
+    """
+    if mode == "ndjson":
+        pieces, mimetype = _ndjson(items, ndjson_tail), NDJSON_MIMETYPE
+    else:
+        pieces, mimetype = _json_array(items, head, tail), JSON_MIMETYPE
+    # stream_with_context keeps the request (and its DB session) open while streaming
+    return Response(stream_with_context(_buffered(pieces)), status=status, mimetype=mimetype)
+
+
+def iter_dicts(query, fields=None, batch_size=STREAM_BATCH_SIZE):
+    """Serialize an ORM query row by row, fetching `batch_size` rows at a time."""
+    for obs in query.yield_per(batch_size):
+        yield obs.to_dict(fields)
@@ -0,0 +1,125 @@
+"""
+Per-product data versions for conditional GETs.
+
+Every write to observations bumps its product's row in data_versions, in the
+same transaction as the write (one UPSERT per product per flush). Readers
+derive a strong ETag from the versions of the products a response can
+contain, so an unchanged listing is answered with 304 after a lookup on this
+tiny table, without touching observations.
+
+Row 0 holds a random database epoch, so versions from a recreated database
+never reproduce an ETag a client saw before.
+"""
+import hashlib
+import json
+
+from flask import make_response
+from sqlalchemy import Column, Integer, event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.catalog import product_catalog
+
+EPOCH_ID = 0
+
+_commit_listeners = []
+
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    product_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def bump(conn, product_ids):
+    """Increment the version of each product (creating missing rows) on `conn`."""
+    ids = sorted({pid for pid in product_ids if pid is not None})
+    if not ids:
+        return
+    table = DataVersion.__table__
+    stmt = sqlite_insert(table).values([{"product_id": pid, "version": 1} for pid in ids])
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.product_id], set_={"version": table.c.version + 1})
+    conn.execute(stmt)
+
+
+def record_write(session, product_ids):
+    """
+    For writes made outside the ORM (Core/bulk statements): bump the versions
+    now, inside the session's transaction, and notify listeners on commit.
+    """
+    product_ids = set(product_ids)
+    bump(session.connection(), product_ids)
+    session.info.setdefault("changed_products", set()).update(product_ids)
+
+
+def on_commit(callback):
+    """Call `callback(product_ids)` after a transaction that changed those products commits."""
+    _commit_listeners.append(callback)
+    return callback
+
+
+def watch_observations(model):
+    """Track the products touched by ORM writes to `model` and bump them at flush."""
+    def _touched(mapper, connection, target):
+        touched = Session.object_session(target).info.setdefault("pending_products", set())
+        touched.add(target.product_id)
+        # Moving a row to another product changes both listings
+        history = inspect(target).attrs.product_id.history
+        touched.update(history.deleted or ())
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, name, _touched)
+
+    @event.listens_for(Session, "after_flush")
+    def _bump_pending(session, flush_context):
+        pending = session.info.pop("pending_products", None)
+        if pending:
+            record_write(session, pending)
+
+    @event.listens_for(Session, "after_commit")
+    def _notify(session):
+        changed = session.info.pop("changed_products", None)
+        if changed:
+            for callback in _commit_listeners:
+                callback(changed)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop("pending_products", None)
+        session.info.pop("changed_products", None)
+
+
+def current_versions(db, product_ids=None):
+    """{product_id: version} for `product_ids` (all products when None), including the epoch row."""
+    query = db.query(DataVersion.product_id, DataVersion.version)
+    if product_ids is not None:
+        query = query.filter(DataVersion.product_id.in_([EPOCH_ID, *product_ids]))
+    return dict(query.all())
+
+
+def query_etag(db, product_ids, request, *extra):
+    """
+    Strong ETag for a read over `product_ids` (None means every product):
+    the endpoint, its normalized arguments, the products' data versions and
+    the product names embedded in the serialized rows.
+    """
+    parts = [
+        request.path,
+        sorted(request.args.items(multi=True)),
+        sorted(current_versions(db, product_ids).items()),
+        sorted(product_catalog.names().items()),
+        list(extra),
+    ]
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+    return digest[:32]
+
+
+def not_modified(request, etag):
+    """A 304 response when the client already holds `etag`, else None."""
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+    return None
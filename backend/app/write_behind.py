@@ -0,0 +1,428 @@
+"""
+Optional write-behind ingest.
+
+SQLite allows one writer at a time, so many request threads each committing
+their own observation (plus a usage row) queue up on the write lock and
+eventually fail with "database is locked". In write-behind mode the ingest
+handlers only validate, append the rows to an on-disk journal and enqueue
+them, answering 202 with a ticket. One writer thread drains the queue and
+inserts everything waiting (up to WRITE_BEHIND_BATCH_ROWS rows) in a single
+transaction: a group commit.
+
+Durability: a submission is appended (and fsynced) to the journal before
+the handler returns. Each ticket is recorded in ingest_tickets in the same
+transaction as its rows, so on startup `replay()` re-enqueues exactly the
+journaled tickets that never committed, even after a crash between the
+commit and the journal being truncated. The journal is truncated whenever
+the queue drains.
+
+A batch that hits "database is locked" is retried with backoff and then put
+back on the queue; only data errors mark a submission FAILED. The writer
+thread logs and survives any other exception, and a submission stays in the
+journal until it is committed or failed.
+
+The journal has a single owner: the queue takes an exclusive flock on it and
+refuses to open a journal another process holds. install() therefore claims
+the first free slot of WRITE_BEHIND_JOURNAL, .1, .2, ... so every worker
+process gets its own journal, and a restarted worker replays whichever slot
+it claims. When every slot is held, write-behind is disabled for that process
+with a warning and its writes stay synchronous. Where flock is not available
+the process id is appended to the file name instead.
+
+Config (env vars of the same name):
+    WRITE_BEHIND_ENABLED    default False
+    WRITE_BEHIND_JOURNAL    default ingest_journal.ndjson (first slot; see above)
+    WRITE_BEHIND_BATCH_ROWS default 5000
+    WRITE_BEHIND_MAX_DELAY  default 0.01 s to wait for more rows before committing
+    WRITE_BEHIND_FSYNC      default True
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from flask import current_app, jsonify, url_for
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import idempotency, ingest
+from app.db import Base, SessionLocal
+from app.routes.observation import ApiUsage
+
+DEFAULT_JOURNAL = "ingest_journal.ndjson"
+DEFAULT_BATCH_ROWS = 5000
+DEFAULT_MAX_DELAY = 0.01
+# Journal files install() may claim: the configured path, then path.1 ... path.N-1
+JOURNAL_SLOTS = 64
+# Attempts for a batch that hits "database is locked" before it is requeued
+LOCKED_RETRIES = 5
+
+logger = logging.getLogger(__name__)
+
+QUEUED, COMMITTED, FAILED = "queued", "committed", "failed"
+
+
+class IngestTicket(Base):
+    """Outcome of one write-behind submission, written with its rows."""
+    __tablename__ = "ingest_tickets"
+
+    ticket = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False)
+    count = Column(Integer, nullable=False)
+    first_id = Column(Integer)
+    last_id = Column(Integer)
+    error = Column(Text)
+    committed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            "ticket": self.ticket,
+            "status": self.status,
+            "count": self.count,
+            "first_id": self.first_id,
+            "last_id": self.last_id,
+            "error": self.error,
+            "committed_at": self.committed_at.isoformat() if self.committed_at else None,
+        }
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode_row(row):
+    row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return row
+
+
+def _is_transient(error):
+    """Lock contention: the batch will go through once the lock clears."""
+    message = str(error)
+    return isinstance(error, OperationalError) and ("locked" in message or "busy" in message)
+
+
+def _open_journal(path):
+    """Open the journal for appending, holding an exclusive lock on it."""
+    if fcntl is None:
+        path = f"{path}.{os.getpid()}"
+    journal = open(path, "a", encoding="utf-8")
+    if fcntl is not None:
+        try:
+            fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            journal.close()
+            raise RuntimeError(f"write-behind journal {path} is in use by another process")
+    return path, journal
+
+
+class _Submission:
+    __slots__ = ("ticket", "rows", "endpoint")
+
+    def __init__(self, ticket, rows, endpoint):
+        self.ticket = ticket
+        self.rows = rows
+        self.endpoint = endpoint
+
+
+class WriteBehindQueue:
+    """Journal + in-memory queue + the single batching writer thread."""
+
+    def __init__(self, journal_path, session_factory=SessionLocal, batch_rows=DEFAULT_BATCH_ROWS,
+                 max_delay=DEFAULT_MAX_DELAY, fsync=True, logger=logger):
+        self.journal_path, self._journal = _open_journal(journal_path)
+        self._session_factory = session_factory
+        self.batch_rows = batch_rows
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.logger = logger
+        self._queue = queue.Queue()
+        # Held while appending + enqueueing, and while truncating the journal
+        self._journal_lock = threading.Lock()
+        self._pending = set()
+        self._thread = None
+        self._stopping = False
+        self.batches = 0
+        self.rows_written = 0
+
+    # Producer side
+
+    def submit(self, rows, endpoint, ticket=None):
+        """Journal and enqueue prepared rows; returns the ticket id."""
+        ticket = ticket or uuid.uuid4().hex
+        line = json.dumps({"ticket": ticket, "endpoint": endpoint,
+                           "rows": [{k: _encode(v) for k, v in row.items()} for row in rows]})
+        with self._journal_lock:
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.add(ticket)
+            self._queue.put(_Submission(ticket, rows, endpoint))
+        return ticket
+
+    def status(self, db, ticket):
+        """{ticket, status, ...} or None for an unknown ticket."""
+        if ticket in self._pending:
+            return {"ticket": ticket, "status": QUEUED}
+        record = db.get(IngestTicket, ticket)
+        return record.to_dict() if record is not None else None
+
+    # Lifecycle
+
+    def replay(self):
+        """Re-enqueue journaled submissions that never committed; returns how many."""
+        with self._journal_lock, open(self.journal_path, encoding="utf-8") as journal:
+            entries = []
+            for line in journal:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append was never acknowledged
+                    continue
+        if not entries:
+            return 0
+        db = self._session_factory()
+        try:
+            done = {t for t, in db.query(IngestTicket.ticket).filter(
+                IngestTicket.ticket.in_([e["ticket"] for e in entries]))}
+        finally:
+            db.close()
+        replayed = 0
+        with self._journal_lock:
+            for entry in entries:
+                if entry["ticket"] in done:
+                    continue
+                self._pending.add(entry["ticket"])
+                rows = [_decode_row(row) for row in entry["rows"]]
+                self._queue.put(_Submission(entry["ticket"], rows, entry["endpoint"]))
+                replayed += 1
+        return replayed
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def flush(self):
+        """Block until everything submitted so far is committed (or failed)."""
+        self._queue.join()
+
+    def stop(self):
+        """Drain the queue, stop the writer thread and release the journal."""
+        if self._thread is not None:
+            # Still-locked batches stay journaled for the next start's replay
+            self._stopping = True
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if not self._journal.closed:
+            self._journal.close()
+
+    # Writer side
+
+    def _collect(self, first):
+        batch, size = [first], len(first.rows)
+        deadline = time.monotonic() + self.max_delay
+        while size < self.batch_rows:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop sentinel: finish this batch, then exit
+                self._queue.task_done()
+                self._stopping = True
+                break
+            batch.append(item)
+            size += len(item.rows)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                return
+            batch = self._collect(first)
+            try:
+                self._write(batch)
+                self._truncate_if_idle()
+            except Exception:
+                # Never let the writer die: whatever did not commit stays queued
+                self.logger.exception("write-behind: batch of %d submissions failed", len(batch))
+                self._retry_later(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if self._stopping and self._queue.empty():
+                return
+
+    def _write(self, batch):
+        for attempt in range(LOCKED_RETRIES):
+            try:
+                self._commit(batch)
+                return
+            except Exception as e:
+                if not _is_transient(e):
+                    break
+                time.sleep(0.05 * 2 ** attempt)
+        else:
+            # Still locked: keep the whole batch journaled and try again later
+            self._retry_later(batch)
+            return
+        # A data error somewhere: isolate the submission(s) that cannot be written
+        for submission in batch:
+            try:
+                self._commit([submission])
+            except Exception as e:
+                if _is_transient(e):
+                    self._retry_later([submission])
+                    continue
+                try:
+                    self._fail(submission, e)
+                except Exception:
+                    self.logger.exception("write-behind: could not record failed ticket %s", submission.ticket)
+                    self._retry_later([submission])
+
+    def _retry_later(self, batch):
+        """Requeue the uncommitted submissions (left in the journal when stopping)."""
+        if self._stopping:
+            return
+        with self._journal_lock:
+            for submission in batch:
+                if submission.ticket in self._pending:
+                    self._queue.put(submission)
+
+    def _commit(self, batch):
+        db = self._session_factory()
+        try:
+            ids, duplicates = ingest.insert_rows(db, [row for s in batch for row in s.rows])
+            offset = 0
+            for submission in batch:
+                count = len(submission.rows)
+                chunk = ids[offset:offset + count]
+                offset += count
+                # Duplicates carry their original ids, so the range may reach back
+                db.add(IngestTicket(ticket=submission.ticket, status=COMMITTED, count=count,
+                                    first_id=min(chunk) if chunk else None,
+                                    last_id=max(chunk) if chunk else None))
+                db.add(ApiUsage(endpoint=submission.endpoint))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.batches += 1
+        self.rows_written += len(ids) - len(duplicates)
+        with self._journal_lock:
+            self._pending.difference_update(s.ticket for s in batch)
+
+    def _fail(self, submission, error):
+        db = self._session_factory()
+        try:
+            db.merge(IngestTicket(ticket=submission.ticket, status=FAILED,
+                                  count=len(submission.rows), error=str(error)[:500]))
+            db.commit()
+        finally:
+            db.close()
+        with self._journal_lock:
+            self._pending.discard(submission.ticket)
+
+    def _truncate_if_idle(self):
+        with self._journal_lock:
+            if not self._pending and self._journal.tell() > 0:
+                self._journal.truncate(0)
+                self._journal.seek(0)
+
+
+def _env_flag(name, default):
+    raw = os.getenv(name)
+    return default if raw is None else raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def install(app):
+    """
+    Start the write-behind writer when WRITE_BEHIND_ENABLED, replaying the
+    journal first (app.extensions['write_behind']). Returns None when the
+    mode is off or no journal slot is free.
+    """
+    app.config.setdefault("WRITE_BEHIND_ENABLED", _env_flag("WRITE_BEHIND_ENABLED", False))
+    app.config.setdefault("WRITE_BEHIND_JOURNAL", os.getenv("WRITE_BEHIND_JOURNAL", DEFAULT_JOURNAL))
+    app.config.setdefault("WRITE_BEHIND_BATCH_ROWS", int(os.getenv("WRITE_BEHIND_BATCH_ROWS", DEFAULT_BATCH_ROWS)))
+    app.config.setdefault("WRITE_BEHIND_MAX_DELAY", float(os.getenv("WRITE_BEHIND_MAX_DELAY", DEFAULT_MAX_DELAY)))
+    app.config.setdefault("WRITE_BEHIND_FSYNC", _env_flag("WRITE_BEHIND_FSYNC", True))
+    if not app.config["WRITE_BEHIND_ENABLED"]:
+        return None
+
+    journal = app.config["WRITE_BEHIND_JOURNAL"]
+    for slot in range(JOURNAL_SLOTS):
+        try:
+            writer = WriteBehindQueue(
+                f"{journal}.{slot}" if slot else journal,
+                batch_rows=app.config["WRITE_BEHIND_BATCH_ROWS"],
+                max_delay=app.config["WRITE_BEHIND_MAX_DELAY"],
+                fsync=app.config["WRITE_BEHIND_FSYNC"],
+                logger=app.logger,
+            )
+            break
+        except RuntimeError:
+            # Held by another worker process: try the next slot
+            continue
+    else:
+        app.logger.warning("write-behind: all %d journal slots of %s are in use; writing synchronously",
+                           JOURNAL_SLOTS, journal)
+        return None
+    replayed = writer.replay()
+    if replayed:
+        app.logger.info("write-behind: replaying %d journaled submissions", replayed)
+    writer.start()
+    atexit.register(writer.stop)
+    app.extensions["write_behind"] = writer
+    return writer
+
+
+def get_queue():
+    """The current app's write-behind queue, or None when the mode is off."""
+    return current_app.extensions.get("write_behind")
+
+
+def accepted(ticket, **extra):
+    """202 response pointing the client at the ticket's status."""
+    location = url_for("ingest_ticket_status", ticket=ticket)
+    response = jsonify({"ticket": ticket, "status": QUEUED, "status_url": location, **extra})
+    response.status_code = 202
+    response.headers["Location"] = location
+    return response
+
+
+def accept(db, request, rows, endpoint, **extra):
+    """
+    Queue `rows` and answer 202. With an Idempotency-Key the key is claimed
+    first (committed with the 202 body), so a concurrent retry with the same
+    key replays the ticket instead of queueing the rows a second time.
+    Requests without a key commit nothing here.
+    """
+    ticket = uuid.uuid4().hex
+    response = accepted(ticket, **extra)
+    if request.headers.get(idempotency.HEADER):
+        idempotency.remember(db, request, 202, response.get_json())
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            replayed = idempotency.check(db, request)
+            if replayed is None:
+                raise
+            return replayed
+    get_queue().submit(rows, endpoint, ticket=ticket)
+    return response
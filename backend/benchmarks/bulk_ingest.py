@@ -0,0 +1,72 @@
+"""
+Benchmark observation ingest: one POST /api/observations per row versus
+POST /api/observations/bulk batches.
+
+Both paths run full requests through the test client against a throwaway
+database and report rows per second.
+
+Usage (from backend/):
+    python benchmarks/bulk_ingest.py                       # 2000 rows, batches of 1000
+    python benchmarks/bulk_ingest.py --rows 20000 --batch 5000
+"""
+import argparse
+import os
+import random
+import time
+
+from common import populate
+
+
+def make_items(rows, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "product_id": i % 4 + 1,
+            "value": f"{rng.uniform(0, 400):.2f}",
+            "coordinates": f"{rng.uniform(-60, 60):.4f}, {rng.uniform(-180, 180):.4f}",
+            "satellite_id": f"SAT-{i % 12}",
+            "timestamp": f"2024-06-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "confidence": round(rng.uniform(50, 100), 1),
+        }
+        for i in range(rows)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    populate(0)
+    from run import get_app
+
+    os.environ.setdefault("FLASK_TESTING", "True")
+    app = get_app()
+    app.config["BULK_INGEST_MAX_ITEMS"] = max(args.batch, app.config["BULK_INGEST_MAX_ITEMS"])
+    for limiter in app.extensions.get("limiter", ()):
+        limiter.enabled = False
+    client = app.test_client()
+
+    items = make_items(args.rows, 1)
+    started = time.perf_counter()
+    for item in items:
+        response = client.post("/api/observations", json=item)
+        if response.status_code != 201:
+            raise SystemExit(f"single insert returned {response.status_code}")
+    single = args.rows / (time.perf_counter() - started)
+
+    items = make_items(args.rows, 2)
+    started = time.perf_counter()
+    for offset in range(0, args.rows, args.batch):
+        response = client.post("/api/observations/bulk", json=items[offset:offset + args.batch])
+        if response.status_code != 201:
+            raise SystemExit(f"bulk insert returned {response.status_code}: {response.get_data()[:200]!r}")
+    bulk = args.rows / (time.perf_counter() - started)
+
+    print(f"single  {single:10.0f} rows/s")
+    print(f"bulk    {bulk:10.0f} rows/s  ({bulk / single:.1f}x, batches of {args.batch})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Shared setup for the benchmark scripts.
+
+Importing this module moves the process into a scratch directory, so the
+app's relative sqlite:///run.db points at a throwaway database. Import it
+before anything from `app`.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="geoscope-bench-"))
+
+from app import migrations  # noqa: E402
+from app.catalog import product_catalog  # noqa: E402
+from app.db import Base, engine  # noqa: E402
+from app.entitlements import PRO_PLAN_ID  # noqa: E402
+from app.routes.observation import ObservationRecord, Product, derive_columns  # noqa: E402
+
+UNITS = ["NDVI", "Kelvin", "m2", "Status"]
+
+
+def populate(rows, batch=10000):
+    """Insert products 1-5 and `rows` synthetic observations (with derived columns) via Core."""
+    Base.metadata.create_all(engine)
+    migrations.upgrade(engine)
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Product.__table__.delete())
+        conn.execute(ObservationRecord.__table__.delete())
+        conn.execute(Product.__table__.insert(), [
+            {"id": pid, "name": f"Benchmark product {pid}"} for pid in range(1, PRO_PLAN_ID + 1)
+        ])
+        for offset in range(0, rows, batch):
+            values = []
+            for i in range(offset, min(offset + batch, rows)):
+                product_id = i % 4 + 1
+                raw = {
+                    "timestamp": start + timedelta(seconds=i * 37, microseconds=(i * 7919) % 1000000 if i % 3 else 0),
+                    "timezone": "UTC",
+                    "coordinates": f"{rng.uniform(-60, 60):.4f}, {rng.uniform(-180, 180):.4f}",
+                    "satellite_id": f"SAT-{i % 12}",
+                    "spectral_indices": {"NDVI": round(rng.random(), 3), "EVI": round(rng.random(), 3)},
+                    "notes": "synthetic",
+                    "product_id": product_id,
+                    "value": "Clear" if product_id == 4 and i % 2 else f"{rng.uniform(0, 400):.2f}",
+                    "unit": UNITS[product_id - 1],
+                    "confidence": round(rng.uniform(50, 100), 1),
+                }
+                raw.update(derive_columns(raw))
+                values.append(raw)
+            conn.execute(ObservationRecord.__table__.insert(), values)
+    product_catalog.invalidate()
@@ -0,0 +1,107 @@
+"""
+Benchmark the observation, usage-stats and subscriptions endpoints under the
+stdlib and orjson JSON providers.
+
+Builds a throwaway database (observations, recent api_usage rows and
+subscriptions), creates the app once per provider via get_app(), and times
+full requests through the test client. Response bodies are compared so a
+provider change can never silently alter the API.
+
+Usage (from backend/):
+    python benchmarks/json_provider.py                 # 10k observations
+    python benchmarks/json_provider.py --rows 50000 --repeat 10
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import PRO_PLAN_ID, populate
+
+from flask_jwt_extended import create_access_token
+
+from app.db import engine
+from app.routes.observation import ApiUsage, Subscription
+
+BENCH_USER = "bench@example.com"
+# usage-stats goes first: observation reads log usage rows, which would change its body
+ENDPOINTS = [
+    ("usage-stats", "/api/usage-stats"),
+    ("subscriptions", "/api/subscriptions"),
+    ("observations (500/page)", "/api/observations?limit=500"),
+    ("observations (streamed)", "/api/observations?stream=json"),
+]
+
+
+def populate_usage_and_subscriptions(rows, now):
+    with engine.begin() as conn:
+        conn.execute(ApiUsage.__table__.delete())
+        conn.execute(Subscription.__table__.delete())
+        conn.execute(ApiUsage.__table__.insert(), [
+            {"endpoint": "GET /api/observations", "timestamp": now - timedelta(seconds=i % 3000)}
+            for i in range(rows)
+        ])
+        subscriptions = [{"user_id": BENCH_USER, "product_id": PRO_PLAN_ID, "created_at": now}]
+        subscriptions += [
+            {"user_id": f"user{i}@example.com", "product_id": i % 4 + 1, "created_at": now - timedelta(minutes=i)}
+            for i in range(rows)
+        ]
+        conn.execute(Subscription.__table__.insert(), subscriptions)
+
+
+def make_client(provider):
+    from run import get_app
+
+    os.environ["JSON_PROVIDER"] = provider
+    # Plain HTTP through the test client (Talisman only forces HTTPS in production)
+    os.environ.setdefault("FLASK_TESTING", "True")
+    app = get_app()
+    for limiter in app.extensions.get("limiter", ()):
+        limiter.enabled = False
+    with app.app_context():
+        token = create_access_token(identity=BENCH_USER)
+    return app, app.test_client(), {"Authorization": f"Bearer {token}"}
+
+
+def time_endpoint(client, headers, url, repeat):
+    timings, body = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        body = response.get_data()
+        timings.append(time.perf_counter() - started)
+        response.close()
+        if response.status_code != 200:
+            raise SystemExit(f"{url} returned {response.status_code}: {body[:200]!r}")
+    return min(timings), body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000, help="observations (usage/subscription rows are rows/10)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    populate(args.rows)
+    now = datetime.now(timezone.utc)
+
+    results = {}
+    for provider in ("stdlib", "orjson"):
+        # Same rows for both providers (observation reads add usage rows as they go)
+        populate_usage_and_subscriptions(args.rows // 10, now)
+        app, client, headers = make_client(provider)
+        print(f"{provider}: {type(app.json).__name__}")
+        for label, url in ENDPOINTS:
+            results[provider, label] = time_endpoint(client, headers, url, args.repeat)
+
+    print(f"\n{'endpoint':<26}{'stdlib':>12}{'orjson':>12}{'speedup':>9}  body")
+    for label, _ in ENDPOINTS:
+        stdlib_time, stdlib_body = results["stdlib", label]
+        orjson_time, orjson_body = results["orjson", label]
+        same = "identical" if stdlib_body == orjson_body else "DIFFERS"
+        print(f"{label:<26}{stdlib_time * 1000:10.1f}ms{orjson_time * 1000:10.1f}ms"
+              f"{stdlib_time / orjson_time:8.1f}x  {len(stdlib_body) / 1e3:.0f} kB {same}")
+
+
+if __name__ == "__main__":
+    main()
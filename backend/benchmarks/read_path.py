@@ -0,0 +1,74 @@
+"""
+Benchmark the ORM and column-tuple (app.serialization) observation read paths.
+
+Builds a throwaway SQLite database with N synthetic observations and times
+query + serialize + JSON encode for a full listing, the way list_obs and
+filter_observations do it, then checks both paths produce identical bytes.
+
+Usage (from backend/):
+    python benchmarks/read_path.py            # 10k and 100k rows
+    python benchmarks/read_path.py 25000 --repeat 5
+"""
+import argparse
+import time
+
+from common import populate
+
+from flask import Flask
+
+from app import serialization
+from app.db import SessionLocal
+from app.routes.observation import ObservationRecord
+
+
+def orm_listing(db, app, fields=None):
+    query = db.query(ObservationRecord).order_by(
+        ObservationRecord.timestamp.desc(), ObservationRecord.id.desc()
+    )
+    return app.json.response([o.to_dict(fields) for o in query]).get_data()
+
+
+def fast_listing(db, app, fields=None):
+    renderer, query = serialization.select_rows(db, fields, ObservationRecord.timestamp)
+    query = query.order_by(ObservationRecord.timestamp.desc(), ObservationRecord.id.desc())
+    return app.json.response([renderer.render(row) for row in query]).get_data()
+
+
+def best_of(func, repeat, *args):
+    timings, result = [], None
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            result = func(db, *args)
+            timings.append(time.perf_counter() - started)
+        finally:
+            db.close()
+    return min(timings), result
+
+
+def run(rows, repeat):
+    populate(rows)
+    app = Flask(__name__)
+    with app.app_context():
+        for label, fields in (("all fields", None), ("id,timestamp,value", ["id", "timestamp", "value"])):
+            orm_time, orm_body = best_of(orm_listing, repeat, app, fields)
+            fast_time, fast_body = best_of(fast_listing, repeat, app, fields)
+            if orm_body != fast_body:
+                raise SystemExit(f"{rows} rows / {label}: fast path output differs from the ORM path")
+            print(f"{rows:>8} rows  {label:<20} orm {orm_time * 1000:8.1f} ms   "
+                  f"fast {fast_time * 1000:8.1f} ms   x{orm_time / fast_time:4.1f}   "
+                  f"{len(orm_body) / 1e6:6.1f} MB identical")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("rows", nargs="*", type=int, default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,18 @@ def get_app():
     app = Flask(__name__)
     CORS(app)
 
+    # JSON encoding: orjson when available, stdlib otherwise (JSON_PROVIDER overrides)
+    from app import json_provider
+    json_provider.install(app)
+
+    # Negotiated gzip/br/zstd response compression (COMPRESSION_* config)
+    from app import compression
+    compression.install(app)
+
+    # In-process LRU of rendered list/filter pages (RESULT_CACHE_* config)
+    from app import result_cache
+    result_cache.install(app)
+
     # JWT Config
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-key-change-me")
     app.secret_key = os.getenv("FLASK_SECRET_KEY", "super-secret-flask-key")  # Required for Authlib/Session
@@ -54,9 +66,20 @@ def get_app():
 
     # Import models to register with SQLAlchemy
     from app.routes.observation import ObservationRecord, Product, Subscription
+    from app import migrations, rollups, write_behind, idempotency
 
-    # Initialize DB tables
+    # Initialize DB tables, then bring indexes/columns up to the latest schema version
     Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+
+    # The database may have been recreated since the catalog/entitlements were last loaded
+    from app.catalog import product_catalog
+    product_catalog.invalidate()
+    from app.entitlements import entitlements
+    entitlements.invalidate()
+
+    # Optional write-behind ingest: replay the journal, start the writer (WRITE_BEHIND_* config)
+    write_behind.install(app)
 
     # Seed initial products if none exist
     db = SessionLocal()
@@ -159,12 +182,24 @@ def get_app():
     # Import and register routes
     import app.routes.observation as observation
     import app.routes.filtering as filtering
+    import app.routes.geospatial as geospatial
+    import app.routes.series as series
+    import app.routes.export as export
+    import app.routes.ingest as ingest
+    import app.routes.bulk_edit as bulk_edit
+    import app.routes.bulk12 as bulk12
     import app.routes.healthApi as healthApi
     import app.models.jwtAuth as jwtAuth
 
     # Register routes without passing a long-lived session
     observation.register(app)
     filtering.register(app)
+    geospatial.register(app)
+    series.register(app)
+    export.register(app)
+    ingest.register(app)
+    bulk_edit.register(app)
+    bulk12.register(app)
     healthApi.register(app)
     jwtAuth.register(app)
     
@@ -1,14 +1,17 @@
 from datetime import datetime, timezone, timedelta
 from app.db import engine, Base, SessionLocal
 from app.routes.observation import Product, Subscription, ObservationRecord, User
+from app.catalog import product_catalog
+from app import migrations
 from werkzeug.security import generate_password_hash
 import random
 
 def seed_database():
     """Populate database with realistic GeoScope data"""
     
-    # Create all tables
+    # Create all tables and apply schema migrations
     Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
     
     db = SessionLocal()
     
@@ -60,6 +63,8 @@ def seed_database():
         
         db.add_all(products)
         db.commit()
+        # Bulk query deletes bypass ORM events, so reset the catalog explicitly
+        product_catalog.invalidate()
         
         # Refresh to get IDs
         for p in products:
@@ -159,7 +164,7 @@ def seed_database():
                     timezone="UTC",
                     coordinates=f"{round(random.uniform(-90, 90), 6)}, {round(random.uniform(-180, 180), 6)}",
                     satellite_id=random.choice(satellites),
-                    spectral_indices=f"{{'NDVI': {round(random.uniform(0.1, 0.9), 2)}}}",
+                    spectral_indices={"NDVI": round(random.uniform(0.1, 0.9), 2)},
                     notes=f"Synthetic observation for Product {product_id}",
                     product_id=product_id
                 )
@@ -8,6 +8,7 @@ import tempfile
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash
 from flask_jwt_extended import create_access_token
+from sqlalchemy import event
 
 from run import get_app
 from app.db import Base, engine, SessionLocal
@@ -50,6 +51,19 @@ def db_session():
     session.close()
 
 
+@pytest.fixture
+def query_log():
+    """Record every SQL statement issued against the engine."""
+    statements = []
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", _before_execute)
+
+
 @pytest.fixture(scope='function')
 def test_user(db_session):
     """Create a verified test user."""
@@ -0,0 +1,75 @@
+"""
+Tests for the set-based PATCH / DELETE /api/observations endpoints.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.db import engine
+from app.routes.observation import ObservationRecord, Subscription
+from app.versions import current_versions
+
+
+@pytest.fixture
+def pro_headers(db_session, test_user, test_products, auth_headers):
+    """The test user on the Pro Plan (all products)."""
+    db_session.add(Subscription(user_id=test_user['email'], product_id=5))
+    db_session.commit()
+    return auth_headers
+
+
+def test_patch_by_filter_updates_derived_columns_once(client, db_session, pro_headers, query_log):
+    before = current_versions(db_session, [2])[2]
+    response = client.patch('/api/observations', json={
+        'filter': {'satellite_id': 'MODIS', 'product_id': 2},
+        'set': {'value': 'Flagged', 'notes': 're-flagged', 'spectral_indices': {'nbr': 0.2}},
+    }, headers=pro_headers)
+    assert response.status_code == 200
+    assert response.get_json() == {'updated': 100}
+    assert sum(s.startswith('UPDATE observations') for s in query_log) == 1
+
+    db_session.expire_all()
+    rows = db_session.query(ObservationRecord).filter(ObservationRecord.product_id == 2).all()
+    assert {(o.value, o.value_status, o.value_numeric, o.notes) for o in rows} == {('Flagged', 'Flagged', None, 're-flagged')}
+    assert current_versions(db_session, [2])[2] == before + 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM observation_spectral_indices WHERE name = 'NBR'")).scalar() == 100
+
+
+def test_delete_by_ids_and_filter(client, db_session, pro_headers):
+    ids = [obs_id for obs_id, in db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 3).limit(5)]
+    response = client.delete('/api/observations', json={'ids': ids + [10 ** 9]}, headers=pro_headers)
+    assert response.get_json() == {'deleted': 5}
+
+    # ids and filter together address their intersection
+    other = db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 4).first()[0]
+    response = client.delete('/api/observations', json={'ids': [other], 'filter': {'product_id': 1}}, headers=pro_headers)
+    assert response.get_json() == {'deleted': 0}
+    assert db_session.query(ObservationRecord).filter(ObservationRecord.product_id == 3).count() == 95
+
+
+def test_bulk_edit_requires_auth_and_stays_within_subscriptions(client, db_session, auth_headers, test_subscription):
+    wide = {'filter': {'min_value': -1e308}}
+    assert client.delete('/api/observations', json=wide).status_code == 401
+    assert client.patch('/api/observations', json={**wide, 'set': {'notes': 'n'}}).status_code == 401
+
+    # Subscribed to product 1 only: a table-wide filter reaches product 1 rows alone
+    other = db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 2).first()[0]
+    before = db_session.query(ObservationRecord).count()
+    product_1 = db_session.query(ObservationRecord).filter(ObservationRecord.product_id == 1).count()
+    assert client.delete('/api/observations', json={'ids': [other]}, headers=auth_headers).get_json() == {'deleted': 0}
+    assert client.delete('/api/observations', json=wide, headers=auth_headers).get_json() == {'deleted': product_1}
+    assert db_session.query(ObservationRecord).count() == before - product_1
+
+
+def test_bulk_edit_rejects_unsafe_requests(client, pro_headers):
+    assert client.delete('/api/observations', json={}, headers=pro_headers).status_code == 400
+    assert client.delete('/api/observations', json={'filter': {}}, headers=pro_headers).status_code == 400
+    assert client.delete('/api/observations', json={'filter': {'unknown': 1}}, headers=pro_headers).status_code == 400
+    assert client.delete('/api/observations', json={'ids': ['1']}, headers=pro_headers).status_code == 400
+    assert client.delete('/api/observations', json={'filter': {'start_date': 5}}, headers=pro_headers).status_code == 400
+    assert client.delete('/api/observations', json={'filter': {'product_id': [1]}}, headers=pro_headers).status_code == 400
+    assert client.patch('/api/observations', json={'filter': {'product_id': 3}, 'set': {'notes': 'n'}},
+                        headers=pro_headers).get_json() == {'updated': 100}
+    assert client.patch('/api/observations', json={'ids': [1], 'set': {'product_id': 2}}, headers=pro_headers).status_code == 400
+    assert client.patch('/api/observations', json={'ids': [1], 'set': {}}, headers=pro_headers).status_code == 400
+    assert client.patch('/api/observations', json={'filter': {'min_value': 'x'}, 'set': {'notes': 'n'}}, headers=pro_headers).status_code == 400
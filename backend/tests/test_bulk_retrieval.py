@@ -0,0 +1,53 @@
+"""
+Tests for US-12 bulk retrieval (/api/v1/bulk/insights).
+"""
+import json
+
+from app.routes import bulk12
+from app.routes.observation import ObservationRecord
+
+
+def _ids(db_session, product_id, n):
+    return [i for i, in db_session.query(ObservationRecord.id)
+            .filter(ObservationRecord.product_id == product_id).order_by(ObservationRecord.id).limit(n)]
+
+
+def test_get_keeps_request_order_and_reports_failures(client, auth_headers, test_subscription, db_session):
+    # The test user is subscribed to product 1 only
+    mine, theirs = _ids(db_session, 1, 3), _ids(db_session, 2, 1)
+    requested = [mine[2], 10 ** 9, mine[0], theirs[0], mine[1], mine[0]]
+    response = client.get('/api/v1/bulk/insights', query_string={'ids': ','.join(map(str, requested)),
+                                                                 'fields': 'id,value'}, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['id'] for r in body['results']] == [mine[2], mine[0], mine[1]]
+    assert set(body['results'][0]) == {'id', 'value'}
+    assert body['metadata']['failures'] == [
+        {'id': 10 ** 9, 'error': 'Record not found', 'code': 404},
+        {'id': theirs[0], 'error': 'Subscription required', 'code': 403},
+    ]
+    assert (body['metadata']['total_requested'], body['metadata']['found']) == (6, 3)
+
+    assert client.get('/api/v1/bulk/insights?ids=1').status_code == 401
+    assert client.get('/api/v1/bulk/insights?ids=a,b', headers=auth_headers).status_code == 400
+
+
+def test_post_chunks_large_id_lists_and_streams(client, auth_headers, test_subscription, db_session,
+                                               monkeypatch, query_log):
+    monkeypatch.setattr(bulk12, 'ID_CHUNK_SIZE', 7)
+    mine = list(reversed(_ids(db_session, 1, 100)))
+    requested = mine + list(range(10 ** 9, 10 ** 9 + 2000))
+
+    response = client.post('/api/v1/bulk/insights', json={'ids': requested, 'fields': ['id']}, headers=auth_headers)
+    body = response.get_json()
+    assert [r['id'] for r in body['results']] == mine
+    assert body['metadata']['failed_count'] == 2000
+    assert sum('observations.id IN' in s for s in query_log) == -(-len(requested) // 7)
+
+    streamed = client.post('/api/v1/bulk/insights?stream=ndjson', json={'ids': mine[:20] + [10 ** 9]},
+                           headers=auth_headers)
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert [r['id'] for r in lines[:-1]] == mine[:20]
+    assert lines[-1]['metadata']['failures'] == [{'id': 10 ** 9, 'error': 'Record not found', 'code': 404}]
+
+    assert client.post('/api/v1/bulk/insights', json={'ids': ['x']}, headers=auth_headers).status_code == 400
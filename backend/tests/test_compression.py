@@ -0,0 +1,70 @@
+"""
+Tests for negotiated response compression (app/compression.py).
+"""
+import gzip
+import json
+
+import brotli
+import pytest
+import zstandard
+
+
+def decode(response):
+    data = response.get_data()
+    coding = response.headers.get('Content-Encoding')
+    if coding == 'gzip':
+        return gzip.decompress(data)
+    if coding == 'br':
+        return brotli.decompress(data)
+    if coding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip', 'gzip'),
+    ('gzip, deflate, br', 'br'),
+    ('gzip, br, zstd', 'zstd'),
+    ('zstd;q=0.5, gzip', 'gzip'),
+    ('deflate', None),
+])
+def test_negotiates_encoding(client, accept, expected):
+    identity = client.get('/api/observations/filter?limit=50').get_data()
+    response = client.get('/api/observations/filter?limit=50', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == expected
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert decode(response) == identity
+
+
+def test_small_responses_stay_uncompressed(client):
+    response = client.get('/api/observations/filter?limit=1&fields=id', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()
+
+
+def test_streamed_response_is_compressed_incrementally(client):
+    response = client.get('/api/observations/filter?stream=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    response.close()
+    assert len(lines) == 400
+    assert all(json.loads(line)['id'] for line in lines)
+
+
+def test_compression_can_be_disabled(app, client):
+    app.config['COMPRESSION_ENABLED'] = False
+    response = client.get('/api/observations/filter?limit=50', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_response_without_content_type_passes_through(app):
+    @app.route('/_no_content_type')
+    def _no_content_type():
+        response = app.response_class(b'x' * 4096)
+        del response.headers['Content-Type']
+        return response
+
+    response = app.test_client().get('/_no_content_type', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,76 @@
+"""
+Tests for LTTB / min-max downsampling and the downsample query parameters.
+"""
+import numpy as np
+
+from app.downsampling import lttb, minmax
+
+
+def _signal(n=10000):
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 200.0)
+    y[4321] = 50.0
+    y[7777] = -50.0
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x, y = _signal()
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert {4321, 7777} <= set(keep.tolist())
+
+    assert lttb(x[:50], y[:50], 200).tolist() == list(range(50))
+    assert lttb(x, y, 2).tolist() == [0, len(x) - 1]
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    x, y = _signal()
+    keep = minmax(x, y, 100)
+    assert len(keep) <= 100
+    assert np.all(np.diff(keep) > 0)
+    assert {int(np.argmax(y)), int(np.argmin(y))} <= set(keep.tolist())
+    # Each of the 50 equal-count buckets contributes its own min and max
+    for bucket in np.array_split(np.arange(len(x)), 50):
+        kept = set(keep.tolist()) & set(bucket.tolist())
+        assert bucket[np.argmax(y[bucket])] in kept
+        assert bucket[np.argmin(y[bucket])] in kept
+
+
+def test_list_and_filter_downsample(client, auth_headers, test_subscription):
+    # The test user is subscribed to product 1, which has 100 seeded observations
+    for url, scope in (('/api/observations', {'product_id': 1}), ('/api/observations/filter', {'product_id': 1})):
+        for method in ('lttb', 'minmax'):
+            params = {**scope, 'downsample': method, 'points': 20}
+            response = client.get(url, query_string=params, headers=auth_headers)
+            assert response.status_code == 200
+            assert response.headers['X-Downsampled-From'] == '100'
+            rows = response.get_json()
+            assert 0 < len(rows) <= 20
+            stamps = [row['timestamp'] for row in rows]
+            assert stamps == sorted(stamps)
+            assert {row['product_id'] for row in rows} == {1}
+
+    bad = client.get('/api/observations?downsample=average&product_id=1', headers=auth_headers)
+    assert bad.status_code == 400
+    # One series per request: mixed products/units and streaming are refused
+    for url in ('/api/observations', '/api/observations/filter'):
+        assert client.get(url, query_string={'downsample': 'lttb'}, headers=auth_headers).status_code == 400
+        streamed = client.get(url, query_string={'downsample': 'lttb', 'product_id': 1, 'stream': 'ndjson'},
+                              headers=auth_headers)
+        assert streamed.status_code == 400
+
+
+def test_series_raw_resolution(client, auth_headers, test_subscription):
+    series = client.get(
+        '/api/observations/series',
+        query_string={'product_id': 1, 'resolution': 'raw', 'points': 10, 'start_date': '2000-01-01T00:00:00'},
+        headers=auth_headers,
+    ).get_json()
+    assert series['resolution'] == 'raw' and series['method'] == 'lttb'
+    assert series['total'] == 100
+    assert len(series['points']) == 10
+    assert [p['t'] for p in series['points']] == sorted(p['t'] for p in series['points'])
+    assert all(0.4 <= p['value'] <= 0.9 for p in series['points'])
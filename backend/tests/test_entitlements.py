@@ -0,0 +1,57 @@
+"""
+Tests for cached entitlement resolution (app/entitlements.py).
+"""
+from app.entitlements import EntitlementService
+from app.routes.observation import ObservationRecord, Subscription
+from app.routes.payments import handle_checkout_session
+
+
+def _subscription_selects(statements):
+    return [s for s in statements if 'FROM subscriptions' in s]
+
+
+def test_resolution_expires_after_ttl(app, db_session, test_subscription):
+    now = [0.0]
+    service = EntitlementService(ttl=10, clock=lambda: now[0])
+    user = test_subscription.user_id
+    assert service.resolve(db_session, user) == (1,)
+    db_session.add(Subscription(user_id=user, product_id=5))
+    db_session.commit()
+
+    # Another process' write: only the TTL brings it in
+    assert service.resolve(db_session, user) == (1,)
+    now[0] = 11
+    assert service.resolve(db_session, user) is None
+    assert (service.hits, service.misses) == (1, 2)
+
+
+def test_single_record_read_is_pk_lookup_plus_cache_hit(client, auth_headers, db_session, test_subscription, query_log):
+    obs_id = db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 1).first()[0]
+    assert client.get(f'/api/observations/{obs_id}', headers=auth_headers).status_code == 200
+
+    query_log.clear()
+    assert client.get(f'/api/observations/{obs_id}', headers=auth_headers).status_code == 200
+    assert not _subscription_selects(query_log)
+    assert len([s for s in query_log if 'FROM observations' in s]) == 1
+
+    other = db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 2).first()[0]
+    assert client.get(f'/api/observations/{other}', headers=auth_headers).status_code == 403
+
+
+def test_subscription_endpoints_invalidate(client, auth_headers, test_user):
+    user = test_user['email']
+    assert client.get('/api/observations', headers=auth_headers).get_json() == []
+
+    client.post('/api/subscriptions', json={'user_id': user, 'product_id': 3})
+    rows = client.get('/api/observations', headers=auth_headers).get_json()
+    assert rows and {row['product_id'] for row in rows} == {3}
+
+    client.delete('/api/subscriptions', json={'user_id': user, 'product_id': 3})
+    assert client.get('/api/observations', headers=auth_headers).get_json() == []
+
+
+def test_stripe_fulfillment_invalidates(client, auth_headers, test_user, test_products):
+    assert client.get('/api/observations', headers=auth_headers).get_json() == []
+    handle_checkout_session({'metadata': {'product_id': '5', 'user_email': test_user['email']}})
+    rows = client.get('/api/observations', headers=auth_headers).get_json()
+    assert {row['product_id'] for row in rows} == {1, 2, 3, 4}
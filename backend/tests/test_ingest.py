@@ -0,0 +1,164 @@
+"""
+Tests for the bulk observation ingest endpoints.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.routes.observation import ObservationRecord
+
+
+def test_bulk_insert_reports_ids_and_errors_in_order(client, db_session, test_products, query_log):
+    items = [
+        {'product_id': 1, 'value': '0.71', 'coordinates': '10.5, 20.5', 'timestamp': '2024-03-01T12:00:00Z',
+         'satellite_id': 'SENTINEL-2', 'spectral_indices': {'ndvi': 0.71}},
+        {'product_id': 999, 'value': '1'},
+        {'product_id': 2, 'value': 305, 'lat': 35.1, 'lon': -120.2, 'timestamp': '2024-03-01T14:00:00+02:00'},
+        {'value': 'Clear'},
+        'not an object',
+    ]
+    response = client.post('/api/observations/bulk', json=items)
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (2, 3)
+    results = body['results']
+    assert [r['index'] for r in results] == [0, 1, 2, 3, 4]
+    assert 'unknown product_id' in results[1]['error']
+    assert 'product_id' in results[3]['error'] and 'object' in results[4]['error']
+
+    first = db_session.get(ObservationRecord, results[0]['id'])
+    assert (first.value_numeric, first.lat, first.lon) == (0.71, 10.5, 20.5)
+    assert first.spectral_indices == {'NDVI': 0.71}
+    second = db_session.get(ObservationRecord, results[2]['id'])
+    assert second.coordinates == '35.1, -120.2'
+    assert second.timestamp.isoformat() == '2024-03-01T12:00:00'
+
+    # Triggers maintained the derived tables for the Core insert
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM observation_spectral_indices WHERE observation_id = :id"),
+                            {'id': first.id}).scalar() == 1
+    # One INSERT for the whole batch
+    assert sum(s.startswith('INSERT INTO observations ') for s in query_log) == 1
+
+
+def test_bulk_insert_limits_and_invalidation(app, client, auth_headers, test_subscription):
+    before = client.get('/api/observations', headers=auth_headers)
+    etag = before.headers['ETag']
+
+    created = client.post('/api/observations/bulk', json={'observations': [{'product_id': 1, 'value': '0.5'}] * 3})
+    assert created.status_code == 201
+    assert len(created.get_json()['results']) == 3
+    after = client.get('/api/observations', headers={**auth_headers, 'If-None-Match': etag})
+    assert after.status_code == 200
+
+    assert client.post('/api/observations/bulk', json={'product_id': 1}).status_code == 400
+    assert client.post('/api/observations/bulk', json=[{'value': 1}]).status_code == 400
+    app.config['BULK_INGEST_MAX_ITEMS'] = 2
+    assert client.post('/api/observations/bulk', json=[{'product_id': 1, 'value': 1}] * 3).status_code == 413
+
+
+def test_ndjson_ingest_commits_in_chunks(client, db_session, test_products):
+    lines = [f'{{"product_id": {i % 4 + 1}, "value": "{i}", "satellite_id": "S2"}}' for i in range(25)]
+    lines[3] = '{"product_id": 1'
+    lines[7] = '{"product_id": 42, "value": "1"}'
+    body = "\n".join(lines[:12]) + "\n\n" + "\n".join(lines[12:]) + "\n"
+
+    response = client.post('/api/observations/ingest?chunk_size=10', data=body,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    docs = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    progress, summary = docs[:-1], docs[-1]
+    assert [p['committed'] for p in progress] == [10, 20, 23]
+    assert progress[0]['last_id'] - progress[0]['first_id'] == 9
+    assert summary['done'] and (summary['created'], summary['failed']) == (23, 2)
+    assert summary['errors'] == [{'line': 4, 'error': 'invalid JSON'}, {'line': 8, 'error': 'unknown product_id 42'}]
+    assert db_session.query(ObservationRecord).filter(ObservationRecord.satellite_id == 'S2').count() == 23
+
+    assert client.post('/api/observations/ingest', json=[]).status_code == 415
+    assert client.post('/api/observations/ingest?chunk_size=0', data='',
+                       content_type='application/x-ndjson').status_code == 400
+
+
+def test_retries_are_deduplicated(client, db_session, test_products):
+    reading = {'product_id': 1, 'value': '0.66', 'coordinates': '12.5, 45.5', 'timestamp': '2024-07-01T08:00:00Z'}
+    first = client.post('/api/observations', json=reading)
+    assert first.status_code == 201
+    original = first.get_json()['id']
+
+    # Same reading without a key: found through the content hash
+    retry = client.post('/api/observations', json={**reading, 'timestamp': '2024-07-01T10:00:00+02:00'})
+    assert retry.status_code == 200
+    assert retry.get_json() == {'id': original, 'duplicate': True}
+    # Offsets are stored as UTC on every path, like the hash compares them
+    assert db_session.get(ObservationRecord, original).timestamp == datetime(2024, 7, 1, 8)
+    local = client.post('/api/observations', json={**reading, 'coordinates': '3.0, 3.0',
+                                                   'timestamp': '2024-07-01T10:00:00+02:00'})
+    assert db_session.get(ObservationRecord, local.get_json()['id']).timestamp == datetime(2024, 7, 1, 8)
+    assert client.post('/api/observations', json={**reading, 'timestamp': 'yesterday'}).status_code == 400
+
+    bulk = client.post('/api/observations/bulk', json=[reading, {**reading, 'value': '0.1', 'coordinates': '1.0, 1.0'},
+                                                       {**reading, 'coordinates': '1.0, 1.0'}])
+    results = bulk.get_json()['results']
+    assert results[0] == {'index': 0, 'id': original, 'duplicate': True}
+    assert results[2] == {'index': 2, 'id': results[1]['id'], 'duplicate': True}
+    assert (bulk.get_json()['created'], bulk.get_json()['duplicates']) == (1, 2)
+    assert db_session.query(ObservationRecord).filter(ObservationRecord.timestamp == datetime(2024, 7, 1, 8)).count() == 3
+
+
+def test_idempotency_key_replays_first_response(client, db_session, test_products):
+    headers = {'Idempotency-Key': 'feed-42-batch-7'}
+    items = [{'product_id': 2, 'value': '310'}, {'product_id': 2, 'value': '311'}]
+    first = client.post('/api/observations/bulk', json=items, headers=headers)
+    assert first.status_code == 201
+    count = db_session.query(ObservationRecord).count()
+
+    retry = client.post('/api/observations/bulk', json=items, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert db_session.query(ObservationRecord).count() == count
+
+    reused = client.post('/api/observations/bulk', json=items[:1], headers=headers)
+    assert reused.status_code == 422
+
+    single = client.post('/api/observations', json={'product_id': 3, 'value': '900'}, headers={'Idempotency-Key': 'k1'})
+    again = client.post('/api/observations', json={'product_id': 3, 'value': '900'}, headers={'Idempotency-Key': 'k1'})
+    assert again.get_json() == single.get_json() and again.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_only_client_timestamps_are_hashed(client, db_session, test_products):
+    server_stamped = client.post('/api/observations', json={'product_id': 2, 'value': '301', 'coordinates': '4.0, 4.0'})
+    twin = client.post('/api/observations', json={'product_id': 2, 'value': '302', 'coordinates': '5.0, 5.0'})
+    obs_id = server_stamped.get_json()['id']
+    # Unrelated edits never give a server-stamped row a hash...
+    assert client.put(f'/api/observations/{obs_id}', json={'notes': 'checked'}).status_code == 200
+    assert client.put(f'/api/observations/{twin.get_json()["id"]}', json={'coordinates': '4.0, 4.0'}).status_code == 200
+    db_session.expire_all()
+    assert db_session.get(ObservationRecord, obs_id).content_hash is None
+    # ...an explicit timestamp does
+    client.put(f'/api/observations/{obs_id}', json={'timestamp': '2024-07-03T00:00:00'})
+    db_session.expire_all()
+    assert db_session.get(ObservationRecord, obs_id).content_hash is not None
+
+
+def test_update_onto_a_stored_reading_conflicts(client, db_session, test_products):
+    reading = {'product_id': 1, 'value': '0.3', 'satellite_id': 'S2', 'timestamp': '2024-07-02T08:00:00'}
+    ids = [i['id'] for i in client.post('/api/observations/bulk', json=[
+        {**reading, 'coordinates': '1.0, 1.0'}, {**reading, 'coordinates': '2.0, 2.0'},
+    ]).get_json()['results']]
+
+    response = client.put(f'/api/observations/{ids[1]}', json={'coordinates': '1.0, 1.0'})
+    assert response.status_code == 409
+    assert response.get_json()['id'] == ids[0]
+    db_session.expire_all()
+    assert db_session.get(ObservationRecord, ids[1]).coordinates == '2.0, 2.0'
+    assert client.put(f'/api/observations/{ids[1]}', json={'coordinates': '3.0, 3.0'}).status_code == 200
+
+    assert client.put(f'/api/observations/{ids[1]}', json={'timestamp': 'soon'}).status_code == 400
+    assert client.put(f'/api/observations/{ids[1]}', json={'timestamp': 12}).status_code == 400
+    moved = client.put(f'/api/observations/{ids[1]}', json={'timestamp': '2024-07-02T10:00:00+02:00'})
+    assert moved.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(ObservationRecord, ids[1]).timestamp == datetime(2024, 7, 2, 8)
@@ -0,0 +1,53 @@
+"""
+Tests for the app-wide JSON providers (app/json_provider.py).
+"""
+from datetime import datetime, date, timezone
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from flask import Flask, jsonify
+
+from app import json_provider
+from app.json_provider import OrjsonProvider, StdlibJSONProvider
+
+DOCUMENT = {
+    "z": [1, 2.5, None, True],
+    "a": {"nested": "value", "b": 0.1},
+    "when": datetime(2024, 5, 1, 12, 30, 15, 250000),
+    "aware": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+    "day": date(2024, 5, 1),
+    "price": Decimal("499.10"),
+}
+
+
+def test_providers_encode_identically():
+    app = Flask(__name__)
+    stdlib = StdlibJSONProvider(app).dumps(DOCUMENT, separators=(",", ":"))
+    fast = OrjsonProvider(app).dumps(DOCUMENT, separators=(",", ":"))
+    assert fast == stdlib
+    assert '"when":"2024-05-01T12:30:15.250000"' in fast
+    assert '"aware":"2024-05-01T12:30:00+00:00"' in fast
+    assert '"price":"499.10"' in fast
+    assert fast.index('"a"') < fast.index('"z"')
+
+
+def test_orjson_provider_handles_numpy_and_round_trips():
+    provider = OrjsonProvider(Flask(__name__))
+    assert provider.loads(provider.dumps({"v": np.float64(1.5), "a": np.arange(3)})) == {"v": 1.5, "a": [0, 1, 2]}
+
+
+def test_app_uses_configured_provider(app):
+    assert isinstance(app.json, OrjsonProvider)
+    with app.test_request_context():
+        response = jsonify({"b": 1, "a": datetime(2024, 1, 1)})
+    assert response.get_data() == b'{"a":"2024-01-01T00:00:00","b":1}\n'
+
+
+def test_falls_back_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, "orjson", None)
+    app = Flask(__name__)
+    app.config["JSON_PROVIDER"] = "orjson"
+    assert isinstance(json_provider.install(app), StdlibJSONProvider)
+    with pytest.raises(ValueError):
+        json_provider.provider_class("simplejson")
@@ -0,0 +1,103 @@
+"""
+Test suite for the versioned schema migration runner.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db import Base
+from app import migrations
+import app.routes.observation  # noqa: F401  (registers models)
+
+
+def _indexes(engine, table):
+    with engine.connect() as conn:
+        return {row[1] for row in conn.execute(text(f"PRAGMA index_list({table})"))}
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A populated database created by create_all only, without any migrations."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN otp_code"))
+        for i in range(200):
+            conn.execute(text(
+                "INSERT INTO observations (product_id, satellite_id, timestamp) "
+                "VALUES (:p, 'MODIS', '2025-01-01 00:00:00.000000')"
+            ), {"p": i % 4 + 1})
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_builds_indexes_on_populated_db(legacy_engine):
+    assert migrations.current_version(legacy_engine) == 0
+    applied = migrations.upgrade(legacy_engine)
+
+    assert applied == [m.version for m in migrations.load_migrations()]
+    assert "ix_observations_product_timestamp" in _indexes(legacy_engine, "observations")
+    assert "ix_subscriptions_user_product" in _indexes(legacy_engine, "subscriptions")
+    with legacy_engine.connect() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(users)"))}
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM observations WHERE product_id = 2 "
+            "ORDER BY timestamp DESC"
+        )).all()
+    assert "otp_code" in columns
+    assert "ix_observations_product_timestamp" in str(plan)
+
+    # Re-running is a no-op
+    assert migrations.upgrade(legacy_engine) == []
+
+
+def test_downgrade_rolls_back(legacy_engine):
+    migrations.upgrade(legacy_engine)
+    reverted = migrations.downgrade(legacy_engine, 1)
+
+    assert 2 in reverted
+    assert migrations.current_version(legacy_engine) == 1
+    assert "ix_observations_product_timestamp" not in _indexes(legacy_engine, "observations")
+
+    with pytest.raises(migrations.MigrationError):
+        migrations.downgrade(legacy_engine, -1)
+
+
+def test_numeric_value_backfill(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(text("UPDATE observations SET value = '312' WHERE id = 1"))
+        conn.execute(text("UPDATE observations SET value = 'Detected' WHERE id = 2"))
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, value_numeric, value_status FROM observations WHERE id IN (1, 2) ORDER BY id"
+        )).all()
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM observations WHERE unit = 'Kelvin' AND value_numeric > 330"
+        )).all()
+    assert [tuple(r) for r in rows] == [(1, 312.0, None), (2, None, 'Detected')]
+    assert "ix_observations_unit_value" in str(plan)
+
+
+def test_spectral_indices_migrated_from_repr(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(text("UPDATE observations SET spectral_indices = '{''NDVI'': 0.42}' WHERE id = 1"))
+        conn.execute(text("UPDATE observations SET spectral_indices = 'garbage' WHERE id = 2"))
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        docs = conn.execute(text("SELECT spectral_indices FROM observations WHERE id IN (1, 2) ORDER BY id")).all()
+        children = conn.execute(text("SELECT observation_id, name, value FROM observation_spectral_indices")).all()
+    assert [d[0] for d in docs] == ['{"NDVI": 0.42}', None]
+    assert [tuple(c) for c in children] == [(1, "NDVI", 0.42)]
+
+
+def test_content_hash_is_not_backfilled(legacy_engine):
+    # The fixture holds 50 identical readings for each of 4 products; their
+    # timestamps may be server-assigned, so none of them is hashed
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        hashed = conn.execute(text("SELECT count(*) FROM observations WHERE content_hash IS NOT NULL")).scalar()
+    assert hashed == 0
+    assert "ux_observations_content_hash" in _indexes(legacy_engine, "observations")
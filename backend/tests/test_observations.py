@@ -0,0 +1,220 @@
+"""
+Test suite for observation read endpoints (listing, filtering, serialization).
+"""
+import pytest
+
+from app.catalog import product_catalog
+from app.routes.observation import Subscription, Product
+
+
+@pytest.fixture
+def pro_subscription(db_session, test_user, test_products):
+    """Give the test user the Pro Plan (all-access) subscription."""
+    sub = Subscription(user_id=test_user['email'], product_id=5)
+    db_session.add(sub)
+    db_session.commit()
+    return sub
+
+
+def test_list_uses_constant_product_queries(client, auth_headers, pro_subscription, query_log):
+    """Serializing many rows must not issue a product lookup per row."""
+    response = client.get('/api/observations', headers=auth_headers)
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert len(rows) > 10
+    assert rows[0]['product_name'] != f"Product #{rows[0]['product_id']}"
+
+    product_queries = [s for s in query_log if 'FROM products' in s]
+    assert len(product_queries) <= 1
+
+
+def test_catalog_refreshes_after_product_change(app, db_session, test_products):
+    """Committed product edits are visible through the catalog."""
+    assert product_catalog.name_for(1) == "Crop Health Monitoring"
+    version = product_catalog.version
+
+    product = db_session.get(Product, 1)
+    product.name = "Crop Health Monitoring v2"
+    db_session.commit()
+
+    assert product_catalog.version > version
+    assert product_catalog.name_for(1) == "Crop Health Monitoring v2"
+    assert product_catalog.name_for(999) == "Product #999"
+
+
+def test_list_paginates_with_cursor(client, auth_headers, pro_subscription):
+    """Walking the cursor chain returns every row exactly once, newest first."""
+    first = client.get('/api/observations?limit=150', headers=auth_headers)
+    assert first.status_code == 200
+    assert len(first.get_json()) == 150
+    cursor = first.headers['X-Next-Cursor']
+    assert 'rel="next"' in first.headers['Link']
+
+    seen = [row['id'] for row in first.get_json()]
+    while cursor:
+        page = client.get(f'/api/observations?limit=150&cursor={cursor}', headers=auth_headers)
+        assert page.status_code == 200
+        seen.extend(row['id'] for row in page.get_json())
+        cursor = page.headers.get('X-Next-Cursor')
+
+    assert len(seen) == len(set(seen)) == 400
+
+
+def test_page_size_is_capped(client, auth_headers, pro_subscription, monkeypatch):
+    monkeypatch.setattr('app.pagination.MAX_PAGE_SIZE', 50)
+    response = client.get('/api/observations?limit=100000', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 50
+
+
+def test_invalid_cursor_rejected(client, auth_headers, pro_subscription):
+    response = client.get('/api/observations?cursor=not-a-cursor', headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_filter_paginates(client):
+    response = client.get('/api/observations/filter?satellite_id=MODIS&limit=30')
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert len(rows) == 30
+    timestamps = [row['timestamp'] for row in rows]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    cursor = response.headers['X-Next-Cursor']
+    rest = client.get(f'/api/observations/filter?satellite_id=MODIS&limit=500&cursor={cursor}')
+    assert len(rows) + len(rest.get_json()) == 100
+    assert 'X-Next-Cursor' not in rest.headers
+
+
+def test_filter_numeric_range_and_sort(client):
+    response = client.get('/api/observations/filter?unit=Kelvin&min_value=330&sort=-value&limit=500')
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert rows
+    values = [float(row['value']) for row in rows]
+    assert all(v >= 330 for v in values)
+    assert values == sorted(values, reverse=True)
+
+
+def test_filter_value_sort_paginates(client):
+    first = client.get('/api/observations/filter?product_id=1&sort=value&limit=40')
+    cursor = first.headers['X-Next-Cursor']
+    rest = client.get(f'/api/observations/filter?product_id=1&sort=value&limit=500&cursor={cursor}')
+    values = [float(row['value']) for row in first.get_json() + rest.get_json()]
+    assert len(values) == 100
+    assert values == sorted(values)
+
+    # A cursor issued for one order cannot be replayed against another
+    mismatched = client.get(f'/api/observations/filter?product_id=1&cursor={cursor}')
+    assert mismatched.status_code == 400
+
+
+def test_filter_status_values(client):
+    response = client.get('/api/observations/filter?status=Clear&limit=500')
+    rows = response.get_json()
+    assert rows
+    assert {row['value'] for row in rows} == {'Clear'}
+    assert client.get('/api/observations/filter?min_value=abc').status_code == 400
+
+
+def test_spectral_index_filters(client, db_session):
+    from app.routes.observation import ObservationRecord
+    db_session.add_all([
+        ObservationRecord(product_id=1, satellite_id="SPEC-SAT", spectral_indices={"NDVI": 0.72, "EVI": 0.4}),
+        ObservationRecord(product_id=1, satellite_id="SPEC-SAT", spectral_indices="{'NDVI': 0.31}"),
+        ObservationRecord(product_id=1, satellite_id="SPEC-SAT", spectral_indices='{"evi": 0.25}'),
+    ])
+    db_session.commit()
+
+    rows = client.get('/api/observations/filter?satellite_id=SPEC-SAT&ndvi_min=0.6').get_json()
+    assert [row['spectral_indices'] for row in rows] == [{"NDVI": 0.72, "EVI": 0.4}]
+
+    rows = client.get('/api/observations/filter?index=EVI&min=0.2&max=0.3').get_json()
+    assert [row['spectral_indices'] for row in rows] == [{"EVI": 0.25}]
+
+    # Legacy repr text is normalized to a JSON object on write
+    rows = client.get('/api/observations/filter?satellite_id=SPEC-SAT&ndvi_max=0.5').get_json()
+    assert rows[0]['spectral_indices'] == {"NDVI": 0.31}
+
+
+def test_spectral_text_parsing_survives_hostile_input(client, test_observation):
+    from app.spectral import MAX_TEXT_LENGTH, parse_spectral_indices
+    # Deep nesting within the length cap hits the parsers' recursion limits
+    assert parse_spectral_indices("[" * 3000) is None
+    assert parse_spectral_indices("(" * 3000 + ")" * 3000) is None
+    assert parse_spectral_indices('{"NDVI": 0.5, "pad": "' + "x" * MAX_TEXT_LENGTH + '"}') is None
+    response = client.put(f'/api/observations/{test_observation.id}', json={'spectral_indices': '{' * 3000})
+    assert response.status_code == 200
+
+
+def test_list_streams_ndjson(client, auth_headers, pro_subscription):
+    import json
+    headers = dict(auth_headers, Accept='application/x-ndjson')
+    response = client.get('/api/observations', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+    assert len(rows) == 400
+    assert rows[0] == client.get('/api/observations?limit=1', headers=auth_headers).get_json()[0]
+
+
+def test_filter_streams_json_array(client):
+    streamed = client.get('/api/observations/filter?satellite_id=MODIS&stream=json')
+    assert streamed.is_streamed
+    rows = streamed.get_json()
+    paged = client.get('/api/observations/filter?satellite_id=MODIS&limit=500')
+    assert rows == paged.get_json()
+    assert len(rows) == 100
+
+
+def test_sparse_fieldsets_narrow_json_and_select(client, auth_headers, pro_subscription, query_log):
+    response = client.get('/api/observations?limit=5&fields=id,timestamp,value,unit', headers=auth_headers)
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert len(rows) == 5
+    assert all(set(row) == {'id', 'timestamp', 'value', 'unit'} for row in rows)
+
+    selects = [s for s in query_log if s.lstrip().startswith('SELECT') and 'FROM observations' in s]
+    assert selects and all('notes' not in s for s in selects)
+    # No lazy loads: one query for the page
+    assert len(selects) == 1
+
+
+def test_sparse_fieldsets_on_other_endpoints(client, auth_headers, pro_subscription):
+    rows = client.get('/api/observations/filter?limit=3&fields=product_name,value').get_json()
+    assert all(set(row) == {'product_name', 'value'} for row in rows)
+
+    obs_id = rows and client.get('/api/observations?limit=1', headers=auth_headers).get_json()[0]['id']
+    single = client.get(f'/api/observations/{obs_id}?fields=id,unit', headers=auth_headers)
+    assert set(single.get_json()) == {'id', 'unit'}
+
+    bad = client.get('/api/observations?fields=id,password', headers=auth_headers)
+    assert bad.status_code == 400
+
+
+@pytest.mark.parametrize('url', [
+    '/api/observations?limit=50',
+    '/api/observations?limit=20&fields=id,timestamp,spectral_indices,product_name',
+    '/api/observations?stream=ndjson',
+    '/api/observations/filter?limit=40&product_id=2&sort=-value',
+    '/api/observations/filter?stream=json&unit=Kelvin',
+])
+def test_fast_read_path_matches_orm_bytes(app, client, auth_headers, pro_subscription, url):
+    """The column-tuple read path must produce exactly the ORM path's bytes and cursors."""
+    def fetch():
+        response = client.get(url, headers=auth_headers)
+        body = response.get_data()
+        response.close()
+        return body, response.headers.get('X-Next-Cursor')
+
+    app.config['RESULT_CACHE_ENABLED'] = False
+    app.config['FAST_READ_ENDPOINTS'] = set()
+    orm_body, orm_cursor = fetch()
+    app.config['FAST_READ_ENDPOINTS'] = {'list_obs', 'filter_observations'}
+    fast_body, fast_cursor = fetch()
+
+    assert len(orm_body) > 2
+    assert fast_body == orm_body
+    assert fast_cursor == orm_cursor
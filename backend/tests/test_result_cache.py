@@ -0,0 +1,61 @@
+"""
+Tests for the list/filter result cache (app/result_cache.py).
+"""
+from app.result_cache import ResultCache
+
+
+def test_lru_respects_byte_budget_and_tags():
+    cache = ResultCache(max_bytes=800)
+    cache.put('a', b'x' * 90, [], 'application/json', [1])
+    cache.put('b', b'x' * 90, [], 'application/json', [2])
+    cache.get('a')  # 'a' is now most recently used
+    for key in 'cdefghi':
+        cache.put(key, b'x' * 90, [], 'application/json', [3])
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.evictions == 1
+    assert cache.stats()['bytes'] <= 800
+
+    cache.put('all', b'{}', [], 'application/json', None)
+    cache.invalidate({3})
+    assert cache.get('c') is None and cache.get('all') is None
+    assert cache.get('a') is not None
+
+    cache.put('huge', b'x' * 200, [], 'application/json', [1])
+    assert cache.get('huge') is None
+
+
+def test_filter_repeats_served_from_cache(app, client):
+    url = '/api/observations/filter?satellite_id=MODIS&limit=20'
+    first = client.get(url)
+    second = client.get(url)
+    assert second.get_data() == first.get_data()
+    assert second.headers['X-Next-Cursor'] == first.headers['X-Next-Cursor']
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    # Same parameters in another order are the same query
+    client.get('/api/observations/filter?limit=20&satellite_id=MODIS')
+    stats = client.get('/health/cache').get_json()
+    assert stats['hits'] == 2 and stats['misses'] == 1 and stats['entries'] == 1
+
+
+def test_writes_invalidate_tagged_entries(app, client, query_log):
+    client.get('/api/observations/filter?product_id=2&limit=5')
+    client.get('/api/observations/filter?product_id=3&limit=5')
+
+    client.post('/api/observations', json={'product_id': 2, 'value': 333})
+    stats = client.get('/health/cache').get_json()
+    assert stats['entries'] == 1 and stats['invalidations'] == 1
+
+    query_log.clear()
+    rows = client.get('/api/observations/filter?product_id=2&limit=5').get_json()
+    assert rows[0]['value'] == '333'
+    assert any('FROM observations' in s for s in query_log)
+
+
+def test_list_cache_is_per_entitlement_set(app, client, auth_headers, test_subscription):
+    first = client.get('/api/observations?limit=10', headers=auth_headers).get_json()
+    assert {row['product_id'] for row in first} == {1}
+    cached = client.get('/api/observations?limit=10', headers=auth_headers).get_json()
+    assert cached == first
+    assert app.extensions['result_cache'].hits == 1
@@ -0,0 +1,104 @@
+"""
+Tests for the observation rollup tables and /api/observations/series.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.db import engine
+from app.rollups import pick_resolution, rebuild
+from app.rollups.__main__ import main as rollups_cli
+from app.routes.observation import ObservationRecord, Subscription
+
+
+def _rollup_rows(resolution):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f"SELECT product_id, satellite_id, bucket, count, value_count, value_min, value_max, "
+            f"round(value_sum, 6), round(value_sumsq, 6) FROM observation_rollups_{resolution} "
+            f"ORDER BY 1, 2, 3"
+        )).all()
+
+
+def _raw_day_rows():
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT product_id, coalesce(satellite_id, ''), strftime('%Y-%m-%d 00:00:00', timestamp), count(*), "
+            "count(value_numeric), min(value_numeric), max(value_numeric), round(total(value_numeric), 6), "
+            "round(total(value_numeric * value_numeric), 6) FROM observations GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+        )).all()
+
+
+def test_rollups_track_inserts_updates_and_deletes(app, client, db_session):
+    assert _rollup_rows('day') == _raw_day_rows()
+    assert sum(row[3] for row in _rollup_rows('minute')) == 400
+
+    obs = db_session.query(ObservationRecord).filter(ObservationRecord.product_id == 2).first()
+    obs.value = "9999"
+    obs.timestamp = obs.timestamp - timedelta(days=400)
+    db_session.commit()
+    client.delete(f"/api/observations/{db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 3).first()[0]}")
+    client.post('/api/observations', json={'product_id': 2, 'value': 'n/a', 'timestamp': '2024-01-01T10:00:00'})
+
+    assert _rollup_rows('day') == _raw_day_rows()
+    assert sum(row[3] for row in _rollup_rows('hour')) == 400
+    assert max(row[6] for row in _rollup_rows('hour') if row[6] is not None) == 9999
+
+
+def test_rebuild_command_regenerates(app, capsys):
+    before = {r: _rollup_rows(r) for r in ('minute', 'hour', 'day')}
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM observation_rollups_hour"))
+    rollups_cli(['rebuild'])
+    assert {r: _rollup_rows(r) for r in ('minute', 'hour', 'day')} == before
+    assert 'hour:' in capsys.readouterr().out
+
+    with pytest.raises(SystemExit):
+        rollups_cli(['rebuild', 'week'])
+
+
+def test_pick_resolution():
+    start = datetime(2025, 1, 1)
+    assert pick_resolution(start, start + timedelta(hours=2), 500) == 'minute'
+    assert pick_resolution(start, start + timedelta(days=10), 500) == 'hour'
+    assert pick_resolution(start, start + timedelta(days=365), 500) == 'day'
+    assert pick_resolution(start, start + timedelta(days=3650), 500) == 'day'
+
+
+def test_series_endpoint(client, auth_headers, test_subscription, db_session):
+    # The test user is subscribed to product 1 only
+    end = datetime.now(timezone.utc) + timedelta(days=1)
+    window = {'product_id': 1, 'start_date': (end - timedelta(days=32)).isoformat(), 'end_date': end.isoformat()}
+
+    daily = client.get('/api/observations/series', query_string={**window, 'points': 100}, headers=auth_headers).get_json()
+    assert daily['resolution'] == 'day'
+    assert sum(p['count'] for p in daily['points']) == 100
+    assert all(0.4 <= p['min'] <= p['mean'] <= p['max'] <= 0.9 for p in daily['points'])
+
+    hourly = client.get('/api/observations/series', query_string={**window, 'points': 1000}, headers=auth_headers).get_json()
+    assert hourly['resolution'] == 'hour'
+    assert sum(p['count'] for p in hourly['points']) == 100
+
+    forbidden = client.get('/api/observations/series?product_id=2', headers=auth_headers)
+    assert forbidden.status_code == 403
+    scoped = client.get('/api/observations/series?points=100', headers=auth_headers).get_json()
+    assert sum(p['count'] for p in scoped['points']) == 100
+
+
+def test_set_based_writes_keep_rollups_exact(app, client, db_session, test_user, auth_headers):
+    # Pro Plan: the bulk edits may touch every product
+    db_session.add(Subscription(user_id=test_user['email'], product_id=5))
+    db_session.commit()
+    # Bucket extremes move (PATCH) and disappear (DELETE); deltas alone cannot fix min/max
+    client.patch('/api/observations', json={'filter': {'product_id': 1}, 'set': {'value': '0.01'}}, headers=auth_headers)
+    ids = [i for i, in db_session.query(ObservationRecord.id).filter(ObservationRecord.product_id == 2)
+           .order_by(ObservationRecord.value_numeric.desc()).limit(60)]
+    client.delete('/api/observations', json={'ids': ids}, headers=auth_headers)
+    client.delete('/api/observations', json={'filter': {'product_id': 3}}, headers=auth_headers)
+
+    incremental = {r: _rollup_rows(r) for r in ('minute', 'hour', 'day')}
+    assert incremental['day'] == _raw_day_rows()
+    with engine.begin() as conn:
+        rebuild(conn)
+    assert {r: _rollup_rows(r) for r in ('minute', 'hour', 'day')} == incremental
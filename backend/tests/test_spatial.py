@@ -0,0 +1,133 @@
+"""
+Test suite for spatial storage and queries on observation coordinates.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.spatial import parse_coordinates, parse_bbox, RTREE_TABLE
+from app.routes.observation import ObservationRecord
+
+
+def test_parse_coordinates_formats():
+    assert parse_coordinates("30.1, -100.2") == (30.1, -100.2)
+    assert parse_coordinates("-33.86,151.20") == (-33.86, 151.2)
+    assert parse_coordinates("not a point") == (None, None)
+    assert parse_coordinates("95.0, 10.0") == (None, None)
+    with pytest.raises(ValueError):
+        parse_bbox("1,2,3")
+
+
+def test_bbox_filter(client):
+    # Product 2 (wildfire) is seeded around lat 35-40, lon -125..-120
+    response = client.get('/api/observations/filter?bbox=-125.5,34.5,-119.5,40.5&limit=500')
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert len(rows) == 100
+    assert {row['product_id'] for row in rows} == {2}
+
+    empty = client.get('/api/observations/filter?bbox=10,10,20,20')
+    assert empty.get_json() == []
+    assert client.get('/api/observations/filter?bbox=1,2,3').status_code == 400
+
+
+def test_bbox_crossing_antimeridian(client, db_session):
+    for coords in ("10.0, 179.5", "10.0, -179.5", "10.0, 0.0"):
+        db_session.add(ObservationRecord(product_id=1, coordinates=coords))
+    db_session.commit()
+
+    response = client.get('/api/observations/filter?bbox=179,9,-179,11')
+    assert sorted(row['coordinates'] for row in response.get_json()) == ["10.0, -179.5", "10.0, 179.5"]
+
+
+def test_rtree_follows_writes(client, db_session):
+    obs = ObservationRecord(product_id=1, coordinates="1.5, 2.5")
+    db_session.add(obs)
+    db_session.commit()
+
+    def rtree_row():
+        return db_session.execute(
+            text(f"SELECT min_lat, min_lon FROM {RTREE_TABLE} WHERE id = :id"), {"id": obs.id}
+        ).first()
+
+    assert rtree_row() == pytest.approx((1.5, 2.5))
+
+    client.put(f'/api/observations/{obs.id}', json={"coordinates": "-4.0, 8.0"})
+    assert rtree_row() == pytest.approx((-4.0, 8.0))
+
+    client.delete(f'/api/observations/{obs.id}')
+    assert rtree_row() is None
+
+
+@pytest.fixture
+def pro_subscription(db_session, test_user, test_products):
+    from app.routes.observation import Subscription
+    db_session.add(Subscription(user_id=test_user['email'], product_id=5))
+    db_session.commit()
+
+
+def test_nearby_knn_ordered_by_distance(client, auth_headers, pro_subscription):
+    # Centre of the seeded wildfire area
+    response = client.get('/api/observations/nearby?lat=37.5&lon=-122.5&k=20', headers=auth_headers)
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert len(rows) == 20
+    distances = [row['distance_km'] for row in rows]
+    assert distances == sorted(distances)
+    assert {row['product_id'] for row in rows} == {2}
+
+    # Brute force agrees on the nearest neighbour
+    everything = client.get('/api/observations/filter?limit=500').get_json()
+    from app.spatial import parse_coordinates, haversine_km
+    best = min(
+        haversine_km(37.5, -122.5, *parse_coordinates(o['coordinates']))
+        for o in everything if parse_coordinates(o['coordinates'])[0] is not None
+    )
+    assert distances[0] == pytest.approx(best, abs=1e-3)
+
+
+def test_nearby_radius(client, auth_headers, pro_subscription):
+    response = client.get('/api/observations/nearby?lat=37.5&lon=-122.5&radius_km=50&k=1000',
+                          headers=auth_headers)
+    rows = response.get_json()
+    assert all(row['distance_km'] <= 50 for row in rows)
+
+    far = client.get('/api/observations/nearby?lat=0&lon=0&radius_km=25', headers=auth_headers)
+    assert far.get_json() == []
+    assert client.get('/api/observations/nearby?lat=abc&lon=0', headers=auth_headers).status_code == 400
+
+
+def test_nearby_respects_subscriptions(client, auth_headers, test_subscription):
+    # test_subscription grants product 1 only
+    rows = client.get('/api/observations/nearby?lat=37.5&lon=-122.5&k=30', headers=auth_headers).get_json()
+    assert rows and {row['product_id'] for row in rows} == {1}
+
+
+def test_grid_world_view(client, auth_headers, pro_subscription):
+    response = client.get('/api/observations/grid?zoom=0', headers=auth_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['cells']) == 1
+    assert body['cells'][0]['count'] == body['total'] == 400
+
+
+def test_grid_product_values(client, auth_headers, pro_subscription):
+    response = client.get('/api/observations/grid?zoom=6&product_id=2', headers=auth_headers)
+    cells = response.get_json()['cells']
+    assert sum(c['count'] for c in cells) == 100
+    for cell in cells:
+        assert 300 <= cell['min'] <= cell['mean'] <= cell['max'] <= 350
+        west, south, east, north = cell['bounds']
+        assert west < east and south < north
+
+    # Status-only products still get densities but no value statistics
+    status_cells = client.get('/api/observations/grid?zoom=2&product_id=4', headers=auth_headers).get_json()['cells']
+    assert status_cells and all(c['mean'] is None for c in status_cells)
+    assert client.get('/api/observations/grid?zoom=40', headers=auth_headers).status_code == 400
+
+
+def test_tile_xy_matches_osm_scheme():
+    import numpy as np
+    from app.heatmap import tile_xy
+    # London at zoom 10 is tile 511/340 in the OSM scheme
+    x, y = tile_xy(np.array([51.5074]), np.array([-0.1278]), 10)
+    assert (x[0], y[0]) == (511, 340)
@@ -0,0 +1,70 @@
+"""
+Tests for per-product data versions and conditional GETs (app/versions.py).
+"""
+import pytest
+
+from app.routes.observation import Subscription
+from app.versions import EPOCH_ID, current_versions
+
+
+@pytest.fixture
+def product2_subscription(db_session, test_user, test_products):
+    sub = Subscription(user_id=test_user['email'], product_id=2)
+    db_session.add(sub)
+    db_session.commit()
+    return sub
+
+
+def _observation_selects(statements):
+    return [s for s in statements if 'FROM observations' in s]
+
+
+def test_writes_bump_product_versions(client, db_session):
+    before = current_versions(db_session)
+    assert EPOCH_ID in before
+
+    created = client.post('/api/observations', json={'product_id': 2, 'value': 310}).get_json()
+    client.put(f"/api/observations/{created['id']}", json={'product_id': 3})
+    after_move = current_versions(db_session)
+    assert after_move[2] == before[2] + 2
+    assert after_move[3] == before[3] + 1
+    assert after_move[1] == before[1]
+
+    client.delete(f"/api/observations/{created['id']}")
+    assert current_versions(db_session)[3] == before[3] + 2
+
+
+def test_list_answers_304_without_reading_observations(client, auth_headers, product2_subscription, query_log):
+    first = client.get('/api/observations?limit=20', headers=auth_headers)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    query_log.clear()
+    cached = client.get('/api/observations?limit=20', headers={**auth_headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert not _observation_selects(query_log)
+
+    # Other query parameters are other representations
+    other = client.get('/api/observations?limit=10', headers={**auth_headers, 'If-None-Match': etag})
+    assert other.status_code == 200
+
+    # A write to a product the user cannot see keeps the ETag...
+    client.post('/api/observations', json={'product_id': 1, 'value': 0.5})
+    assert client.get('/api/observations?limit=20', headers={**auth_headers, 'If-None-Match': etag}).status_code == 304
+    # ...a write to an entitled product invalidates it
+    client.post('/api/observations', json={'product_id': 2, 'value': 320})
+    fresh = client.get('/api/observations?limit=20', headers={**auth_headers, 'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+
+
+def test_filter_etag_scoped_to_product_filter(client):
+    etag = client.get('/api/observations/filter?product_id=2&limit=5').headers['ETag']
+    client.post('/api/observations', json={'product_id': 4, 'value': 'Clear'})
+    assert client.get('/api/observations/filter?product_id=2&limit=5', headers={'If-None-Match': etag}).status_code == 304
+
+    unfiltered = client.get('/api/observations/filter?limit=5')
+    client.post('/api/observations', json={'product_id': 4, 'value': 'Detected'})
+    again = client.get('/api/observations/filter?limit=5', headers={'If-None-Match': unfiltered.headers['ETag']})
+    assert again.status_code == 200
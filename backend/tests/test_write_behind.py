@@ -0,0 +1,148 @@
+"""
+Tests for write-behind ingest (journal, group commit, replay).
+"""
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import write_behind
+from app.db import SessionLocal
+from app.ingest import prepare
+from app.routes.observation import ObservationRecord
+from app.write_behind import COMMITTED, FAILED, IngestTicket, WriteBehindQueue
+
+
+@pytest.fixture
+def writer(app, tmp_path):
+    queue = WriteBehindQueue(str(tmp_path / "journal.ndjson"), max_delay=0.05, fsync=False)
+    app.extensions["write_behind"] = queue
+    yield queue
+    queue.stop()
+    app.extensions.pop("write_behind", None)
+
+
+def test_handlers_queue_and_writer_group_commits(client, db_session, test_products, writer):
+    single = client.post('/api/observations', json={'product_id': 1, 'value': '0.61', 'satellite_id': 'WB'})
+    assert single.status_code == 202
+    ticket = single.get_json()['ticket']
+    assert single.headers['Location'] == f'/api/observations/ingest/tickets/{ticket}'
+    assert client.get(single.headers['Location']).get_json()['status'] == 'queued'
+
+    bulk = client.post('/api/observations/bulk', json=[
+        {'product_id': 2, 'value': '301', 'satellite_id': 'WB'},
+        {'product_id': 77, 'value': '1'},
+        {'product_id': 3, 'value': '1200', 'satellite_id': 'WB'},
+    ])
+    assert bulk.status_code == 202
+    assert (bulk.get_json()['queued'], bulk.get_json()['failed']) == (2, 1)
+    assert client.post('/api/observations', json={'value': '1'}).status_code == 400
+
+    # Both submissions were waiting when the writer started: one transaction
+    writer.start()
+    writer.flush()
+    assert (writer.batches, writer.rows_written) == (1, 3)
+
+    status = client.get(f'/api/observations/ingest/tickets/{bulk.get_json()["ticket"]}').get_json()
+    assert status['status'] == COMMITTED and status['count'] == 2
+    rows = db_session.query(ObservationRecord).filter(ObservationRecord.satellite_id == 'WB').all()
+    assert sorted(o.id for o in rows if o.product_id != 1) == [status['first_id'], status['last_id']]
+    assert client.get('/api/observations/ingest/tickets/nope').status_code == 404
+
+
+def test_journal_replays_uncommitted_tickets(app, db_session, test_products, tmp_path):
+    path = str(tmp_path / "journal.ndjson")
+    crashed = WriteBehindQueue(path, fsync=False)
+    row = {'product_id': 1, 'value': '0.5', 'satellite_id': 'REPLAY', 'timestamp': '2024-05-01T00:00:00'}
+    committed_ticket = crashed.submit([prepare(row)], "POST /api/observations")
+    lost_ticket = crashed.submit([prepare({**row, 'coordinates': f'1.0, {lon}'}) for lon in (1, 2)],
+                                 "POST /api/observations/bulk")
+    crashed.stop()  # the process died: its journal lock is released
+    # The first ticket committed before the crash; the journal was not truncated yet
+    db_session.add(IngestTicket(ticket=committed_ticket, status=COMMITTED, count=1))
+    db_session.commit()
+
+    restarted = WriteBehindQueue(path, fsync=False)
+    assert restarted.replay() == 1
+    restarted.start()
+    restarted.flush()
+    restarted.stop()
+
+    session = SessionLocal()
+    try:
+        assert session.get(IngestTicket, lost_ticket).count == 2
+        assert session.query(ObservationRecord).filter(ObservationRecord.satellite_id == 'REPLAY').count() == 2
+    finally:
+        session.close()
+    with open(path) as journal:
+        assert journal.read() == ''
+
+
+def test_locked_database_is_retried_not_failed(app, db_session, test_products, tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind.time, "sleep", lambda seconds: None)
+    locked = {"commits": 12}  # more than one round of LOCKED_RETRIES
+
+    def flaky_session():
+        session = SessionLocal()
+        if locked["commits"]:
+            def commit():
+                locked["commits"] -= 1
+                raise OperationalError("COMMIT", {}, Exception("database is locked"))
+            session.commit = commit
+        return session
+
+    path = str(tmp_path / "journal.ndjson")
+    writer = WriteBehindQueue(path, session_factory=flaky_session, fsync=False)
+    with pytest.raises(RuntimeError):
+        WriteBehindQueue(path, fsync=False)  # one owner per journal
+
+    ok = writer.submit([prepare({'product_id': 1, 'value': '0.5', 'satellite_id': 'LOCKED'})], "POST /api/observations")
+    bad = writer.submit([{'product_id': 1}], "POST /api/observations")  # NOT NULL columns missing
+    writer.start()
+    writer.flush()
+    assert writer._thread.is_alive()
+    status = {t: writer.status(db_session, t)['status'] for t in (ok, bad)}
+    writer.stop()
+
+    assert status == {ok: COMMITTED, bad: FAILED}
+    assert db_session.query(ObservationRecord).filter(ObservationRecord.satellite_id == 'LOCKED').count() == 1
+
+
+def test_idempotency_key_is_claimed_before_queueing(client, db_session, test_products, writer, monkeypatch):
+    headers = {'Idempotency-Key': 'wb-retry-1'}
+    body = [{'product_id': 1, 'value': '0.4', 'satellite_id': 'WBKEY'}]
+    first = client.post('/api/observations/bulk', json=body, headers=headers)
+    assert first.status_code == 202
+
+    # A concurrent retry that passed check() before the first request committed its key
+    real_check = write_behind.idempotency.check
+    calls = []
+
+    def racing_check(db, request):
+        calls.append(request.path)
+        return None if len(calls) == 1 else real_check(db, request)
+
+    monkeypatch.setattr(write_behind.idempotency, 'check', racing_check)
+    retry = client.post('/api/observations/bulk', json=body, headers=headers)
+    assert retry.status_code == 202 and retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['ticket'] == first.get_json()['ticket']
+    assert len(writer._pending) == 1
+
+
+def test_install_claims_a_free_journal_slot(tmp_path, monkeypatch):
+    from flask import Flask
+
+    path = str(tmp_path / "journal.ndjson")
+    held = WriteBehindQueue(path, fsync=False)  # another worker process
+    monkeypatch.setattr(write_behind, "JOURNAL_SLOTS", 2)
+
+    def app_with_write_behind():
+        app = Flask(__name__)
+        app.config.update(WRITE_BEHIND_ENABLED=True, WRITE_BEHIND_JOURNAL=path, WRITE_BEHIND_FSYNC=False)
+        return app, write_behind.install(app)
+
+    second_app, second = app_with_write_behind()
+    assert second.journal_path == f"{path}.1"
+    third_app, third = app_with_write_behind()
+    assert third is None and "write_behind" not in third_app.extensions
+
+    second.stop()
+    held.stop()
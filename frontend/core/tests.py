@@ -1,7 +1,8 @@
 from django.test import TestCase
 from django.urls import reverse
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import requests
+from core import views
 
 class ViewTests(TestCase):
     def test_index_view(self):
@@ -57,3 +58,22 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Invalid username or password")
         self.assertNotIn('access_token', self.client.session)
+
+    @patch('requests.get')
+    def test_fetch_observations_follows_cursor_up_to_cap(self, mock_get):
+        def page(rows, cursor):
+            response = MagicMock(status_code=200, headers={"X-Next-Cursor": cursor} if cursor else {})
+            response.json.return_value = rows
+            return response
+
+        mock_get.side_effect = [page([{"id": 3}, {"id": 2}], "c1"), page([{"id": 1}], None)]
+        rows, truncated = views._fetch_observations({"username": "u"}, {})
+        self.assertEqual([r["id"] for r in rows], [3, 2, 1])
+        self.assertFalse(truncated)
+        self.assertEqual(mock_get.call_args.kwargs["params"]["cursor"], "c1")
+
+        mock_get.side_effect = None
+        mock_get.return_value = page([{"id": 1}] * views.OBSERVATIONS_PAGE_SIZE, "more")
+        rows, truncated = views._fetch_observations({"username": "u"}, {})
+        self.assertEqual(len(rows), views.OBSERVATIONS_MAX_ROWS)
+        self.assertTrue(truncated)
@@ -1,5 +1,6 @@
 # # US-14: Django Website - Basic Views
 import requests
+from urllib3.util.request import ACCEPT_ENCODING
 from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import render, redirect
@@ -8,6 +9,15 @@ from .forms import LoginForm
 # Use settings-based backend URL so it's configurable per-environment
 BACKEND_URL = getattr(settings, "BACKEND_API_URL", "http://127.0.0.1:5000")
 REQUEST_TIMEOUT = 30  # seconds
+# Observations page: backend page size (its maximum) and how many rows to follow the cursor for
+OBSERVATIONS_PAGE_SIZE = 500
+OBSERVATIONS_MAX_ROWS = 5000
+
+def _auth_headers(access_token):
+    """Headers for authenticated backend API calls"""
+    # Advertise every content-coding urllib3 can decode (gzip/deflate, plus br and
+    # zstd when brotli/zstandard are installed); responses are decoded transparently
+    return {"Authorization": f"Bearer {access_token}", "Accept-Encoding": ACCEPT_ENCODING}
 
 def _get_plan_name(user_email, headers):
     """Helper to fetch subscriptions and determine plan name"""
@@ -29,6 +39,25 @@ def _get_plan_name(user_email, headers):
         print(f"Error determining plan name: {e}")
     return plan_name
 
+def _fetch_observations(params, headers):
+    """
+    Fetch observations page by page, following X-Next-Cursor up to
+    OBSERVATIONS_MAX_ROWS. Returns (rows, truncated).
+    """
+    rows = []
+    params = {**params, "limit": OBSERVATIONS_PAGE_SIZE}
+    while True:
+        response = requests.get(f"{BACKEND_URL}/api/observations", params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            return rows, bool(rows)
+        rows.extend(response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            return rows, False
+        if len(rows) >= OBSERVATIONS_MAX_ROWS:
+            return rows, True
+        params["cursor"] = next_cursor
+
 def index(request):
     """Landing page view"""
     return render(request, 'index.html')
@@ -201,7 +230,7 @@ def verify_2fa_setup_view(request):
                 "email": email,
                 "otp_code": otp_code,
                 "setup_mode": True
-            }, headers={'Authorization': f'Bearer {access_token}'}, timeout=REQUEST_TIMEOUT)
+            }, headers=_auth_headers(access_token), timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 200:
                 res_data = response.json()
@@ -330,13 +359,12 @@ def observations(request):
     username = request.session.get("first_name") or request.session.get("username", "User")
     backend_username = request.session.get("username") # For API calls
     observations_data = []
-    headers = {"Authorization": f"Bearer {access_token}"}
+    truncated = False
+    headers = _auth_headers(access_token)
     
     try:
-        # Fetching observations from your backend API
-        response = requests.get(f"{BACKEND_URL}/api/observations", params={"username": backend_username}, headers=headers)
-        if response.status_code == 200:
-            observations_data = response.json()
+        # Fetching observations from your backend API (newest first, all pages up to the cap)
+        observations_data, truncated = _fetch_observations({"username": backend_username}, headers)
             
         # Get Plan Name
         plan_name = _get_plan_name(backend_username, headers)
@@ -371,6 +399,8 @@ def observations(request):
         "username": username,
         "plan_name": plan_name,
         "tabs": tabs,
+        "truncated": truncated,
+        "max_rows": OBSERVATIONS_MAX_ROWS,
         "BACKEND_URL": BACKEND_URL
     })
 
@@ -382,7 +412,7 @@ def satellites(request):
     
     username = request.session.get("first_name") or request.session.get("username", "User")
     backend_username = request.session.get("username")
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     
     plan_name = _get_plan_name(backend_username, headers)
     
@@ -414,7 +444,7 @@ def dashboard(request):
     
     products = []
     subscriptions = []
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     
     try:
         # Fetch products
@@ -459,7 +489,7 @@ def subscriptions(request):
     products = []
     subscriptions = []
     pro_plan = None
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     
     try:
         
@@ -515,7 +545,7 @@ def subscribe(request, product_id):
         return redirect("login")
     
     user_email = request.session.get("username") or request.session.get("user_email")
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     try:
         # POST to backend to get Checkout Session URL
         response = requests.post(f"{BACKEND_URL}/api/create-checkout-session", json={
@@ -547,7 +577,7 @@ def cancel_subscription(request, product_id):
         return redirect("login")
     
     user_email = request.session.get("username")
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     
     try:
         # Call backend DELETE endpoint
@@ -597,7 +627,7 @@ def settings(request):
     if not access_token:
         return redirect("login")
     
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     try:
         # Validate token and get fresh user info
         response = requests.post(f"{BACKEND_URL}/token/validate", headers=headers, timeout=REQUEST_TIMEOUT)
@@ -622,7 +652,7 @@ def setup_2fa_json_view(request):
     if not access_token:
         return JsonResponse({"error": "Unauthorized"}, status=401)
     
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     try:
         response = requests.post(f"{BACKEND_URL}/2fa/setup", headers=headers, timeout=REQUEST_TIMEOUT)
         print(f"Backend Response Status: {response.status_code}")
@@ -649,7 +679,7 @@ def disable_2fa_view(request):
     if request.method != "POST":
         return JsonResponse({"error": "Method not allowed"}, status=405)
 
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = _auth_headers(access_token)
     try:
         response = requests.post(f"{BACKEND_URL}/2fa/disable", headers=headers, timeout=REQUEST_TIMEOUT)
         return JsonResponse(response.json(), status=response.status_code)
@@ -667,7 +697,7 @@ def update_profile_view(request):
             import json
             data = json.loads(request.body)
             
-            headers = {"Authorization": f"Bearer {access_token}"}
+            headers = _auth_headers(access_token)
             response = requests.put(f"{BACKEND_URL}/api/profile", json=data, headers=headers, timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 200:
@@ -1,26 +1,20 @@
-import sqlite3
+"""
+Upgrade run.db to the latest schema version.
+
+Thin wrapper around the versioned migrations in backend/app/migrations;
+see `python -m app.migrations --help` (run from backend/) for status and
+rollback commands.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
 
 def migrate_db():
+    from app.migrations.__main__ import main
     try:
-        conn = sqlite3.connect('run.db')
-        cursor = conn.cursor()
-        
-        # Add columns if they don't exist
-        columns = [
-            ("is_verified", "INTEGER DEFAULT 0"),
-            ("otp_code", "TEXT"),
-            ("otp_created_at", "DATETIME")
-        ]
-        
-        for col, dtype in columns:
-            try:
-                cursor.execute(f"ALTER TABLE users ADD COLUMN {col} {dtype}")
-                print(f"Added column {col}")
-            except sqlite3.OperationalError as e:
-                print(f"Column {col} likely exists or error: {e}")
-        
-        conn.commit()
-        conn.close()
+        main(["upgrade"])
         print("Migration complete.")
     except Exception as e:
         print(f"Migration failed: {e}")